@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserProfile,WorkerService,Worker,CustomerUser,WorkerRating,Profession,Booking
+from .models import UserProfile,WorkerService,Worker,CustomerUser,WorkerRating,Profession,Booking,StripeEvent
 # Register your models here.
 admin.site.register(UserProfile)
 admin.site.register(WorkerService)
@@ -13,4 +13,12 @@ class ProfessionAdmin(admin.ModelAdmin):
     prepopulated_fields = {"slug": ("name",)}
 
 
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ("event_id", "type", "status", "attempts", "received_at", "processed_at")
+    list_filter = ("status", "type")
+    search_fields = ("event_id",)
+    readonly_fields = ("event_id", "type", "payload", "received_at", "processed_at", "last_error")
+
+
 # admin.site.register(Booking)
\ No newline at end of file
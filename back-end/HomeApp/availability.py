@@ -0,0 +1,324 @@
+"""
+Per-worker, per-day occupancy.
+
+A worker can take one booking per day. Instead of scanning Booking with a
+status filter, every booking in an active status owns a WorkerDayOccupancy
+row. Checking a day is then a lookup on the unique (worker, date) index,
+and every booking path shares the same definition of "active".
+
+The unique index is also what makes a reservation race-free: when two
+requests book the same worker-day concurrently, the second insert fails
+and claim_booking() raises DayAlreadyBooked. The booking paths save the
+booking and claim its day inside one transaction.atomic(), so the losing
+booking row is rolled back with it. The Booking post_save signal only
+releases or moves a row the booking already owns and never raises, so
+saves made elsewhere (webhooks, the Django admin) cannot fail half-way.
+
+The days a worker offers are rows of WorkerAvailability, so "who works
+on this day" is an indexed lookup rather than a scan of every schedule.
+
+While a customer pays on Stripe Checkout the day is held by a SlotHold,
+which owns the occupancy row instead of a booking. Confirming the payment
+hands the day from the hold to the new booking in one transaction; holds
+that are never confirmed are deleted in bulk by expire_holds() once they
+expire, and an expired hold never blocks anyone in the meantime.
+"""
+import calendar
+import logging
+from datetime import date, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import Booking, SlotHold, WorkerAvailability, WorkerDayOccupancy
+
+logger = logging.getLogger(__name__)
+
+# Booking statuses that keep the worker's day taken
+ACTIVE_BOOKING_STATUSES = ("pending", "confirmed", "accepted", "in_progress")
+
+# Working hours enforced by the booking views: start times from 9 AM up to 6 PM
+WORKDAY_START_HOUR = 9
+WORKDAY_END_HOUR = 18
+OPEN_HOURS = tuple(f"{hour:02d}:00" for hour in range(WORKDAY_START_HOUR, WORKDAY_END_HOUR))
+
+# Longest date range a single availability search may cover
+MAX_SEARCH_DAYS = 31
+
+# Most bookings one batch request may create
+MAX_BATCH_DATES = 52
+
+# Most days a worker may add or remove from their schedule in one request
+MAX_SCHEDULE_EDIT = 366
+
+RECURRENCE_FREQUENCIES = ("daily", "weekly", "monthly")
+
+
+class DayAlreadyBooked(Exception):
+    """The worker's day is already taken by another booking or hold."""
+
+    def __init__(self, worker_id, day):
+        self.worker_id = worker_id
+        self.day = day
+        super().__init__(f"Worker {worker_id} is already booked on {day}")
+
+
+def live_occupancy():
+    """Occupancy rows that still take their day: bookings and unexpired holds."""
+    return WorkerDayOccupancy.objects.filter(
+        Q(hold__isnull=True) | Q(hold__expires_at__gt=timezone.now())
+    )
+
+
+def is_worker_booked(worker, day):
+    return live_occupancy().filter(worker=worker, date=day).exists()
+
+
+def has_schedule():
+    """Annotation: whether the worker has published any available days at all."""
+    return Exists(WorkerAvailability.objects.filter(worker=OuterRef("pk")))
+
+
+def offers_day(day):
+    """
+    Filter for workers who can be booked on `day`: they listed it, or they
+    have no schedule and take any day.
+    """
+    return Exists(WorkerAvailability.objects.filter(worker=OuterRef("pk"), date=day)) | ~has_schedule()
+
+
+def update_available_days(worker, add=(), remove=()):
+    """Add and remove days from a worker's schedule with one bulk statement each."""
+    with transaction.atomic():
+        if remove:
+            WorkerAvailability.objects.filter(worker=worker, date__in=remove).delete()
+        if add:
+            WorkerAvailability.objects.bulk_create(
+                [WorkerAvailability(worker=worker, date=day) for day in add],
+                ignore_conflicts=True,
+            )
+
+
+def recurring_dates(start, frequency, count, interval=1):
+    """
+    `count` dates from `start`, every `interval` days, weeks or months.
+    Monthly dates keep the start's day of month, clamped to short months.
+    """
+    if frequency not in RECURRENCE_FREQUENCIES:
+        raise ValueError(f"frequency must be one of: {', '.join(RECURRENCE_FREQUENCIES)}")
+    if interval < 1 or count < 1:
+        raise ValueError("interval and count must be positive")
+
+    dates = []
+    for n in range(count):
+        step = n * interval
+        if frequency == "daily":
+            dates.append(start + timedelta(days=step))
+        elif frequency == "weekly":
+            dates.append(start + timedelta(weeks=step))
+        else:
+            year, month = divmod(start.month - 1 + step, 12)
+            year += start.year
+            month += 1
+            dates.append(date(year, month, min(start.day, calendar.monthrange(year, month)[1])))
+    return dates
+
+
+def taken_days(worker, days):
+    """The subset of `days` on which the worker is already booked or held, in one query."""
+    return set(live_occupancy().filter(worker=worker, date__in=days).values_list("date", flat=True))
+
+
+def free_workers_by_day(workers, start, end):
+    """
+    For each day from `start` to `end` inclusive, the workers from `workers`
+    (a queryset) that offer that day and have no active booking on it, as
+    [(day, [worker, ...]), ...]. Schedules and taken days each come from one
+    query over the whole range.
+    """
+    workers = list(workers.annotate(has_schedule=has_schedule()))
+    worker_ids = [worker.pk for worker in workers]
+    taken = set(
+        live_occupancy().filter(
+            worker__in=worker_ids, date__range=(start, end)
+        ).values_list("worker_id", "date")
+    )
+    offered = set(
+        WorkerAvailability.objects.filter(
+            worker__in=worker_ids, date__range=(start, end)
+        ).values_list("worker_id", "date")
+    )
+
+    days = []
+    day = start
+    while day <= end:
+        free = [
+            worker for worker in workers
+            if (worker.pk, day) not in taken
+            and (not worker.has_schedule or (worker.pk, day) in offered)
+        ]
+        days.append((day, free))
+        day += timedelta(days=1)
+    return days
+
+
+def _claim(worker_id, day, create):
+    """
+    Run `create` (which inserts an occupancy row) in a savepoint. A day held
+    by an expired hold is freed and retried once; otherwise a taken day
+    raises DayAlreadyBooked without breaking the caller's transaction.
+    """
+    try:
+        with transaction.atomic():
+            return create()
+    except IntegrityError:
+        if not release_expired_holds(worker_id, day):
+            raise DayAlreadyBooked(worker_id, day) from None
+    try:
+        with transaction.atomic():
+            return create()
+    except IntegrityError:
+        raise DayAlreadyBooked(worker_id, day) from None
+
+
+def claim_booking(booking):
+    """
+    Take the day for a booking just saved in an active status. Call it in
+    the transaction.atomic() that saved the booking; raises
+    DayAlreadyBooked when another booking or live hold has the day.
+    """
+    _claim(
+        booking.worker_id,
+        booking.date,
+        lambda: WorkerDayOccupancy.objects.create(
+            booking=booking, worker_id=booking.worker_id, date=booking.date
+        ),
+    )
+
+
+def sync_booking(booking):
+    """
+    Release or move the day a booking already owns to match its status,
+    worker and date. Never claims a new day and never raises: a move onto
+    a day that is taken drops the booking's row instead and is logged.
+    """
+    if booking.status not in ACTIVE_BOOKING_STATUSES:
+        WorkerDayOccupancy.objects.filter(booking=booking).delete()
+        return
+
+    occupancy = WorkerDayOccupancy.objects.filter(booking=booking).first()
+    if occupancy is None or (occupancy.worker_id, occupancy.date) == (booking.worker_id, booking.date):  # pyright: ignore
+        return
+    try:
+        with transaction.atomic():
+            occupancy.worker_id = booking.worker_id
+            occupancy.date = booking.date
+            occupancy.save(update_fields=["worker", "date"])
+    except IntegrityError:
+        logger.warning(
+            "Booking %s moved to worker %s on %s, which is already taken; releasing its day",
+            booking.pk, booking.worker_id, booking.date,
+        )
+        WorkerDayOccupancy.objects.filter(booking=booking).delete()
+
+
+def create_bookings(bookings):
+    """
+    Insert unsaved active bookings and their occupancy rows with two bulk
+    inserts. bulk_create skips the post_save signal, so the days are claimed
+    here; run it inside transaction.atomic(). Raises DayAlreadyBooked if
+    any of the days was taken since it was checked.
+    """
+    if not bookings:
+        return []
+    worker_ids = {booking.worker_id for booking in bookings}
+    days = {booking.date for booking in bookings}
+    # Expired holds still own their rows until swept; they must not block
+    SlotHold.objects.filter(
+        worker_id__in=worker_ids, date__in=days, expires_at__lte=timezone.now()
+    ).delete()
+
+    bookings = Booking.objects.bulk_create(bookings)
+    try:
+        with transaction.atomic():
+            WorkerDayOccupancy.objects.bulk_create(
+                WorkerDayOccupancy(booking=booking, worker_id=booking.worker_id, date=booking.date)
+                for booking in bookings
+            )
+    except IntegrityError:
+        taken = set(
+            WorkerDayOccupancy.objects.filter(worker_id__in=worker_ids, date__in=days)
+            .values_list("worker_id", "date")
+        )
+        contested = next((b for b in bookings if (b.worker_id, b.date) in taken), bookings[0])
+        raise DayAlreadyBooked(contested.worker_id, contested.date) from None
+    return bookings
+
+
+def hold_day(worker, day, user, expires_at):
+    """
+    Hold the worker's day for `user` until `expires_at`, replacing any hold
+    the user already has on it. Raises DayAlreadyBooked if the day is taken.
+    """
+    SlotHold.objects.filter(worker=worker, date=day, user=user).delete()
+
+    def claim():
+        hold = SlotHold.objects.create(worker=worker, date=day, user=user, expires_at=expires_at)
+        WorkerDayOccupancy.objects.create(worker=worker, date=day, hold=hold)
+        return hold
+
+    return _claim(worker.pk, day, claim)
+
+
+def release_hold(hold):
+    """
+    Give up a hold and its day. Called just before saving the booking that
+    replaces it, inside the same transaction, so nobody else can take the day.
+    """
+    hold.delete()
+
+
+def release_expired_holds(worker_id, day):
+    """Drop expired holds on one worker-day; returns whether any were dropped."""
+    deleted, _ = SlotHold.objects.filter(
+        worker_id=worker_id, date=day, expires_at__lte=timezone.now()
+    ).delete()
+    return deleted > 0
+
+
+def expire_holds():
+    """Delete every expired hold (and its occupancy row); returns how many holds went."""
+    _, deleted = SlotHold.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted.get(SlotHold._meta.label, 0)
+
+
+def rebuild():
+    """
+    Re-derive the booking rows of the occupancy table from Booking; the
+    earliest active booking wins a contested day and days held for a
+    checkout are left alone. Returns the number of days booked.
+    """
+    held = set(
+        WorkerDayOccupancy.objects.filter(hold__isnull=False).values_list("worker_id", "date")
+    )
+    rows = {}
+    active = (
+        Booking.objects.filter(status__in=ACTIVE_BOOKING_STATUSES)
+        .order_by("created_at", "id")
+        .values_list("id", "worker_id", "date")
+    )
+    for booking_id, worker_id, day in active.iterator():
+        if (worker_id, day) not in held:
+            rows.setdefault((worker_id, day), booking_id)
+
+    with transaction.atomic():
+        WorkerDayOccupancy.objects.filter(hold__isnull=True).delete()
+        WorkerDayOccupancy.objects.bulk_create(
+            [
+                WorkerDayOccupancy(worker_id=worker_id, date=day, booking_id=booking_id)
+                for (worker_id, day), booking_id in rows.items()
+            ],
+            batch_size=500,
+        )
+    return len(rows)
@@ -0,0 +1,225 @@
+"""
+Query helpers for the public worker catalog: the base queryset, the
+/workers/ filters and the facet counts shown next to them.
+"""
+import hashlib
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.validators import slug_re
+from django.db.models import Case, CharField, Count, Exists, OuterRef, Prefetch, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from rest_framework.exceptions import ValidationError
+
+from . import availability, response_cache
+from .models import Worker, WorkerRating, WorkerService
+from .serializers import WorkerListSerializer
+
+# Longest decimal that still fits a signed 64-bit primary key column
+MAX_ID_DIGITS = 18
+
+FILTER_PARAMS = ("profession", "location", "min_price", "max_price", "min_rating", "available_on")
+
+# (upper bound, label) on the worker's cheapest service; the last bucket is open-ended
+PRICE_BUCKETS = (
+    (Decimal("250"), "under-250"),
+    (Decimal("500"), "250-499"),
+    (Decimal("1000"), "500-999"),
+    (None, "1000+"),
+)
+
+
+# Worker columns needed to render each WorkerListSerializer field
+FIELD_COLUMNS = {
+    "id": ("id",),
+    "image": ("image",),
+    "name": ("name",),
+    "profession": ("profession__id", "profession__name", "profession__slug"),
+    "experience": ("experience",),
+    "location": ("location",),
+    "ratings": ("rating_sum", "rating_count"),
+    "starting_price": (),
+    "services": (),
+    "reviews": (),
+}
+
+
+def catalog_queryset(fields=None):
+    """
+    Workers with `starting_price` annotated.
+
+    With `fields` (WorkerListSerializer field names) only the columns and
+    relations those fields need are loaded; without it, everything the full
+    WorkerSerializer renders is.
+    """
+    cheapest_service = (
+        WorkerService.objects.filter(worker=OuterRef("pk"))
+        .order_by("price")
+        .values("price")[:1]
+    )
+    queryset = Worker.objects.annotate(
+        starting_price=Coalesce(Subquery(cheapest_service), Value(Decimal("0.00")))
+    )
+    if fields is None:
+        return queryset.select_related("user", "profession").prefetch_related("services")
+
+    # rating is the keyset for ?ordering=rating, so it is always loaded
+    columns = {"id", "rating"}
+    for name in fields:
+        columns.update(FIELD_COLUMNS[name])
+    queryset = queryset.only(*columns)
+    if "profession" in fields:
+        queryset = queryset.select_related("profession")
+    if "services" in fields:
+        queryset = queryset.prefetch_related("services")
+    if "reviews" in fields:
+        queryset = queryset.prefetch_related(
+            Prefetch("ratings", queryset=WorkerRating.objects.select_related("user"))
+        )
+    return queryset
+
+
+def _list_param(params, name):
+    return [item.strip() for item in params.get(name, "").split(",") if item.strip()]
+
+
+def parse_fieldset(params):
+    """
+    Resolve ?fields= and ?expand= into the WorkerListSerializer field names
+    to render, as (fields, expand).
+    """
+    fields = _list_param(params, "fields")
+    expand = _list_param(params, "expand")
+    unknown = sorted(set(fields) - set(FIELD_COLUMNS))
+    if unknown:
+        raise ValidationError({"detail": f"Unknown fields: {', '.join(unknown)}"})
+    unknown = sorted(set(expand) - set(WorkerListSerializer.EXPANDABLE_FIELDS))
+    if unknown:
+        raise ValidationError({"detail": f"Unknown expand: {', '.join(unknown)}"})
+    return fields, expand
+
+
+def _decimal_param(params, name):
+    raw = params.get(name)
+    if raw in (None, ""):
+        return None
+    try:
+        value = Decimal(raw)
+    except InvalidOperation:
+        raise ValidationError({"detail": f"{name} must be a number"})
+    # NaN and Infinity parse, but mean nothing as a price or rating bound
+    if not value.is_finite():
+        raise ValidationError({"detail": f"{name} must be a number"})
+    return value
+
+
+def profession_filter(profession):
+    """
+    Q for a ?profession= given as an id or a slug. str.isdigit() also
+    accepts digits like "²" that int() rejects, so ids must be ASCII.
+    """
+    if profession.isascii() and profession.isdecimal():
+        if len(profession) > MAX_ID_DIGITS:
+            raise ValidationError({"detail": "profession must be a profession id or slug"})
+        return Q(profession_id=int(profession))
+    if not slug_re.match(profession):
+        raise ValidationError({"detail": "profession must be a profession id or slug"})
+    return Q(profession__slug=profession)
+
+
+def filter_workers(queryset, params):
+    """Apply the catalog filters from the query string."""
+    profession = params.get("profession")
+    if profession:
+        queryset = queryset.filter(profession_filter(profession))
+
+    location = params.get("location")
+    if location:
+        queryset = queryset.filter(location__iexact=location.strip())
+
+    min_price = _decimal_param(params, "min_price")
+    max_price = _decimal_param(params, "max_price")
+    if min_price is not None or max_price is not None:
+        # A worker matches when at least one of their services is in range
+        services = WorkerService.objects.filter(worker=OuterRef("pk"))
+        if min_price is not None:
+            services = services.filter(price__gte=min_price)
+        if max_price is not None:
+            services = services.filter(price__lte=max_price)
+        queryset = queryset.filter(Exists(services))
+
+    min_rating = _decimal_param(params, "min_rating")
+    if min_rating is not None:
+        queryset = queryset.filter(rating__gte=min_rating)
+
+    available_on = params.get("available_on")
+    if available_on:
+        try:
+            day = datetime.strptime(available_on, "%Y-%m-%d").date()
+        except ValueError:
+            raise ValidationError({"detail": "available_on must be a date (YYYY-MM-DD)"})
+        # Workers whose schedule includes the day; bookings are not considered
+        queryset = queryset.filter(availability.offers_day(day))
+
+    return queryset
+
+
+def filter_signature(params):
+    """Stable digest of the filter part of a query string."""
+    filters = {name: params.get(name, "") for name in FILTER_PARAMS}
+    raw = json.dumps(filters, sort_keys=True)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _price_bucket():
+    whens = [
+        When(starting_price__lt=upper, then=Value(label))
+        for upper, label in PRICE_BUCKETS
+        if upper is not None
+    ]
+    return Case(*whens, default=Value(PRICE_BUCKETS[-1][1]), output_field=CharField())
+
+
+def compute_facets(queryset):
+    """
+    Workers per profession, per location and per price bucket, from a
+    single grouped query over the filtered catalog.
+    """
+    rows = (
+        queryset.prefetch_related(None)
+        .annotate(price_bucket=_price_bucket())
+        .order_by()
+        .values("profession__slug", "profession__name", "location", "price_bucket")
+        .annotate(total=Count("pk"))
+    )
+
+    professions, locations = {}, {}
+    price_buckets = {label: 0 for _, label in PRICE_BUCKETS}
+    for row in rows:
+        slug = row["profession__slug"]
+        entry = professions.setdefault(slug, {"slug": slug, "name": row["profession__name"], "count": 0})
+        entry["count"] += row["total"]
+        if row["location"]:
+            locations[row["location"]] = locations.get(row["location"], 0) + row["total"]
+        price_buckets[row["price_bucket"]] += row["total"]
+
+    return {
+        "professions": sorted(professions.values(), key=lambda p: (-p["count"], p["name"])),
+        "locations": [
+            {"name": name, "count": count}
+            for name, count in sorted(locations.items(), key=lambda item: (-item[1], item[0]))
+        ],
+        "price": [{"bucket": label, "count": price_buckets[label]} for _, label in PRICE_BUCKETS],
+    }
+
+
+def facet_counts(queryset, params):
+    """compute_facets(), cached per filter signature until the catalog changes."""
+    return response_cache.get_or_set(
+        f"catalog:facets:{filter_signature(params)}",
+        [response_cache.WORKER_LIST_TAG],
+        lambda: compute_facets(queryset),
+        timeout=settings.CATALOG_FACET_CACHE_SECONDS,
+    )
@@ -0,0 +1,120 @@
+"""
+Proximity search over a fixed lat/long grid.
+
+Each worker with coordinates has a WorkerGeoCell row holding the integer
+cell it falls in. A radius query only reads the cells overlapping the
+search circle's bounding box (index range scans on (cell_lat, cell_lng)),
+then computes exact distances for those few candidates.
+"""
+import math
+
+from django.db.models import Q
+
+from . import catalog
+from .models import Worker, WorkerGeoCell
+
+# ~11 km of latitude per cell
+CELL_DEGREES = 0.1
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+MAX_RADIUS_KM = 100
+
+
+def cell_for(latitude, longitude):
+    return math.floor(latitude / CELL_DEGREES), math.floor(longitude / CELL_DEGREES)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = math.radians(lat2 - lat1)
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def index_worker(worker):
+    """Insert, move or drop the worker's grid cell after a save."""
+    if worker.latitude is None or worker.longitude is None:
+        WorkerGeoCell.objects.filter(worker_id=worker.pk).delete()
+        return
+    cell_lat, cell_lng = cell_for(worker.latitude, worker.longitude)
+    WorkerGeoCell.objects.update_or_create(
+        worker_id=worker.pk,
+        defaults={
+            "profession_id": worker.profession_id,
+            "cell_lat": cell_lat,
+            "cell_lng": cell_lng,
+            "latitude": worker.latitude,
+            "longitude": worker.longitude,
+        },
+    )
+
+
+def _cell_ranges(latitude, longitude, radius_km):
+    """
+    Cell rows covering the search circle's bounding box, and the column
+    spans to read in each: two spans when the box crosses the antimeridian.
+    """
+    lat_span = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = max(math.cos(math.radians(latitude)), 0.01)
+    lng_span = radius_km / (KM_PER_DEGREE_LAT * cos_lat)
+
+    lat_lo = cell_for(max(latitude - lat_span, -90), 0)[0]
+    lat_hi = cell_for(min(latitude + lat_span, 90), 0)[0]
+    rows = range(lat_lo, lat_hi + 1)
+
+    first, last = cell_for(0, -180)[1], cell_for(0, 180)[1]
+    west, east = longitude - lng_span, longitude + lng_span
+    if lng_span >= 180:
+        spans = [(first, last)]
+    elif west < -180:
+        spans = [(cell_for(0, west + 360)[1], last), (first, cell_for(0, east)[1])]
+    elif east > 180:
+        spans = [(cell_for(0, west)[1], last), (first, cell_for(0, east - 360)[1])]
+    else:
+        spans = [(cell_for(0, west)[1], cell_for(0, east)[1])]
+    return rows, spans
+
+
+def nearby(latitude, longitude, radius_km, profession=None, limit=20):
+    """
+    Workers within `radius_km`, nearest first, as a list of (worker_id, distance_km).
+    `profession` may be a Profession id or slug.
+    """
+    rows, spans = _cell_ranges(latitude, longitude, radius_km)
+    cells = Q()
+    for cell_lat in rows:
+        for span in spans:
+            cells |= Q(cell_lat=cell_lat, cell_lng__range=span)
+
+    candidates = WorkerGeoCell.objects.filter(cells)
+    if profession:
+        candidates = candidates.filter(catalog.profession_filter(str(profession)))
+
+    hits = []
+    for worker_id, lat, lng in candidates.values_list("worker_id", "latitude", "longitude"):
+        distance = haversine_km(latitude, longitude, lat, lng)
+        if distance <= radius_km:
+            hits.append((worker_id, distance))
+    hits.sort(key=lambda hit: (hit[1], hit[0]))
+    return hits[:limit]
+
+
+def rebuild_index():
+    """Re-derive every grid cell from Worker coordinates; returns the number indexed."""
+    WorkerGeoCell.objects.all().delete()
+    cells = []
+    for worker in Worker.objects.filter(latitude__isnull=False, longitude__isnull=False).only(
+        "id", "profession_id", "latitude", "longitude"
+    ):
+        cell_lat, cell_lng = cell_for(worker.latitude, worker.longitude)
+        cells.append(WorkerGeoCell(
+            worker_id=worker.pk,
+            profession_id=worker.profession_id,  # pyright: ignore
+            cell_lat=cell_lat,
+            cell_lng=cell_lng,
+            latitude=worker.latitude,
+            longitude=worker.longitude,
+        ))
+    WorkerGeoCell.objects.bulk_create(cells, batch_size=500)
+    return len(cells)
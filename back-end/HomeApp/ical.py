@@ -0,0 +1,115 @@
+"""
+iCalendar (RFC 5545) feed of a worker's bookings.
+
+Feeds are addressed by a signed token instead of a login, because calendar
+apps subscribe with a bare URL. The body is generated lazily from a
+server-side cursor so a long booking history is never held in memory.
+"""
+from datetime import datetime, timedelta, timezone
+
+from django.core import signing
+from django.utils.timezone import now
+
+from .availability import ACTIVE_BOOKING_STATUSES
+from .models import Booking
+
+TOKEN_SALT = "HomeApp.ical.worker-feed"
+PRODID = "-//HomeService//Worker bookings//EN"
+
+# Bookings have a start time only; each is shown as a one-hour appointment
+EVENT_DURATION = timedelta(hours=1)
+
+LOCAL_FORMAT = "%Y%m%dT%H%M%S"
+
+# Bookings that take (or took) the worker's time; declined and canceled ones are left out
+FEED_STATUSES = (*ACTIVE_BOOKING_STATUSES, "completed")
+
+EVENT_STATUS = {
+    "pending": "TENTATIVE",
+}
+
+
+def worker_token(worker):
+    return signing.Signer(salt=TOKEN_SALT).sign(str(worker.pk))
+
+
+def worker_id_for_token(token):
+    """The worker id a feed token was issued for, or None if it is not valid."""
+    try:
+        return int(signing.Signer(salt=TOKEN_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def _escape(text):
+    return (
+        str(text or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line):
+    """Fold a content line at 75 octets, continuation lines starting with a space."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Don't split a multi-byte UTF-8 character
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+        limit = 74
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _utc(moment):
+    return moment.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _event(booking, stamp):
+    start = datetime.combine(booking.date, booking.time)
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:booking-{booking.pk}@homeservice",
+        f"DTSTAMP:{stamp}",
+        f"CREATED:{_utc(booking.created_at)}",
+        # Floating local times: the appointment is at the customer's address
+        f"DTSTART:{start.strftime(LOCAL_FORMAT)}",
+        f"DTEND:{(start + EVENT_DURATION).strftime(LOCAL_FORMAT)}",
+        f"SUMMARY:{_escape(f'{booking.service.services} - {booking.user.username}')}",
+        f"STATUS:{EVENT_STATUS.get(booking.status, 'CONFIRMED')}",
+    ]
+    if booking.notes:
+        lines.append(f"DESCRIPTION:{_escape(booking.notes)}")
+    lines.append("END:VEVENT")
+    return "".join(_fold(line) for line in lines)
+
+
+def worker_feed(worker_id, worker_name):
+    """Yield the calendar for one worker, one event at a time."""
+    stamp = _utc(now())
+    yield "".join(_fold(line) for line in [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(f'{worker_name} bookings')}",
+    ])
+    bookings = (
+        Booking.objects.filter(worker_id=worker_id, status__in=FEED_STATUSES)
+        .select_related("service", "user")
+        .only("id", "date", "time", "status", "notes", "created_at", "service__services", "user__username")
+        .order_by("date", "time", "id")
+    )
+    for booking in bookings.iterator(chunk_size=500):
+        yield _event(booking, stamp)
+    yield _fold("END:VCALENDAR")
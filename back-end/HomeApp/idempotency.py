@@ -0,0 +1,133 @@
+"""
+Idempotency-Key handling for mutating endpoints.
+
+A client that may retry a request sends the same `Idempotency-Key` header
+with every attempt. The first attempt runs the view and its rendered
+response is kept in the cache for IDEMPOTENCY_TTL_SECONDS, per (user,
+endpoint, key); later attempts get those exact bytes back without the view
+running again. An attempt that arrives while the first is still running
+waits for it (up to IDEMPOTENCY_WAIT_SECONDS) instead of running twice.
+
+Server errors (5xx) are not kept, so a retry after one runs the view again.
+Reusing a key with a different request body is rejected with 422.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework.response import Response
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+# Seconds between checks while waiting on an in-flight duplicate
+POLL_INTERVAL = 0.1
+
+IN_FLIGHT = "in-flight"
+
+
+def _cache_key(request, key):
+    scope = f"{request.user.pk}|{request.method} {request.path}|{key}"
+    return f"idem:{hashlib.sha256(scope.encode()).hexdigest()}"
+
+
+def _fingerprint(request):
+    return hashlib.sha256(request.body).hexdigest()
+
+
+def _render(request, response):
+    """Render the view's DRF Response now, as the API view would, so its bytes can be kept."""
+    view = request.parser_context["view"]
+    response = view.finalize_response(request, response)
+    response.render()
+    return response
+
+
+def _replay(entry):
+    status_code, headers, content = entry["response"]
+    response = HttpResponse(content, status=status_code)
+    for name, value in headers:
+        response[name] = value
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _wait(cache_key):
+    """
+    Wait for the in-flight request holding `cache_key`. Returns its
+    finished entry, None if it gave up the key (it failed), or the
+    in-flight entry if it is still running when the wait runs out.
+    """
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(cache_key)
+        if entry is None or entry["state"] != IN_FLIGHT or time.monotonic() >= deadline:
+            return entry
+
+
+def idempotent(view_func):
+    """
+    Honour an Idempotency-Key header on a DRF function view. Put it below
+    @api_view / @permission_classes so the user is authenticated first.
+    Requests without the header are passed straight through.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_func(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({"detail": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters"}, status=400)
+
+        cache_key = _cache_key(request, key)
+        fingerprint = _fingerprint(request)
+
+        while not cache.add(
+            cache_key, {"state": IN_FLIGHT, "fingerprint": fingerprint}, settings.IDEMPOTENCY_LOCK_SECONDS
+        ):
+            entry = cache.get(cache_key)
+            if entry is None:
+                # Expired or released between add() and get(); try to claim it again
+                continue
+            if entry["fingerprint"] != fingerprint:
+                return Response({"detail": f"{HEADER} was already used for a different request"}, status=422)
+            if entry["state"] == IN_FLIGHT:
+                entry = _wait(cache_key)
+                if entry is None:
+                    # The first attempt failed; this one runs the view instead
+                    continue
+                if entry["state"] == IN_FLIGHT:
+                    return Response(
+                        {"detail": f"A request with this {HEADER} is still being processed"}, status=409
+                    )
+            return _replay(entry)
+
+        try:
+            response = view_func(request, *args, **kwargs)
+            if isinstance(response, Response):
+                response = _render(request, response)
+        except BaseException:
+            cache.delete(cache_key)
+            raise
+
+        if response.status_code >= 500:
+            cache.delete(cache_key)
+            return response
+
+        headers = [(name, value) for name, value in response.items() if name.lower() != "vary"]
+        cache.set(
+            cache_key,
+            {
+                "state": "done",
+                "fingerprint": fingerprint,
+                "response": (response.status_code, headers, response.content),
+            },
+            settings.IDEMPOTENCY_TTL_SECONDS,
+        )
+        return response
+
+    return wrapper
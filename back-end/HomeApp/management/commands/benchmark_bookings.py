@@ -0,0 +1,159 @@
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from HomeApp import availability, views
+from HomeApp.models import Booking, CustomerUser, Profession, Worker, WorkerService
+from HomeApp.stripe_stub import StubStripeServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent create_booking requests at a few contested worker-days "
+        "and report throughput and any double-bookings"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=8, help="Concurrent clients (default: 8)")
+        parser.add_argument("--requests", type=int, default=50, help="Requests per client (default: 50)")
+        parser.add_argument("--workers", type=int, default=5, help="Workers to book (default: 5)")
+        parser.add_argument("--days", type=int, default=10, help="Distinct days to book (default: 10)")
+        parser.add_argument(
+            "--keep", action="store_true", help="Keep the seeded rows instead of deleting them"
+        )
+        parser.add_argument(
+            "--checkout", action="store_true",
+            help="Book through Stripe Checkout (create session, then confirm) against a local Stripe stub",
+        )
+
+    def handle(self, *args, **options):
+        if not options["checkout"]:
+            return self.run_benchmark(options)
+
+        # Every session the stub creates is already paid, so confirm books straight away
+        server = StubStripeServer(("127.0.0.1", 0), auto_pay=True)
+        server.serve_in_background()
+        try:
+            with override_settings(STRIPE_API_BASE=server.url, STRIPE_SECRET_KEY="sk_test_stub"):
+                self.run_benchmark(options)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def book(self, factory, user, service, day):
+        request = factory.post(
+            f"/workers/{service.worker_id}/book/",
+            {"service_id": service.pk, "date": day.isoformat(), "time": "10:00"},
+            format="json",
+        )
+        force_authenticate(request, user=user)
+        return views.create_booking(request, worker_id=service.worker_id)
+
+    def checkout(self, factory, user, service, day):
+        request = factory.post(
+            f"/payments/stripe/checkout/new/{service.worker_id}/",
+            {"service_id": service.pk, "date": day.isoformat(), "time": "10:00"},
+            format="json",
+        )
+        force_authenticate(request, user=user)
+        response = views.create_stripe_checkout_session_new(request, worker_id=service.worker_id)
+        if response.status_code != 200:
+            return response
+        request = factory.get("/payments/stripe/confirm/", {"session_id": response.data["session_id"]})
+        force_authenticate(request, user=user)
+        return views.confirm_stripe_payment(request)
+
+    def run_benchmark(self, options):
+        clients = options["clients"]
+        tag = timezone.now().strftime("%Y%m%d%H%M%S%f")
+        profession = Profession.objects.create(name=f"bench-{tag}", slug=f"bench-{tag}")
+        users = [
+            CustomerUser.objects.create(username=f"bench-{tag}-{i}", role="user")
+            for i in range(clients)
+        ]
+        services = []
+        for i in range(options["workers"]):
+            account = CustomerUser.objects.create(username=f"bench-{tag}-worker-{i}", role="worker")
+            users.append(account)
+            worker = Worker.objects.create(
+                user=account, name=f"Bench worker {i}", phone="0000000000", profession=profession
+            )
+            services.append(
+                WorkerService.objects.create(worker=worker, services="Bench service", price=Decimal("500.00"))
+            )
+        first_day = date.today() + timedelta(days=1)
+        slots = [
+            (service, first_day + timedelta(days=offset))
+            for service in services
+            for offset in range(options["days"])
+        ]
+
+        factory = APIRequestFactory()
+        statuses = Counter()
+        latencies = []
+        lock = threading.Lock()
+        start_gate = threading.Barrier(clients)
+        attempt = self.checkout if options["checkout"] else self.book
+
+        def run_client(index):
+            user = users[index]
+            try:
+                start_gate.wait()
+                for n in range(options["requests"]):
+                    # Every client walks the same slots, so each worker-day is contested
+                    service, day = slots[n % len(slots)]
+                    started = time.perf_counter()
+                    response = attempt(factory, user, service, day)
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        statuses[response.status_code] += 1
+                        latencies.append(elapsed)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run_client, args=(i,)) for i in range(clients)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        bookings = Booking.objects.filter(
+            worker__profession=profession, status__in=availability.ACTIVE_BOOKING_STATUSES
+        )
+        double_booked = (
+            bookings.values("worker_id", "date").annotate(total=Count("id")).filter(total__gt=1).count()
+        )
+        created = bookings.count()
+
+        latencies.sort()
+        total = len(latencies)
+        self.stdout.write(f"requests:       {total} from {clients} clients in {wall:.2f}s")
+        self.stdout.write(f"throughput:     {total / wall:.1f} req/s")
+        if latencies:
+            p50 = latencies[total // 2] * 1000
+            p95 = latencies[min(total - 1, int(total * 0.95))] * 1000
+            self.stdout.write(f"latency:        p50 {p50:.1f} ms, p95 {p95:.1f} ms")
+        self.stdout.write(
+            "responses:      " + ", ".join(f"{code}: {count}" for code, count in sorted(statuses.items()))
+        )
+        self.stdout.write(f"bookings made:  {created} of {len(slots)} worker-days")
+        self.stdout.write(f"double-booked:  {double_booked}")
+
+        if not options["keep"]:
+            profession.delete()
+            CustomerUser.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+        if double_booked:
+            raise CommandError(f"{double_booked} worker-day(s) were booked more than once")
+        self.stdout.write(self.style.SUCCESS("No double-bookings"))
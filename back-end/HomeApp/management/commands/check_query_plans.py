@@ -0,0 +1,204 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from HomeApp import availability
+from HomeApp.models import (
+    Booking,
+    CheckoutSession,
+    CustomerUser,
+    Payment,
+    Profession,
+    Worker,
+    WorkerDayOccupancy,
+    WorkerService,
+)
+
+
+def hot_queries(user, worker, booking, payment):
+    """
+    (label, queryset) for the booking and payment lookups on the request
+    paths of HomeApp.views and admin_dashboard.views.
+    """
+    month_start = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return [
+        ("day conflict check", availability.live_occupancy().filter(worker=worker, date=booking.date)),
+        ("duplicate booking check", Booking.objects.filter(
+            user=user, worker=worker, date=booking.date, time=booking.time,
+            status__in=availability.ACTIVE_BOOKING_STATUSES,
+        )),
+        ("booking by checkout session", Booking.objects.filter(
+            stripe_checkout_session_id=booking.stripe_checkout_session_id, user=user,
+        )),
+        ("user bookings", Booking.objects.filter(user=user).order_by("-created_at")),
+        ("worker bookings", Booking.objects.filter(worker=worker).order_by("-created_at")),
+        ("worker completed jobs", Booking.objects.filter(worker=worker, status="completed")),
+        ("admin bookings by status", Booking.objects.filter(status="pending").order_by("-created_at")),
+        ("admin revenue this month", Booking.objects.filter(
+            payment_status="paid", created_at__gte=month_start,
+        )),
+        ("payment by session", Payment.objects.filter(
+            booking=booking, stripe_session_id=payment.stripe_session_id,
+        )),
+        ("payment by intent", Payment.objects.filter(
+            stripe_payment_intent_id=payment.stripe_payment_intent_id,
+        )),
+        ("admin payments", Payment.objects.order_by("-created_at")),
+        ("checkout by payment intent", CheckoutSession.objects.filter(
+            Q(stripe_payment_intent_id=payment.stripe_payment_intent_id) | Q(pk=booking.pk),
+        )),
+    ]
+
+
+def sequential_scans(plan, vendor):
+    """Plan lines that read a whole table rather than an index."""
+    lines = plan.splitlines()
+    if vendor == "sqlite":
+        # "SCAN <table>" without "USING ... INDEX" is a full table scan;
+        # "SEARCH" and "SCAN ... USING INDEX" both go through an index
+        return [line.strip() for line in lines if " SCAN " in f" {line} " and " USING " not in line]
+    return [line.strip() for line in lines if "Seq Scan" in line]
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the hot Booking/Payment queries against a seeded database and "
+        "fail if any of them falls back to a sequential scan"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, default=5000,
+            help="Bookings to seed before explaining (default: 5000)",
+        )
+        parser.add_argument(
+            "--no-seed", action="store_true",
+            help="Explain against the existing data instead of seeding",
+        )
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in ("sqlite", "postgresql"):
+            raise CommandError(f"Query plan checks are not supported on {vendor}")
+
+        failures = []
+        # Seeded rows only live inside this transaction and are rolled back
+        with transaction.atomic():
+            if options["no_seed"]:
+                sample = self.existing_sample()
+            else:
+                sample = self.seed(options["rows"])
+
+            with connection.cursor() as cursor:
+                if vendor == "postgresql":
+                    # Make the planner pick an index whenever one is usable, so a
+                    # seq scan in the plan means no index covers the query
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+                else:
+                    cursor.execute("ANALYZE")
+
+            for label, queryset in hot_queries(*sample):
+                scans = sequential_scans(queryset.explain(), vendor)
+                if scans:
+                    failures.append(label)
+                    self.stdout.write(self.style.ERROR(f"SEQ SCAN  {label}: {'; '.join(scans)}"))
+                else:
+                    self.stdout.write(f"ok        {label}")
+
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f"{len(failures)} query plan(s) use a sequential scan: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("All hot queries use an index"))
+
+    def existing_sample(self):
+        payment = Payment.objects.select_related("booking__user", "booking__worker").first()
+        if payment is None:
+            raise CommandError("No payments to explain against; run without --no-seed")
+        booking = payment.booking
+        return booking.user, booking.worker, booking, payment
+
+    def seed(self, rows):
+        rng = random.Random(0)
+        worker_count = max(rows // 50, 2)
+        user_count = max(rows // 10, 2)
+        tag = timezone.now().strftime("%Y%m%d%H%M%S%f")
+
+        profession = Profession.objects.create(name=f"plan-check-{tag}", slug=f"plan-check-{tag}")
+        users = CustomerUser.objects.bulk_create(
+            CustomerUser(username=f"plan-check-{tag}-{i}", role="user") for i in range(user_count)
+        )
+        workers = Worker.objects.bulk_create(
+            Worker(name=f"Worker {i}", phone="0000000000", profession=profession)
+            for i in range(worker_count)
+        )
+        services = WorkerService.objects.bulk_create(
+            WorkerService(worker=worker, services="Service", price=Decimal("500.00"))
+            for worker in workers
+        )
+
+        statuses = [choice for choice, _ in Booking.STATUS_CHOICES]
+        payment_statuses = [choice for choice, _ in Booking.PAYMENT_STATUS_CHOICES]
+        today = date.today()
+        bookings = []
+        for i in range(rows):
+            index = rng.randrange(worker_count)
+            bookings.append(Booking(
+                user=users[rng.randrange(user_count)],
+                worker=workers[index],
+                service=services[index],
+                date=today + timedelta(days=rng.randrange(-180, 180)),
+                time="10:00",
+                status=rng.choice(statuses),
+                payment_status=rng.choice(payment_statuses),
+                amount=Decimal("500.00"),
+                stripe_checkout_session_id=f"cs_plan_{tag}_{i}",
+            ))
+        bookings = Booking.objects.bulk_create(bookings, batch_size=1000)
+
+        payments = Payment.objects.bulk_create(
+            (
+                Payment(
+                    booking=booking,
+                    user=booking.user,
+                    worker=booking.worker,
+                    amount=booking.amount,
+                    payment_status="paid",
+                    stripe_session_id=booking.stripe_checkout_session_id,
+                    stripe_payment_intent_id=f"pi_plan_{tag}_{i}",
+                )
+                for i, booking in enumerate(bookings)
+                if booking.payment_status == "paid"
+            ),
+            batch_size=1000,
+        )
+        CheckoutSession.objects.bulk_create(
+            (
+                CheckoutSession(
+                    user=payment.user,
+                    booking=payment.booking,
+                    stripe_session_id=payment.stripe_session_id,
+                    stripe_payment_intent_id=payment.stripe_payment_intent_id,
+                )
+                for payment in payments
+            ),
+            batch_size=1000,
+        )
+        WorkerDayOccupancy.objects.bulk_create(
+            (
+                WorkerDayOccupancy(worker=booking.worker, date=booking.date, booking=booking)
+                for booking in bookings
+                if booking.status in availability.ACTIVE_BOOKING_STATUSES
+            ),
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+        booking = payments[0].booking if payments else bookings[0]
+        payment = payments[0] if payments else Payment(stripe_session_id="", stripe_payment_intent_id="")
+        return booking.user, booking.worker, booking, payment
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from HomeApp import availability
+
+
+class Command(BaseCommand):
+    help = "Delete expired checkout slot holds, freeing their worker-days"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval", type=int, default=0,
+            help="Keep running, sweeping every INTERVAL seconds (default: sweep once)",
+        )
+
+    def handle(self, *args, **options):
+        interval = options["interval"]
+        while True:
+            count = availability.expire_holds()
+            self.stdout.write(self.style.SUCCESS(f"Expired {count} slot hold(s)"))
+            if interval <= 0:
+                break
+            time.sleep(interval)
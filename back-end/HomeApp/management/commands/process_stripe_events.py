@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from HomeApp import webhooks
+from HomeApp.models import StripeEvent
+
+
+class Command(BaseCommand):
+    help = "Apply stored Stripe webhook events on a pool of worker threads, retrying failures"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=4,
+            help="Events applied concurrently (default: 4)",
+        )
+        parser.add_argument(
+            "--batch", type=int, default=50,
+            help="Events claimed per round (default: 50)",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=0,
+            help="Keep running, polling every INTERVAL seconds when idle (default: drain once)",
+        )
+        parser.add_argument(
+            "--status", action="store_true",
+            help="Print the inbox counts and any stuck or failed events, then exit",
+        )
+        parser.add_argument(
+            "--retry", nargs="*", metavar="EVENT_ID",
+            help="Requeue the given Stripe event ids, or every failed event if none are given",
+        )
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1 or options["batch"] < 1:
+            raise CommandError("--workers and --batch must be at least 1")
+
+        if options["status"]:
+            self.print_status()
+            return
+
+        if options["retry"] is not None:
+            events = StripeEvent.objects.filter(status="failed")
+            if options["retry"]:
+                events = StripeEvent.objects.filter(event_id__in=options["retry"])
+            self.stdout.write(self.style.SUCCESS(f"Requeued {webhooks.retry(events)} event(s)"))
+            return
+
+        interval = options["interval"]
+        while True:
+            results = webhooks.process_due(options["workers"], options["batch"])
+            if results:
+                self.stdout.write(", ".join(f"{count} {outcome}" for outcome, count in sorted(results.items())))
+            elif interval <= 0:
+                break
+            else:
+                time.sleep(interval)
+
+    def print_status(self):
+        summary = webhooks.summary()
+        self.stdout.write(", ".join(f"{count} {name}" for name, count in summary["counts"].items()))
+        if summary["oldest_pending_seconds"] is not None:
+            self.stdout.write(f"Oldest pending event received {summary['oldest_pending_seconds']}s ago")
+
+        for label, events in (("STUCK", webhooks.stuck()), ("FAILED", StripeEvent.objects.filter(status="failed"))):
+            for event in events.order_by("received_at")[:20]:
+                self.stdout.write(self.style.ERROR(
+                    f"{label:<7} {event.event_id} {event.type} attempts={event.attempts} {event.last_error}"
+                ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from HomeApp import availability
+
+
+class Command(BaseCommand):
+    help = "Rebuild the worker-day occupancy table from active bookings"
+
+    def handle(self, *args, **options):
+        count = availability.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"{count} occupied worker-day(s)"))
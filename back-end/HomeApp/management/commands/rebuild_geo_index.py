@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from HomeApp import geo
+
+
+class Command(BaseCommand):
+    help = "Rebuild the worker proximity grid from Worker latitude/longitude"
+
+    def handle(self, *args, **options):
+        count = geo.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} worker location(s)"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from HomeApp import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the worker full-text search index from the catalog tables"
+
+    def handle(self, *args, **options):
+        count = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} worker(s)"))
@@ -0,0 +1,52 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from HomeApp import response_cache
+from HomeApp.models import Worker, WorkerRating
+
+
+class Command(BaseCommand):
+    help = "Recompute Worker.rating_sum / rating_count / rating from WorkerRating in bulk"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        # One grouped query for every worker that has ratings
+        totals = {
+            row["worker_id"]: (row["total"], row["count"])
+            for row in WorkerRating.objects.values("worker_id").annotate(
+                total=Sum("rating"), count=Count("id")
+            )
+        }
+
+        changed = []
+        for worker in Worker.objects.only("id", "rating", "rating_sum", "rating_count").iterator(chunk_size=batch_size):
+            rating_sum, rating_count = totals.get(worker.id, (0, 0))  # pyright: ignore
+            rating = (
+                (Decimal(rating_sum) / Decimal(rating_count)).quantize(Decimal("0.01"))
+                if rating_count else Decimal("0.00")
+            )
+            if (worker.rating_sum, worker.rating_count, worker.rating) == (rating_sum, rating_count, rating):
+                continue
+            worker.rating_sum = rating_sum
+            worker.rating_count = rating_count
+            worker.rating = rating
+            changed.append(worker)
+
+        with transaction.atomic():
+            Worker.objects.bulk_update(
+                changed, ["rating_sum", "rating_count", "rating"], batch_size=batch_size
+            )
+            # bulk_update skips the post_save signals that drop cached profiles and listings
+            if changed:
+                response_cache.invalidate(
+                    response_cache.WORKER_LIST_TAG, *(response_cache.worker_tag(worker.pk) for worker in changed)
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Updated rating aggregates for {len(changed)} worker(s)"))
@@ -0,0 +1,77 @@
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from HomeApp import payments, reconciliation
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare Stripe Checkout Sessions with local bookings and payments, fix "
+        "what drifted and report what needs a person"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=30,
+            help="Check sessions created in the last DAYS days (default: 30)",
+        )
+        parser.add_argument("--since", help="Check sessions created on or after this date (YYYY-MM-DD)")
+        parser.add_argument("--until", help="Check sessions created before this date (YYYY-MM-DD)")
+        parser.add_argument(
+            "--page-size", type=int, default=100,
+            help="Sessions fetched from Stripe per request, at most 100 (default: 100)",
+        )
+        parser.add_argument(
+            "--chunk", type=int, default=500,
+            help="Sessions compared and fixed per database round (default: 500)",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Report mismatches without fixing them")
+        parser.add_argument(
+            "--show", type=int, default=20,
+            help="Mismatches to list individually (default: 20)",
+        )
+
+    def parse_day(self, value, option):
+        try:
+            day = datetime.strptime(value, "%Y-%m-%d")
+        except ValueError:
+            raise CommandError(f"{option} must be a date in YYYY-MM-DD format")
+        return timezone.make_aware(day)
+
+    def handle(self, *args, **options):
+        if not 1 <= options["page_size"] <= 100:
+            raise CommandError("--page-size must be between 1 and 100")
+        if options["chunk"] < 1:
+            raise CommandError("--chunk must be at least 1")
+
+        until = self.parse_day(options["until"], "--until") if options["until"] else None
+        if options["since"]:
+            since = self.parse_day(options["since"], "--since")
+        else:
+            since = timezone.now() - timedelta(days=options["days"])
+
+        started = time.perf_counter()
+        report = reconciliation.reconcile(
+            payments.iter_checkout_sessions(since, until, options["page_size"]),
+            apply=not options["dry_run"],
+            chunk_size=options["chunk"],
+            keep=max(options["show"], 0),
+        )
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"Checked {report.sessions} session(s) in {elapsed:.1f}s")
+        verb = "would fix" if options["dry_run"] else "fixed"
+        for kind, count in sorted(report.counts.items()):
+            label = verb if kind in reconciliation.FIXED else "needs review"
+            style = self.style.WARNING if kind in reconciliation.FIXED else self.style.ERROR
+            self.stdout.write(style(f"{kind:<22} {count:>6}  ({label})"))
+        for kind, session_id, booking_id in report.mismatches:
+            self.stdout.write(f"  {kind:<22} {session_id} booking={booking_id}")
+        if report.mismatches and report.unlisted:
+            self.stdout.write(f"  ... and {report.unlisted} more")
+
+        if not report.counts:
+            self.stdout.write(self.style.SUCCESS("Payments match Stripe"))
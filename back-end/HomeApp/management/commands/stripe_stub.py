@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from HomeApp.stripe_stub import StubStripeServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve a local stand-in for the Stripe Checkout API; point STRIPE_API_BASE "
+        "at it to run the payment flow offline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1", help="Address to bind (default: 127.0.0.1)")
+        parser.add_argument("--port", type=int, default=12111, help="Port to listen on (default: 12111)")
+        parser.add_argument(
+            "--auto-pay", action="store_true",
+            help="Mark every Checkout Session paid as soon as it is created",
+        )
+        parser.add_argument(
+            "--webhook-url",
+            help="Post signed checkout.session.completed events here, e.g. "
+                 "http://127.0.0.1:8000/payments/stripe/webhook/",
+        )
+
+    def handle(self, *args, **options):
+        server = StubStripeServer(
+            (options["host"], options["port"]),
+            auto_pay=options["auto_pay"],
+            webhook_url=options["webhook_url"],
+            webhook_secret=getattr(settings, "STRIPE_WEBHOOK_SECRET", None),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Stripe stub listening on {server.url}"))
+        self.stdout.write(f"Run the app with STRIPE_API_BASE={server.url} STRIPE_SECRET_KEY=sk_test_stub")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
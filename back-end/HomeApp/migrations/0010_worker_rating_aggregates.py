@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:07
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Worker = apps.get_model('HomeApp', 'Worker')
+    WorkerRating = apps.get_model('HomeApp', 'WorkerRating')
+    totals = WorkerRating.objects.values('worker_id').annotate(total=Sum('rating'), count=Count('id'))
+    for row in totals:
+        Worker.objects.filter(pk=row['worker_id']).update(
+            rating_sum=row['total'],
+            rating_count=row['count'],
+            rating=(Decimal(row['total']) / Decimal(row['count'])).quantize(Decimal('0.01')),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HomeApp', '0009_enforce_minimum_service_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='worker',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='worker',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from HomeApp import search
+    search.create_index(schema_editor)
+
+    # Populate the index for the existing catalog
+    Worker = apps.get_model('HomeApp', 'Worker')
+    WorkerService = apps.get_model('HomeApp', 'WorkerService')
+    services = {}
+    for worker_id, name in WorkerService.objects.values_list('worker_id', 'services'):
+        services.setdefault(worker_id, []).append(name)
+
+    vendor = schema_editor.connection.vendor
+    for worker in Worker.objects.select_related('profession'):
+        row = [
+            worker.pk,
+            worker.name or '',
+            worker.profession.name,
+            ' '.join(services.get(worker.pk, [])),
+            worker.location or '',
+            worker.bio or '',
+        ]
+        if vendor == 'sqlite':
+            schema_editor.execute(
+                f"INSERT INTO {search.SQLITE_TABLE} (rowid, name, profession, services, location, bio) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                row,
+            )
+        elif vendor == 'postgresql':
+            schema_editor.execute(
+                f"INSERT INTO {search.POSTGRES_TABLE} (worker_id, document) VALUES (%s, "
+                "setweight(to_tsvector('simple', %s), 'A') || "
+                "setweight(to_tsvector('simple', %s), 'B') || "
+                "setweight(to_tsvector('simple', %s), 'B') || "
+                "setweight(to_tsvector('simple', %s), 'C') || "
+                "setweight(to_tsvector('simple', %s), 'D'))",
+                row,
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    from HomeApp import search
+    search.drop_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HomeApp', '0010_worker_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, reverse_code=drop_search_index),
+    ]
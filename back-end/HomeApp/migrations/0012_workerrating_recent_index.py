@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HomeApp', '0011_worker_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workerrating',
+            index=models.Index(fields=['worker', '-created_at', '-id'], name='workerrating_worker_recent'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:13
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HomeApp', '0012_workerrating_recent_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='worker',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(90)]),
+        ),
+        migrations.AddField(
+            model_name='worker',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-180), django.core.validators.MaxValueValidator(180)]),
+        ),
+        migrations.CreateModel(
+            name='WorkerGeoCell',
+            fields=[
+                ('worker', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='geo_cell', serialize=False, to='HomeApp.worker')),
+                ('cell_lat', models.IntegerField()),
+                ('cell_lng', models.IntegerField()),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('profession', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='HomeApp.profession')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['cell_lat', 'cell_lng'], name='workergeocell_cell')],
+            },
+        ),
+    ]
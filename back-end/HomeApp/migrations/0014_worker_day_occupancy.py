@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_occupancy(apps, schema_editor):
+    Booking = apps.get_model('HomeApp', 'Booking')
+    WorkerDayOccupancy = apps.get_model('HomeApp', 'WorkerDayOccupancy')
+    # The earliest active booking keeps a day that was double-booked before the constraint
+    claimed = {}
+    active = (
+        Booking.objects.filter(status__in=['pending', 'confirmed', 'accepted'])
+        .order_by('created_at', 'id')
+        .values_list('id', 'worker_id', 'date')
+    )
+    for booking_id, worker_id, day in active:
+        claimed.setdefault((worker_id, day), booking_id)
+    WorkerDayOccupancy.objects.bulk_create(
+        [
+            WorkerDayOccupancy(worker_id=worker_id, date=day, booking_id=booking_id)
+            for (worker_id, day), booking_id in claimed.items()
+        ],
+        batch_size=500,
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HomeApp', '0013_worker_geo_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkerDayOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('booking', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='occupancy', to='HomeApp.booking')),
+                ('worker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupied_days', to='HomeApp.worker')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('worker', 'date'), name='unique_worker_day_occupancy')],
+            },
+        ),
+        migrations.RunPython(backfill_occupancy, migrations.RunPython.noop),
+    ]
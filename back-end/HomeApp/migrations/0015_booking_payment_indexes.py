@@ -0,0 +1,66 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:17
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def drop_duplicate_payments(apps, schema_editor):
+    Payment = apps.get_model('HomeApp', 'Payment')
+    # Keep the first record of every (session, booking) pair seen more than once
+    duplicates = (
+        Payment.objects.filter(stripe_session_id__isnull=False)
+        .values('stripe_session_id', 'booking_id')
+        .annotate(first_id=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for row in duplicates:
+        Payment.objects.filter(
+            stripe_session_id=row['stripe_session_id'], booking_id=row['booking_id']
+        ).exclude(pk=row['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HomeApp', '0014_worker_day_occupancy'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['worker', 'date', 'status'], name='booking_worker_day_status'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', '-created_at'], name='booking_user_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['worker', '-created_at'], name='booking_worker_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', '-created_at'], name='booking_status_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['payment_status', 'created_at'], name='booking_payment_created'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['stripe_checkout_session_id'], name='booking_checkout_session'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['stripe_payment_intent_id'], name='payment_intent'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['-created_at'], name='payment_recent'),
+        ),
+        migrations.RunPython(drop_duplicate_payments, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='payment',
+            constraint=models.UniqueConstraint(condition=models.Q(('stripe_session_id__isnull', False)), fields=('stripe_session_id', 'booking'), name='unique_payment_session_booking'),
+        ),
+    ]
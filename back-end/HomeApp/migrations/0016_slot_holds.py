@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HomeApp', '0015_booking_payment_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='workerdayoccupancy',
+            name='booking',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='occupancy', to='HomeApp.booking'),
+        ),
+        migrations.CreateModel(
+            name='SlotHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('stripe_session_id', models.CharField(blank=True, max_length=255, null=True, unique=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_holds', to=settings.AUTH_USER_MODEL)),
+                ('worker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_holds', to='HomeApp.worker')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='workerdayoccupancy',
+            name='hold',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='occupancy', to='HomeApp.slothold'),
+        ),
+        migrations.AddConstraint(
+            model_name='workerdayoccupancy',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('booking__isnull', False), ('hold__isnull', True)), models.Q(('booking__isnull', True), ('hold__isnull', False)), _connector='OR'), name='occupancy_booking_or_hold'),
+        ),
+    ]
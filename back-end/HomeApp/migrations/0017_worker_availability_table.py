@@ -0,0 +1,58 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:22
+
+import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_availability_dates(apps, schema_editor):
+    Worker = apps.get_model('HomeApp', 'Worker')
+    WorkerAvailability = apps.get_model('HomeApp', 'WorkerAvailability')
+    rows = []
+    for worker_id, dates in Worker.objects.exclude(availability_dates=[]).values_list('id', 'availability_dates'):
+        days = set()
+        for raw in dates or ():
+            try:
+                days.add(datetime.date.fromisoformat(str(raw)[:10]))
+            except ValueError:
+                continue
+        rows.extend(WorkerAvailability(worker_id=worker_id, date=day) for day in days)
+    WorkerAvailability.objects.bulk_create(rows, batch_size=500)
+
+
+def copy_back_availability_dates(apps, schema_editor):
+    Worker = apps.get_model('HomeApp', 'Worker')
+    WorkerAvailability = apps.get_model('HomeApp', 'WorkerAvailability')
+    dates = {}
+    for worker_id, day in WorkerAvailability.objects.order_by('date').values_list('worker_id', 'date'):
+        dates.setdefault(worker_id, []).append(day.isoformat())
+    for worker_id, days in dates.items():
+        Worker.objects.filter(pk=worker_id).update(availability_dates=days)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HomeApp', '0016_slot_holds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkerAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('worker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='available_days', to='HomeApp.worker')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'worker'], name='workeravailability_date')],
+                'constraints': [models.UniqueConstraint(fields=('worker', 'date'), name='unique_worker_available_day')],
+            },
+        ),
+        migrations.RunPython(copy_availability_dates, copy_back_availability_dates),
+        migrations.RemoveField(
+            model_name='worker',
+            name='availability_dates',
+        ),
+    ]
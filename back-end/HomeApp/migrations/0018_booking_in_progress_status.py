@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HomeApp', '0017_worker_availability_table'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booking',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('accepted', 'Accepted'), ('in_progress', 'In Progress'), ('declined', 'Declined'), ('completed', 'Completed'), ('canceled', 'Canceled')], default='pending', max_length=20),
+        ),
+    ]
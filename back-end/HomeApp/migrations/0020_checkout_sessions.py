@@ -0,0 +1,59 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def record_existing_sessions(apps, schema_editor):
+    Booking = apps.get_model('HomeApp', 'Booking')
+    CheckoutSession = apps.get_model('HomeApp', 'CheckoutSession')
+    Payment = apps.get_model('HomeApp', 'Payment')
+    SlotHold = apps.get_model('HomeApp', 'SlotHold')
+
+    intents = dict(
+        Payment.objects.exclude(stripe_session_id=None)
+        .exclude(stripe_payment_intent_id=None)
+        .values_list('stripe_session_id', 'stripe_payment_intent_id')
+    )
+    seen_sessions, seen_intents, rows = set(), set(), []
+
+    def add(session_id, **links):
+        intent_id = intents.get(session_id)
+        if session_id in seen_sessions:
+            return
+        if intent_id in seen_intents:
+            intent_id = None
+        seen_sessions.add(session_id)
+        seen_intents.add(intent_id)
+        rows.append(CheckoutSession(stripe_session_id=session_id, stripe_payment_intent_id=intent_id, **links))
+
+    bookings = Booking.objects.exclude(stripe_checkout_session_id=None).exclude(stripe_checkout_session_id='')
+    for pk, user_id, session_id in bookings.order_by('pk').values_list('pk', 'user_id', 'stripe_checkout_session_id'):
+        add(session_id, booking_id=pk, user_id=user_id)
+    for pk, user_id, session_id in SlotHold.objects.exclude(stripe_session_id=None).values_list('pk', 'user_id', 'stripe_session_id'):
+        add(session_id, hold_id=pk, user_id=user_id)
+    CheckoutSession.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HomeApp', '0019_stripe_event_inbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckoutSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stripe_session_id', models.CharField(blank=True, max_length=255, null=True, unique=True)),
+                ('stripe_payment_intent_id', models.CharField(blank=True, max_length=255, null=True, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('booking', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='checkout_sessions', to='HomeApp.booking')),
+                ('hold', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='checkout_sessions', to='HomeApp.slothold')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkout_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(record_existing_sessions, migrations.RunPython.noop),
+    ]
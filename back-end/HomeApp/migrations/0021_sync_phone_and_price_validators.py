@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:51
+
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('HomeApp', '0020_checkout_sessions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userprofile',
+            name='phone',
+            field=models.CharField(blank=True, max_length=15, null=True, validators=[django.core.validators.RegexValidator(message='Phone number must be exactly 10 digits.', regex='^\\d{10}$')]),
+        ),
+        migrations.AlterField(
+            model_name='worker',
+            name='phone',
+            field=models.CharField(max_length=15, validators=[django.core.validators.RegexValidator(message='Phone number must be exactly 10 digits.', regex='^\\d{10}$')]),
+        ),
+        migrations.AlterField(
+            model_name='workerservice',
+            name='price',
+            field=models.DecimalField(decimal_places=2, default=Decimal('100.00'), max_digits=8, validators=[django.core.validators.MinValueValidator(Decimal('100.00'))]),
+        ),
+    ]
@@ -1,7 +1,8 @@
 from django.db import models
+from django.db.models import F
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth import get_user_model
-from django.core.validators import MinValueValidator, RegexValidator
+from django.core.validators import MaxValueValidator, MinValueValidator, RegexValidator
 from django.conf import settings
 from django.utils.text import slugify
 from decimal import Decimal
@@ -72,14 +73,53 @@ class Worker(models.Model):
     bio = models.TextField(blank=True, null=True)
     email = models.EmailField(max_length=255, unique=True, blank=True, null=True)
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.0)  # example: 4.50
+    rating_sum = models.PositiveIntegerField(default=0)  # running total of WorkerRating.rating
+    rating_count = models.PositiveIntegerField(default=0)  # number of WorkerRating rows
     review = models.TextField(blank=True, null=True)  # user reviews / feedback
     location = models.CharField(max_length=255, blank=True, null=True)  # e.g. "Bangalore"
     is_active = models.BooleanField(default=True)
-    availability_dates = models.JSONField(default=list, blank=True)
+    latitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)]
+    )
+    longitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)]
+    )
 
     def __str__(self):
         return self.name
 
+    @property
+    def average_rating(self):
+        """Average star rating rounded to one decimal, read from the maintained aggregates."""
+        if not self.rating_count:
+            return 0
+        return round(self.rating_sum / self.rating_count, 1)
+
+    def apply_rating(self, new_rating, previous_rating=None):
+        """
+        Fold a new or changed WorkerRating into rating_sum / rating_count.
+        Must be called inside the same transaction that wrote the rating.
+        """
+        delta_sum = new_rating - (previous_rating or 0)
+        delta_count = 0 if previous_rating is not None else 1
+        self._adjust_rating(delta_sum, delta_count)
+
+    def remove_rating(self, rating):
+        """Take a deleted WorkerRating back out of rating_sum / rating_count."""
+        self._adjust_rating(-rating, -1)
+
+    def _adjust_rating(self, delta_sum, delta_count):
+        Worker.objects.filter(pk=self.pk).update(
+            rating_sum=F("rating_sum") + delta_sum,
+            rating_count=F("rating_count") + delta_count,
+        )
+        self.refresh_from_db(fields=["rating_sum", "rating_count"])
+
+        self.rating = (
+            Decimal(self.rating_sum) / Decimal(self.rating_count)
+        ).quantize(Decimal("0.01")) if self.rating_count else Decimal("0.00")
+        Worker.objects.filter(pk=self.pk).update(rating=self.rating)
+
 class WorkerService(models.Model):
     worker = models.ForeignKey(Worker,on_delete=models.CASCADE, related_name='services')
     services = models.CharField(max_length=100)
@@ -99,6 +139,27 @@ class WorkerService(models.Model):
     def __str__(self):
         return self.services
     
+class WorkerGeoCell(models.Model):
+    """
+    Spatial grid index for workers with coordinates: one row per worker,
+    keyed by the fixed-size lat/long cell it falls in (see HomeApp.geo).
+    """
+    worker = models.OneToOneField(Worker, on_delete=models.CASCADE, primary_key=True, related_name="geo_cell")
+    profession = models.ForeignKey(Profession, on_delete=models.CASCADE, related_name="+")
+    cell_lat = models.IntegerField()
+    cell_lng = models.IntegerField()
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["cell_lat", "cell_lng"], name="workergeocell_cell"),
+        ]
+
+    def __str__(self):
+        return f"{self.worker_id} @ ({self.cell_lat}, {self.cell_lng})"  # pyright: ignore
+
+
 class WorkerRating(models.Model):
     worker = models.ForeignKey(Worker, related_name="ratings", on_delete=models.CASCADE)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -108,6 +169,10 @@ class WorkerRating(models.Model):
 
     class Meta:
         unique_together = ("worker", "user")
+        indexes = [
+            # Serves the keyset seek and sort of a worker's newest reviews
+            models.Index(fields=["worker", "-created_at", "-id"], name="workerrating_worker_recent"),
+        ]
 
 # models.py
 class Booking(models.Model):
@@ -115,6 +180,7 @@ class Booking(models.Model):
         ("pending", "Pending"),
         ("confirmed", "Confirmed"),
         ("accepted", "Accepted"),
+        ("in_progress", "In Progress"),
         ("declined", "Declined"),   
         ("completed", "Completed"),
         ("canceled", "Canceled"),
@@ -159,9 +225,112 @@ class Booking(models.Model):
     stripe_checkout_session_id = models.CharField(max_length=255, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Conflict checks and a worker's jobs in a given status
+            models.Index(fields=["worker", "date", "status"], name="booking_worker_day_status"),
+            # "My bookings" lists, newest first
+            models.Index(fields=["user", "-created_at"], name="booking_user_recent"),
+            models.Index(fields=["worker", "-created_at"], name="booking_worker_recent"),
+            # Admin dashboard counts and revenue
+            models.Index(fields=["status", "-created_at"], name="booking_status_recent"),
+            models.Index(fields=["payment_status", "created_at"], name="booking_payment_created"),
+            models.Index(fields=["stripe_checkout_session_id"], name="booking_checkout_session"),
+        ]
+
     def __str__(self):
         return f"Booking {self.id} - {self.user.username} → {self.worker.name}"
 
+class WorkerAvailability(models.Model):
+    """
+    A day the worker has said they can work. A worker with no rows at all
+    has not published a schedule and can be booked on any day.
+    """
+    worker = models.ForeignKey(Worker, on_delete=models.CASCADE, related_name="available_days")
+    date = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["worker", "date"], name="unique_worker_available_day"),
+        ]
+        indexes = [
+            # "Who is available on this day" lookups from the catalog
+            models.Index(fields=["date", "worker"], name="workeravailability_date"),
+        ]
+
+    def __str__(self):
+        return f"{self.worker_id} available on {self.date}"  # pyright: ignore
+
+
+class SlotHold(models.Model):
+    """
+    A worker-day reserved while the user pays on Stripe Checkout. It is
+    turned into a Booking on confirm, or deleted once `expires_at` passes.
+    """
+    worker = models.ForeignKey(Worker, on_delete=models.CASCADE, related_name="slot_holds")
+    date = models.DateField()
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="slot_holds")
+    stripe_session_id = models.CharField(max_length=255, unique=True, blank=True, null=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Hold on {self.worker_id} for {self.date} until {self.expires_at}"  # pyright: ignore
+
+
+class CheckoutSession(models.Model):
+    """
+    Local record of a Stripe Checkout Session and what it pays for: an
+    existing booking, or the day held for a booking made on confirm. The
+    row is written before the session is created and its id travels in the
+    PaymentIntent's metadata, so payment_intent events resolve to a booking
+    without asking Stripe. The intent id is filled in once it is known.
+    """
+    stripe_session_id = models.CharField(max_length=255, unique=True, blank=True, null=True)
+    stripe_payment_intent_id = models.CharField(max_length=255, unique=True, blank=True, null=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="checkout_sessions")
+    booking = models.ForeignKey(
+        Booking, on_delete=models.CASCADE, related_name="checkout_sessions", null=True, blank=True
+    )
+    hold = models.ForeignKey(
+        SlotHold, on_delete=models.SET_NULL, related_name="checkout_sessions", null=True, blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Checkout {self.stripe_session_id} for booking {self.booking_id}"  # pyright: ignore
+
+
+class WorkerDayOccupancy(models.Model):
+    """
+    One row per worker-day taken by an active booking or an unexpired
+    checkout hold (see HomeApp.availability). The unique (worker, date)
+    pair makes a conflict check a single index lookup.
+    """
+    worker = models.ForeignKey(Worker, on_delete=models.CASCADE, related_name="occupied_days")
+    date = models.DateField()
+    booking = models.OneToOneField(
+        Booking, on_delete=models.CASCADE, related_name="occupancy", null=True, blank=True
+    )
+    hold = models.OneToOneField(
+        SlotHold, on_delete=models.CASCADE, related_name="occupancy", null=True, blank=True
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["worker", "date"], name="unique_worker_day_occupancy"),
+            models.CheckConstraint(
+                condition=(
+                    models.Q(booking__isnull=False, hold__isnull=True)
+                    | models.Q(booking__isnull=True, hold__isnull=False)
+                ),
+                name="occupancy_booking_or_hold",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.worker_id} busy on {self.date}"  # pyright: ignore
+
 class Payment(models.Model):
     PAYMENT_STATUS_CHOICES = (
         ("pending", "Pending"),
@@ -180,9 +349,58 @@ class Payment(models.Model):
     paid_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            # One payment record per booking per Checkout Session, however
+            # many times the webhook and the confirm endpoint see it
+            models.UniqueConstraint(
+                fields=["stripe_session_id", "booking"],
+                condition=models.Q(stripe_session_id__isnull=False),
+                name="unique_payment_session_booking",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["stripe_payment_intent_id"], name="payment_intent"),
+            models.Index(fields=["-created_at"], name="payment_recent"),
+        ]
+
     def __str__(self):
         return f"Payment {self.id} for Booking {self.booking.id} - {self.payment_status}"
 
 
 
 
+
+
+class StripeEvent(models.Model):
+    """
+    A verified Stripe webhook event waiting to be (or already) applied.
+    The webhook only stores the event and returns; HomeApp.webhooks
+    processes the inbox with retries. `event_id` is unique, so Stripe
+    redelivering an event is a no-op.
+    """
+    STATUS_CHOICES = (
+        ("pending", "Pending"),
+        ("processing", "Processing"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    )
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(blank=True, null=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="stripeevent_due"),
+        ]
+
+    def __str__(self):
+        return f"{self.type} {self.event_id} - {self.status}"
@@ -0,0 +1,172 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination.
+
+    The cursor carries the sort key of the last row on the page, so fetching
+    page N+1 is an index range scan instead of an OFFSET over N pages.
+    The primary key is always used as a tie-breaker to keep the order stable.
+    """
+
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    # Public ordering name -> model field / annotation. Prefix with "-" in
+    # the query string for descending order.
+    ordering_query_param = None
+    ordering_options = {"id": "pk"}
+    default_ordering = "id"
+
+    def paginate_queryset(self, queryset, request, view=None, first_page=False):
+        """
+        With `first_page`, the query string is ignored and the default first
+        page is returned (for embedding a preview in another endpoint).
+        """
+        self.request = request
+        if first_page:
+            self.limit = self.page_size
+            self.ordering_name, self.field, self.descending = self.resolve_ordering(self.default_ordering)
+            cursor = None
+        else:
+            self.limit = self.get_page_size(request)
+            self.ordering_name, self.field, self.descending = self.get_ordering(request)
+            cursor = self.decode_cursor(request)
+
+        if cursor is not None:
+            value, pk = cursor
+            queryset = queryset.filter(self.seek_filter(self.cursor_value(queryset, value), pk))
+
+        if self.field == "pk":
+            order_by = ["-pk"] if self.descending else ["pk"]
+        else:
+            order_by = [f"-{self.field}", "-pk"] if self.descending else [self.field, "pk"]
+
+        rows = list(queryset.order_by(*order_by)[: self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        rows = rows[: self.limit]
+        self.last_row = rows[-1] if rows else None
+        return rows
+
+    def cursor_value(self, queryset, value):
+        """The cursor's sort value as the ordering field's Python type; cursors are client input."""
+        if self.field == "pk":
+            return None
+        annotation = queryset.query.annotations.get(self.field)
+        field = annotation.output_field if annotation is not None else queryset.model._meta.get_field(self.field)
+        try:
+            value = field.to_python(value)
+        except (TypeError, ValueError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return value
+
+    def seek_filter(self, value, pk):
+        op = "lt" if self.descending else "gt"
+        if self.field == "pk":
+            return Q(**{f"pk__{op}": pk})
+        return Q(**{f"{self.field}__{op}": value}) | Q(**{self.field: value, f"pk__{op}": pk})
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, request):
+        ordering = self.default_ordering
+        if self.ordering_query_param:
+            ordering = request.query_params.get(self.ordering_query_param) or ordering
+        return self.resolve_ordering(ordering)
+
+    def resolve_ordering(self, ordering):
+        descending = ordering.startswith("-")
+        name = ordering.lstrip("-")
+        if name not in self.ordering_options:
+            descending = self.default_ordering.startswith("-")
+            name = self.default_ordering.lstrip("-")
+        return ("-" if descending else "") + name, self.ordering_options[name], descending
+
+    def encode_cursor(self, row):
+        value = None if self.field == "pk" else getattr(row, self.field)
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = str(value)
+        raw = json.dumps([self.ordering_name, value, row.pk], separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            ordering_name, value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        # A cursor is only meaningful for the ordering that produced it
+        if ordering_name != self.ordering_name:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+    def get_next_link(self, base_url=None):
+        if not self.has_next or self.last_row is None:
+            return None
+        url = base_url or self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last_row))
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "results": data,
+        })
+
+
+class WorkerCursorPagination(KeysetPagination):
+    """Public worker catalog: ?ordering=id|rating|price (prefix "-" for descending)."""
+
+    ordering_query_param = "ordering"
+    ordering_options = {
+        "id": "pk",
+        "rating": "rating",
+        "price": "starting_price",
+    }
+    default_ordering = "id"
+
+
+class ReviewPagination(KeysetPagination):
+    """A worker's reviews, newest first, seeking on (created_at, id)."""
+
+    page_size = 10
+    max_page_size = 50
+    ordering_options = {"created_at": "created_at"}
+    default_ordering = "-created_at"
+
+
+class BookingPagination(KeysetPagination):
+    """A user's or worker's bookings: ?ordering=created_at|date, newest booked first by default."""
+
+    ordering_query_param = "ordering"
+    ordering_options = {
+        "created_at": "created_at",
+        "date": "date",
+    }
+    default_ordering = "-created_at"
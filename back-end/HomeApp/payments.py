@@ -0,0 +1,218 @@
+"""
+The one Stripe client the app talks to Stripe through.
+
+Views used to set the process-global `stripe.api_key` on every request and
+go through the SDK's default HTTP client. Here a single StripeClient is
+built from settings and shared: it carries its own API key, reuses
+keep-alive connections from a pooled requests session, gives up on a call
+after STRIPE_TIMEOUT_SECONDS and retries network failures (with an
+idempotency key, so a retried create is not applied twice) up to
+STRIPE_MAX_NETWORK_RETRIES times.
+
+Point STRIPE_API_BASE at `manage.py stripe_stub` to run the payment flow
+without reaching Stripe.
+
+Every session is created through start_checkout(), which records it as a
+CheckoutSession first, so payment_intent events can be traced back to
+their booking from our own tables.
+
+Paid sessions read back on the success page are cached for
+STRIPE_SESSION_CACHE_SECONDS, and single_flight() lets concurrent
+confirmations of one session wait for each other instead of all calling
+Stripe.
+"""
+import math
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import requests
+import stripe
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.db.models import Q
+from django.dispatch import receiver
+
+from .models import CheckoutSession
+
+_lock = threading.Lock()
+_client = None
+
+# Seconds between checks while waiting on another single_flight() holder
+POLL_INTERVAL = 0.05
+
+# The SDK's longest sleep between two network retries
+MAX_RETRY_DELAY_SECONDS = 2
+
+# Time a single_flight() holder may spend on its own work around the Stripe call
+LOCK_MARGIN_SECONDS = 30
+
+
+class StillRunning(Exception):
+    """Another request held the single_flight() lock for the whole wait."""
+
+
+def _build():
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=1, pool_maxsize=settings.STRIPE_HTTP_POOL_SIZE
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    base_addresses = {}
+    if settings.STRIPE_API_BASE:
+        base_addresses = {"api": settings.STRIPE_API_BASE}
+    return stripe.StripeClient(
+        settings.STRIPE_SECRET_KEY,
+        base_addresses=base_addresses,
+        max_network_retries=settings.STRIPE_MAX_NETWORK_RETRIES,
+        http_client=stripe.RequestsClient(timeout=settings.STRIPE_TIMEOUT_SECONDS, session=session),
+    )
+
+
+def client():
+    """The shared StripeClient, built on first use."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = _build()
+    return _client
+
+
+@receiver(setting_changed)
+def _reset_client(setting, **kwargs):
+    global _client
+    if setting.startswith("STRIPE_"):
+        _client = None
+
+
+def create_checkout_session(**params):
+    return client().checkout.sessions.create(params=params)
+
+
+def retrieve_checkout_session(session_id):
+    return client().checkout.sessions.retrieve(session_id)
+
+
+def iter_checkout_sessions(created_gte=None, created_lt=None, page_size=100):
+    """Checkout Sessions created in [created_gte, created_lt) (datetimes), newest first, fetched a page at a time."""
+    created = {}
+    if created_gte is not None:
+        created["gte"] = int(created_gte.timestamp())
+    if created_lt is not None:
+        created["lt"] = int(created_lt.timestamp())
+    params = {"limit": page_size}
+    if created:
+        params["created"] = created
+    return client().checkout.sessions.list(params=params).auto_paging_iter()
+
+
+def retrieve_checkout_session_cached(session_id):
+    """
+    retrieve_checkout_session(), reusing a paid copy fetched in the last
+    STRIPE_SESSION_CACHE_SECONDS. Unpaid sessions are not kept, so a
+    retry sees the payment as soon as it completes.
+    """
+    key = f"stripe-session:{session_id}"
+    session = cache.get(key)
+    if session is None:
+        session = retrieve_checkout_session(session_id)
+        if session.get("payment_status") == "paid":
+            cache.set(key, session, settings.STRIPE_SESSION_CACHE_SECONDS)
+    return session
+
+
+def worst_case_call_seconds():
+    """How long one Stripe call can take with every network retry timing out."""
+    attempts = settings.STRIPE_MAX_NETWORK_RETRIES + 1
+    return math.ceil(
+        settings.STRIPE_TIMEOUT_SECONDS * attempts + MAX_RETRY_DELAY_SECONDS * settings.STRIPE_MAX_NETWORK_RETRIES
+    )
+
+
+@contextmanager
+def single_flight(name):
+    """
+    Run the block for `name` in one request at a time, across processes.
+    Anyone else entering meanwhile waits for the holder to leave, typically
+    finding its result already in place, and raises StillRunning if it has
+    not left within STRIPE_CONFIRM_WAIT_SECONDS. The lock outlives the
+    slowest Stripe call, so it never expires under a holder still running.
+    """
+    key = f"single-flight:{name}"
+    token = uuid.uuid4().hex
+    lock_seconds = worst_case_call_seconds() + LOCK_MARGIN_SECONDS
+    deadline = time.monotonic() + settings.STRIPE_CONFIRM_WAIT_SECONDS
+    while not cache.add(key, token, lock_seconds):
+        if time.monotonic() >= deadline:
+            raise StillRunning(name)
+        time.sleep(POLL_INTERVAL)
+    try:
+        yield
+    finally:
+        if cache.get(key) == token:
+            cache.delete(key)
+
+
+def construct_event(payload, sig_header, secret):
+    """Verify a webhook's signature and parse it; raises ValueError or SignatureVerificationError."""
+    return client().construct_event(payload, sig_header, secret)
+
+
+def start_checkout(user, booking=None, hold=None, **params):
+    """
+    Create a Checkout Session paying for `booking` (or the day `hold`
+    keeps) and record it locally. The record's id is put in the
+    PaymentIntent's metadata as `checkout_id`.
+    """
+    checkout = CheckoutSession.objects.create(user=user, booking=booking, hold=hold)
+    intent_data = params.pop("payment_intent_data", {})
+    intent_data["metadata"] = {**intent_data.get("metadata", {}), "checkout_id": str(checkout.pk)}
+    try:
+        session = create_checkout_session(payment_intent_data=intent_data, **params)
+    except Exception:
+        checkout.delete()
+        raise
+
+    checkout.stripe_session_id = session.id
+    checkout.stripe_payment_intent_id = session.get("payment_intent") or None
+    checkout.save(update_fields=["stripe_session_id", "stripe_payment_intent_id"])
+    return session
+
+
+def record_payment(session_id, payment_intent_id, booking=None):
+    """Note the PaymentIntent a session was paid with and, if it made one, its booking."""
+    changes = {}
+    if payment_intent_id:
+        changes["stripe_payment_intent_id"] = payment_intent_id
+    if booking is not None:
+        changes["booking"] = booking
+    if changes:
+        CheckoutSession.objects.filter(stripe_session_id=session_id).update(**changes)
+
+
+def checkout_for_intent(intent):
+    """
+    The CheckoutSession (with its booking) a PaymentIntent belongs to, or
+    None. One query: by the intent id if we have seen it, else by the
+    `checkout_id` start_checkout put in the intent's metadata.
+    """
+    match = Q()
+    if intent.get("id"):
+        match |= Q(stripe_payment_intent_id=intent["id"])
+    checkout_id = str((intent.get("metadata") or {}).get("checkout_id", ""))
+    # isdigit() alone also passes digits like "²" that int() rejects
+    if checkout_id.isascii() and checkout_id.isdecimal():
+        match |= Q(pk=int(checkout_id))
+    if not match:
+        return None
+    return (
+        CheckoutSession.objects.select_related("booking__user", "booking__worker")
+        .filter(match)
+        .order_by("pk")
+        .first()
+    )
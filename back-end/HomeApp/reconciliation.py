@@ -0,0 +1,200 @@
+"""
+Reconcile local payment records against Stripe Checkout Sessions.
+
+Payment rows are written one at a time by the webhook and by the confirm
+endpoint, so a lost event or a failed request leaves a booking unmarked
+or a payment unrecorded. reconcile() walks the provider's sessions in
+chunks. For each chunk it loads the matching CheckoutSession, Booking and
+Payment rows in one query each, diffs them in memory and writes the fixes
+with bulk_create/bulk_update. Any iterable of session mappings works as
+the provider: `payments.iter_checkout_sessions()` for Stripe (or the
+stub), or a plain list.
+
+Fixed:
+    booking_not_paid        paid session, booking not marked paid
+    payment_missing         paid session, no Payment row for it
+    payment_not_paid        paid session, its Payment row not marked paid
+    checkout_missing        session with a booking but no CheckoutSession row
+    intent_missing          CheckoutSession row without the session's PaymentIntent
+
+Only reported, as they need a person to look at them:
+    paid_without_booking    paid session no booking can be found for
+    paid_locally_only       Payment marked paid for a session Stripe has not been paid on
+"""
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import response_cache
+from .models import Booking, CheckoutSession, Payment
+
+PAID_STATUSES = ("paid", "no_payment_required")
+
+FIXED = ("booking_not_paid", "payment_missing", "payment_not_paid", "checkout_missing", "intent_missing")
+
+
+class Report:
+    """
+    What a reconciliation run found. `counts` covers every mismatch;
+    `mismatches` keeps only the first `keep` as (kind, session_id,
+    booking_id), so a run over months of history stays small.
+    """
+
+    def __init__(self, keep=20):
+        self.sessions = 0
+        self.counts = Counter()
+        self.mismatches = []
+        self.keep = keep
+
+    def add(self, kind, session_id, booking_id=None):
+        self.counts[kind] += 1
+        if len(self.mismatches) < self.keep:
+            self.mismatches.append((kind, session_id, booking_id))
+
+    @property
+    def unlisted(self):
+        return sum(self.counts.values()) - len(self.mismatches)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _metadata_booking_id(session):
+    booking_id = str((session.get("metadata") or {}).get("booking_id", ""))
+    return int(booking_id) if booking_id.isascii() and booking_id.isdecimal() else None
+
+
+def _amount(session, booking):
+    # Stripe amounts are in the currency's minor unit
+    if session.get("amount_total") is not None:
+        return Decimal(session["amount_total"]) / 100
+    return booking.amount
+
+
+def _paid_at(session):
+    created = session.get("created")
+    return datetime.fromtimestamp(created, dt_timezone.utc) if created else timezone.now()
+
+
+def reconcile(sessions, apply=True, chunk_size=500, keep=20):
+    """
+    Diff `sessions` against local rows, fixing what can be fixed unless
+    `apply` is False. The first `keep` mismatches are listed in the report.
+    """
+    report = Report(keep)
+    for chunk in _chunks(sessions, chunk_size):
+        report.sessions += len(chunk)
+        _reconcile_chunk(chunk, report, apply)
+    return report
+
+
+def _reconcile_chunk(sessions, report, apply):
+    session_ids = [session["id"] for session in sessions]
+
+    checkouts = {
+        checkout.stripe_session_id: checkout
+        for checkout in CheckoutSession.objects.filter(stripe_session_id__in=session_ids)
+    }
+    by_session = dict(
+        Booking.objects.filter(stripe_checkout_session_id__in=session_ids)
+        .values_list("stripe_checkout_session_id", "pk")
+    )
+    wanted = {checkout.booking_id for checkout in checkouts.values() if checkout.booking_id}
+    wanted |= {_metadata_booking_id(session) for session in sessions} - {None}
+    wanted |= set(by_session.values())
+    bookings = Booking.objects.only(
+        "id", "user_id", "worker_id", "amount", "payment_status", "payment_mode"
+    ).in_bulk(wanted)
+    payments = {
+        (payment.stripe_session_id, payment.booking_id): payment
+        for payment in Payment.objects.filter(stripe_session_id__in=session_ids)
+    }
+
+    new_checkouts, changed_checkouts = [], []
+    changed_bookings, new_payments, changed_payments = {}, [], []
+
+    for session in sessions:
+        session_id = session["id"]
+        intent_id = session.get("payment_intent") or None
+        checkout = checkouts.get(session_id)
+        booking_id = (
+            (checkout.booking_id if checkout else None)
+            or _metadata_booking_id(session)
+            or by_session.get(session_id)
+        )
+        booking = changed_bookings.get(booking_id) or bookings.get(booking_id)
+
+        if checkout is None and booking is not None:
+            report.add("checkout_missing", session_id, booking.pk)
+            new_checkouts.append(CheckoutSession(
+                stripe_session_id=session_id,
+                stripe_payment_intent_id=intent_id,
+                user_id=booking.user_id,
+                booking=booking,
+            ))
+        elif checkout is not None and intent_id and not checkout.stripe_payment_intent_id:
+            report.add("intent_missing", session_id, booking_id)
+            checkout.stripe_payment_intent_id = intent_id
+            changed_checkouts.append(checkout)
+
+        payment = payments.get((session_id, booking.pk)) if booking else None
+
+        if session.get("payment_status") not in PAID_STATUSES:
+            if payment is not None and payment.payment_status == "paid":
+                report.add("paid_locally_only", session_id, booking.pk)
+            continue
+
+        if booking is None:
+            report.add("paid_without_booking", session_id)
+            continue
+
+        if booking.payment_status != "paid":
+            report.add("booking_not_paid", session_id, booking.pk)
+            booking.payment_status = "paid"
+            # Same as the webhook: a pay-later booking paid online is now "pay now"
+            booking.payment_mode = "now"
+            changed_bookings[booking.pk] = booking
+
+        if payment is None:
+            report.add("payment_missing", session_id, booking.pk)
+            new_payments.append(Payment(
+                booking=booking,
+                user_id=booking.user_id,
+                worker_id=booking.worker_id,
+                amount=_amount(session, booking),
+                currency=session.get("currency") or "inr",
+                payment_status="paid",
+                stripe_session_id=session_id,
+                stripe_payment_intent_id=intent_id,
+                paid_at=_paid_at(session),
+            ))
+        elif payment.payment_status != "paid":
+            report.add("payment_not_paid", session_id, booking.pk)
+            payment.payment_status = "paid"
+            payment.stripe_payment_intent_id = payment.stripe_payment_intent_id or intent_id
+            payment.paid_at = payment.paid_at or _paid_at(session)
+            changed_payments.append(payment)
+
+    if not apply:
+        return
+
+    with transaction.atomic():
+        Booking.objects.bulk_update(changed_bookings.values(), ["payment_status", "payment_mode"], batch_size=500)
+        # ignore_conflicts: the webhook may record the same payment meanwhile
+        Payment.objects.bulk_create(new_payments, batch_size=500, ignore_conflicts=True)
+        Payment.objects.bulk_update(
+            changed_payments, ["payment_status", "stripe_payment_intent_id", "paid_at"], batch_size=500
+        )
+        CheckoutSession.objects.bulk_create(new_checkouts, batch_size=500, ignore_conflicts=True)
+        CheckoutSession.objects.bulk_update(changed_checkouts, ["stripe_payment_intent_id"], batch_size=500)
+
+    # bulk_update skips the post_save signals that would drop cached worker pages
+    for worker_id in {booking.worker_id for booking in changed_bookings.values()}:
+        response_cache.invalidate_worker(worker_id, listing=False)
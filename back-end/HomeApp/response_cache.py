@@ -0,0 +1,122 @@
+"""
+Tag-invalidated cache for read-heavy catalog responses.
+
+Every tag has a version stored in the cache. A cached entry's key embeds
+the current versions of all its tags, so bumping one tag orphans exactly
+the entries that depend on it; they then age out via their TTL.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.views.decorators.http import condition
+
+WORKER_LIST_TAG = "workers"
+PROFESSIONS_TAG = "professions"
+
+
+def worker_tag(worker_id):
+    return f"worker:{worker_id}"
+
+
+def _version_key(tag):
+    return f"tagver:{tag}"
+
+
+def _new_version(previous=None):
+    # Millisecond timestamps, so a version also says when the tag last changed
+    now = int(time.time() * 1000)
+    return max(now, (previous or 0) + 1)
+
+
+def tag_versions(tags):
+    """Current version for each tag, initialising tags the cache has not seen."""
+    keys = {tag: _version_key(tag) for tag in tags}
+    stored = cache.get_many(list(keys.values()))
+    versions = {}
+    for tag, key in keys.items():
+        version = stored.get(key)
+        if version is None:
+            version = _new_version()
+            # add() so a concurrent initialisation or bump wins
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+        versions[tag] = version
+    return versions
+
+
+def _entry_key(name, versions):
+    stamp = ",".join(f"{tag}={versions[tag]}" for tag in sorted(versions))
+    digest = hashlib.sha1(f"{name}|{stamp}".encode()).hexdigest()
+    return f"resp:{digest}"
+
+
+def get_or_set(name, tags, compute, timeout=None):
+    """Return the cached value for `name` under `tags`, computing it on a miss."""
+    key = _entry_key(name, tag_versions(tags))
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, settings.RESPONSE_CACHE_SECONDS if timeout is None else timeout)
+    return value
+
+
+def _bump(tags):
+    for tag in tags:
+        key = _version_key(tag)
+        cache.set(key, _new_version(cache.get(key)), None)
+
+
+def invalidate(*tags):
+    """Bump the given tags once the current transaction (if any) commits."""
+    transaction.on_commit(lambda: _bump(tags))
+
+
+def invalidate_worker(worker_id, listing=True):
+    """Drop a worker's cached profile and, unless told otherwise, every catalog page."""
+    tags = [worker_tag(worker_id)]
+    if listing:
+        tags.append(WORKER_LIST_TAG)
+    invalidate(*tags)
+
+
+def conditional(tags_for):
+    """
+    Conditional GET for a view whose output depends only on `tags_for(**view_kwargs)`.
+
+    The ETag hashes the tag versions with the request URL and Accept header and
+    Last-Modified is the newest tag version, so If-None-Match / If-Modified-Since
+    requests get a 304 without the view (or its serializers) running.
+    `tags_for` returns None when there is nothing to validate against (e.g. the
+    object is missing); the view then runs and answers for itself.
+    """
+    def versions_for(request, kwargs):
+        # condition() asks for the ETag and Last-Modified separately; look the tags up once
+        if not hasattr(request, "_tag_versions"):
+            tags = tags_for(**kwargs)
+            request._tag_versions = None if tags is None else tag_versions(tags)
+        return request._tag_versions
+
+    def etag(request, *args, **kwargs):
+        versions = versions_for(request, kwargs)
+        if versions is None:
+            return None
+        stamp = ",".join(f"{tag}={versions[tag]}" for tag in sorted(versions))
+        raw = "|".join([
+            request.get_host(),
+            request.get_full_path(),
+            request.META.get("HTTP_ACCEPT", ""),
+            stamp,
+        ])
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        versions = versions_for(request, kwargs)
+        if versions is None:
+            return None
+        return datetime.fromtimestamp(max(versions.values()) / 1000, tz=timezone.utc)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
@@ -0,0 +1,167 @@
+"""
+Full-text index over the worker catalog.
+
+SQLite uses an FTS5 virtual table keyed by the worker id; PostgreSQL uses a
+side table with a weighted tsvector and a GIN index. Both are created by
+migration 0011 and kept current from the signals in HomeApp.signals. Any
+other backend falls back to icontains filtering.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Worker, WorkerService
+
+SQLITE_TABLE = "homeapp_worker_fts"
+POSTGRES_TABLE = "homeapp_worker_search"
+
+# bm25() column weights: name, profession, services, location, bio
+SQLITE_WEIGHTS = (10.0, 6.0, 4.0, 2.0, 1.0)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def create_index(schema_editor):
+    """Create the backend-specific index structures (called from migrations)."""
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} USING fts5("
+            "name, profession, services, location, bio, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {POSTGRES_TABLE} ("
+            "worker_id bigint PRIMARY KEY REFERENCES \"HomeApp_worker\" (id) ON DELETE CASCADE, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {POSTGRES_TABLE}_document_gin "
+            f"ON {POSTGRES_TABLE} USING GIN (document)"
+        )
+
+
+def drop_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SQLITE_TABLE}")
+    elif vendor == "postgresql":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {POSTGRES_TABLE}")
+
+
+def _columns(worker):
+    services = " ".join(
+        WorkerService.objects.filter(worker_id=worker.pk).values_list("services", flat=True)
+    )
+    return (
+        worker.name or "",
+        worker.profession.name if worker.profession_id else "",  # pyright: ignore
+        services,
+        worker.location or "",
+        worker.bio or "",
+    )
+
+
+def index_worker(worker_id):
+    """(Re)build the index entry for one worker, or drop it if the worker is gone."""
+    vendor = connection.vendor
+    if vendor not in ("sqlite", "postgresql"):
+        return
+
+    worker = Worker.objects.select_related("profession").filter(pk=worker_id).first()
+    if worker is None:
+        remove_worker(worker_id)
+        return
+
+    name, profession, services, location, bio = _columns(worker)
+    with connection.cursor() as cursor:
+        if vendor == "sqlite":
+            cursor.execute(f"DELETE FROM {SQLITE_TABLE} WHERE rowid = %s", [worker_id])
+            cursor.execute(
+                f"INSERT INTO {SQLITE_TABLE} (rowid, name, profession, services, location, bio) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                [worker_id, name, profession, services, location, bio],
+            )
+        else:
+            cursor.execute(
+                f"INSERT INTO {POSTGRES_TABLE} (worker_id, document) VALUES (%s, "
+                "setweight(to_tsvector('simple', %s), 'A') || "
+                "setweight(to_tsvector('simple', %s), 'B') || "
+                "setweight(to_tsvector('simple', %s), 'B') || "
+                "setweight(to_tsvector('simple', %s), 'C') || "
+                "setweight(to_tsvector('simple', %s), 'D')) "
+                "ON CONFLICT (worker_id) DO UPDATE SET document = EXCLUDED.document",
+                [worker_id, name, profession, services, location, bio],
+            )
+
+
+def remove_worker(worker_id):
+    vendor = connection.vendor
+    with connection.cursor() as cursor:
+        if vendor == "sqlite":
+            cursor.execute(f"DELETE FROM {SQLITE_TABLE} WHERE rowid = %s", [worker_id])
+        elif vendor == "postgresql":
+            cursor.execute(f"DELETE FROM {POSTGRES_TABLE} WHERE worker_id = %s", [worker_id])
+
+
+def rebuild_index():
+    """Re-index every worker; returns the number of workers indexed."""
+    count = 0
+    for worker_id in Worker.objects.values_list("pk", flat=True).iterator():
+        index_worker(worker_id)
+        count += 1
+    return count
+
+
+def search_worker_ids(query, limit, offset=0):
+    """
+    Return (ranked worker ids, total hits) for a free-text query.
+    Every term is matched as a prefix and all terms must match.
+    """
+    terms = TOKEN_RE.findall(query.lower())
+    if not terms:
+        return [], 0
+
+    vendor = connection.vendor
+    with connection.cursor() as cursor:
+        if vendor == "sqlite":
+            match = " ".join('"{}"*'.format(t.replace('"', '""')) for t in terms)
+            weights = ", ".join(str(w) for w in SQLITE_WEIGHTS)
+            cursor.execute(f"SELECT count(*) FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s", [match])
+            total = cursor.fetchone()[0]
+            cursor.execute(
+                f"SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s "
+                f"ORDER BY bm25({SQLITE_TABLE}, {weights}), rowid LIMIT %s OFFSET %s",
+                [match, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()], total
+
+        if vendor == "postgresql":
+            tsquery = " & ".join(f"{t}:*" for t in terms)
+            cursor.execute(
+                f"SELECT count(*) FROM {POSTGRES_TABLE} WHERE document @@ to_tsquery('simple', %s)",
+                [tsquery],
+            )
+            total = cursor.fetchone()[0]
+            cursor.execute(
+                f"SELECT worker_id FROM {POSTGRES_TABLE} WHERE document @@ to_tsquery('simple', %s) "
+                "ORDER BY ts_rank(document, to_tsquery('simple', %s)) DESC, worker_id "
+                "LIMIT %s OFFSET %s",
+                [tsquery, tsquery, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()], total
+
+    # Unsupported backend: plain substring matching
+    condition = Q()
+    for term in terms:
+        condition &= (
+            Q(name__icontains=term)
+            | Q(profession__name__icontains=term)
+            | Q(location__icontains=term)
+            | Q(bio__icontains=term)
+            | Q(services__services__icontains=term)
+        )
+    matches = Worker.objects.filter(condition).distinct().order_by("pk")
+    return list(matches.values_list("pk", flat=True)[offset:offset + limit]), matches.count()
@@ -1,7 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import Profession, WorkerService,Worker,UserProfile,WorkerRating,Booking
-from django.db.models import Avg
 from decimal import Decimal
 
 
@@ -152,19 +151,20 @@ class WorkerRatingSummarySerializer(serializers.ModelSerializer):
         model = Worker  # attach rating info to Worker
         fields = ['average_rating', 'total_ratings']
 
+    # Read from the aggregates maintained on Worker so listing N workers
+    # doesn't cost 2N extra queries against WorkerRating.
     def get_average_rating(self, obj):
-        avg = WorkerRating.objects.filter(worker=obj).aggregate(Avg('rating'))['rating__avg']
-        return round(avg, 1) if avg else 0
+        return obj.average_rating
 
     def get_total_ratings(self, obj):
-        return WorkerRating.objects.filter(worker=obj).count()
+        return obj.rating_count
 
 class WorkerRatingSerializer(serializers.ModelSerializer):
     user__username = serializers.CharField(source="user.username", read_only=True)
 
     class Meta:
         model = WorkerRating
-        fields = ["id", "rating", "review", "user__username"]
+        fields = ["id", "rating", "review", "user__username", "created_at"]
 
 
 class ProfessionSerializer(serializers.ModelSerializer):
@@ -177,7 +177,7 @@ class WorkerSerializer(serializers.ModelSerializer):
     email = serializers.EmailField(required=False, allow_blank=True)
     services = WorkerServiceSerializer(many=True, read_only=True)
     ratings = WorkerRatingSummarySerializer(source='*', read_only=True)# 🔹 include nested rating summary
-    reviews = WorkerRatingSerializer(source="ratings", many=True, read_only=True)
+    # Reviews are paged separately (/workers/<id>/reviews/), not nested here
 
 
     # 🔹 Nested profession serializer (read-only)
@@ -194,8 +194,8 @@ class WorkerSerializer(serializers.ModelSerializer):
         model = Worker
         fields = [
             'id', 'image', 'username', 'email', 'name', 'phone',
-            'profession', 'profession_id', 'experience', 'location', 'bio',
-            'services', 'ratings' , 'reviews' # 🔹 include ratings here
+            'profession', 'profession_id', 'experience', 'location', 'latitude', 'longitude', 'bio',
+            'services', 'ratings' # 🔹 include ratings here
         ]
         extra_kwargs = {
             "name": {"required": False},
@@ -205,10 +205,51 @@ class WorkerSerializer(serializers.ModelSerializer):
             "location": {"required": False},
             "bio": {"required": False},
             "email": {"required": False},
+            "latitude": {"required": False},
+            "longitude": {"required": False},
         }
 
 
 
+class WorkerListSerializer(serializers.ModelSerializer):
+    """
+    Compact worker card for catalog listings.
+
+    `fields` limits the output to the named fields and `expand` adds the
+    heavier nested relations (services, reviews), which are left out by default.
+    """
+    EXPANDABLE_FIELDS = ("services", "reviews")
+
+    profession = ProfessionSerializer(read_only=True)
+    ratings = WorkerRatingSummarySerializer(source='*', read_only=True)
+    starting_price = serializers.DecimalField(max_digits=8, decimal_places=2, read_only=True)
+    services = WorkerServiceSerializer(many=True, read_only=True)
+    reviews = WorkerRatingSerializer(source="ratings", many=True, read_only=True)
+
+    class Meta:
+        model = Worker
+        fields = [
+            'id', 'image', 'name', 'profession', 'experience', 'location',
+            'ratings', 'starting_price', 'services', 'reviews',
+        ]
+        read_only_fields = fields
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = self.selected_fields(fields, expand)
+        for name in list(self.fields):
+            if name not in selected:
+                self.fields.pop(name)
+
+    @classmethod
+    def selected_fields(cls, fields=None, expand=()):
+        if fields:
+            selected = set(fields)
+        else:
+            selected = set(cls.Meta.fields) - set(cls.EXPANDABLE_FIELDS)
+        return selected | (set(expand) & set(cls.EXPANDABLE_FIELDS))
+
+
 # Nested serializer for Worker user info
 class WorkerUserSerializer(serializers.ModelSerializer):
     user = serializers.SerializerMethodField()
@@ -218,6 +259,8 @@ class WorkerUserSerializer(serializers.ModelSerializer):
         fields = ["id",'image', "name", "user"]
 
     def get_user(self, obj):
+        if obj.user is None:
+            return None
         return {
             "username": obj.user.username,
             "email": obj.user.email
@@ -0,0 +1,84 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import availability, geo, response_cache, search
+from .models import Booking, Profession, Worker, WorkerRating, WorkerService
+
+
+# Keep the full-text index in step with the catalog
+
+@receiver(post_save, sender=Worker)
+def index_saved_worker(sender, instance, **kwargs):
+    search.index_worker(instance.pk)
+
+
+@receiver(post_delete, sender=Worker)
+def unindex_deleted_worker(sender, instance, **kwargs):
+    search.remove_worker(instance.pk)
+
+
+@receiver(post_save, sender=WorkerService)
+@receiver(post_delete, sender=WorkerService)
+def index_service_worker(sender, instance, **kwargs):
+    search.index_worker(instance.worker_id)
+
+
+@receiver(post_save, sender=Profession)
+def index_profession_workers(sender, instance, created, **kwargs):
+    if created:
+        return
+    for worker_id in Worker.objects.filter(profession=instance).values_list("pk", flat=True):
+        search.index_worker(worker_id)
+
+
+# Invalidate cached catalog responses that depend on the changed rows
+
+@receiver(post_save, sender=Worker)
+@receiver(post_delete, sender=Worker)
+def invalidate_worker_responses(sender, instance, **kwargs):
+    response_cache.invalidate_worker(instance.pk)
+
+
+@receiver(post_save, sender=WorkerService)
+@receiver(post_delete, sender=WorkerService)
+@receiver(post_save, sender=WorkerRating)
+@receiver(post_delete, sender=WorkerRating)
+def invalidate_worker_child_responses(sender, instance, **kwargs):
+    response_cache.invalidate_worker(instance.worker_id)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def invalidate_booking_worker_responses(sender, instance, **kwargs):
+    # Bookings show up on the profile (completed jobs) and the worker's
+    # calendar feed, not in listings
+    response_cache.invalidate_worker(instance.worker_id, listing=False)
+
+
+@receiver(post_save, sender=Profession)
+@receiver(post_delete, sender=Profession)
+def invalidate_profession_responses(sender, instance, **kwargs):
+    response_cache.invalidate(response_cache.PROFESSIONS_TAG, response_cache.WORKER_LIST_TAG)
+
+
+# Keep rating aggregates in step with deleted ratings (rate_worker folds in new ones)
+
+@receiver(post_delete, sender=WorkerRating)
+def remove_deleted_rating(sender, instance, **kwargs):
+    worker = Worker.objects.filter(pk=instance.worker_id).first()
+    if worker is not None:
+        worker.remove_rating(instance.rating)
+
+
+# Keep the proximity grid in step with worker coordinates
+
+@receiver(post_save, sender=Worker)
+def index_worker_location(sender, instance, **kwargs):
+    geo.index_worker(instance)
+
+
+# Keep worker-day occupancy in step with booking status
+
+@receiver(post_save, sender=Booking)
+def sync_booking_occupancy(sender, instance, **kwargs):
+    availability.sync_booking(instance)
@@ -0,0 +1,228 @@
+"""
+A local stand-in for the parts of the Stripe API the app uses, so the
+payment flow can be run and load-tested offline (`manage.py stripe_stub`,
+`manage.py benchmark_bookings --checkout`).
+
+It keeps Checkout Sessions in memory and serves:
+
+    POST /v1/checkout/sessions                create
+    GET  /v1/checkout/sessions/<id>           retrieve
+    GET  /v1/checkout/sessions                list, newest first (payment_intent,
+                                              created[gte|lt], limit, starting_after)
+    POST /v1/checkout/sessions/<id>/expire    expire
+    GET  /pay/<id>                            the customer paying (the session's url)
+
+Paying marks the session complete/paid, posts a signed
+checkout.session.completed event to `webhook_url` if one is given and
+redirects to the success_url. With `auto_pay` every session is paid as
+soon as it is created.
+"""
+import hashlib
+import hmac
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+
+SESSIONS_PATH = "/v1/checkout/sessions"
+
+
+def _parse_form(body):
+    """Stripe's form encoding (`metadata[a]=1`, `line_items[0][quantity]=1`) as nested dicts."""
+    params = {}
+    for key, value in parse_qsl(body, keep_blank_values=True):
+        parts = re.findall(r"[^\[\]]+", key)
+        target = params
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return params
+
+
+def _amount_total(params):
+    total = 0
+    for item in params.get("line_items", {}).values():
+        price = item.get("price_data", {})
+        total += int(price.get("unit_amount", 0)) * int(item.get("quantity", 1))
+    return total
+
+
+class StubStripeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 12111), auto_pay=False, webhook_url=None, webhook_secret=None):
+        super().__init__(address, StubStripeHandler)
+        self.auto_pay = auto_pay
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def serve_in_background(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def create_session(self, params, created=None):
+        """Create a session; `created` (a timestamp) lets tests seed history."""
+        session_id = f"cs_test_stub_{uuid.uuid4().hex}"
+        session = {
+            "id": session_id,
+            "object": "checkout.session",
+            "mode": params.get("mode", "payment"),
+            "status": "open",
+            "payment_status": "unpaid",
+            "payment_intent": None,
+            "amount_total": _amount_total(params),
+            "currency": params.get("line_items", {}).get("0", {}).get("price_data", {}).get("currency", "inr"),
+            "metadata": params.get("metadata", {}),
+            "success_url": params.get("success_url"),
+            "cancel_url": params.get("cancel_url"),
+            "expires_at": int(params.get("expires_at") or time.time() + 24 * 3600),
+            "created": int(created or time.time()),
+            "url": f"{self.url}/pay/{session_id}",
+            "livemode": False,
+        }
+        with self.lock:
+            self.sessions[session_id] = session
+        if self.auto_pay:
+            self.pay(session_id)
+        return session
+
+    def pay(self, session_id):
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None or session["status"] != "open":
+                return session
+            session.update(
+                status="complete",
+                payment_status="paid",
+                payment_intent=f"pi_stub_{uuid.uuid4().hex}",
+            )
+            event = dict(session)
+        if self.webhook_url:
+            threading.Thread(target=self.send_event, args=("checkout.session.completed", event), daemon=True).start()
+        return session
+
+    def expire(self, session_id):
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is not None and session["status"] == "open":
+                session["status"] = "expired"
+            return session
+
+    def send_event(self, event_type, data):
+        payload = json.dumps({
+            "id": f"evt_stub_{uuid.uuid4().hex}",
+            "object": "event",
+            "type": event_type,
+            "created": int(time.time()),
+            "livemode": False,
+            "data": {"object": data},
+        })
+        timestamp = int(time.time())
+        signature = hmac.new(
+            (self.webhook_secret or "").encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+        ).hexdigest()
+        try:
+            requests.post(
+                self.webhook_url,
+                data=payload,
+                headers={"Content-Type": "application/json", "Stripe-Signature": f"t={timestamp},v1={signature}"},
+                timeout=10,
+            )
+        except requests.RequestException:
+            pass
+
+
+class StubStripeHandler(BaseHTTPRequestHandler):
+    server: StubStripeServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def not_found(self, what="resource"):
+        self.send_json(404, {"error": {
+            "type": "invalid_request_error",
+            "code": "resource_missing",
+            "message": f"No such {what}",
+        }})
+
+    def session_or_404(self, session):
+        if session is None:
+            self.not_found("checkout.session")
+        else:
+            self.send_json(200, session)
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        length = int(self.headers.get("Content-Length") or 0)
+        params = _parse_form(self.rfile.read(length).decode())
+
+        if path == SESSIONS_PATH:
+            self.send_json(200, self.server.create_session(params))
+        elif path.startswith(SESSIONS_PATH + "/") and path.endswith("/expire"):
+            self.session_or_404(self.server.expire(path[len(SESSIONS_PATH) + 1:-len("/expire")]))
+        else:
+            self.not_found()
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = dict(parse_qsl(url.query))
+
+        if url.path == SESSIONS_PATH:
+            with self.server.lock:
+                # Newest first, like Stripe; dicts keep creation order for ties
+                sessions = [dict(session) for session in reversed(self.server.sessions.values())]
+            sessions.sort(key=lambda session: session["created"], reverse=True)
+            if "payment_intent" in query:
+                sessions = [session for session in sessions if session["payment_intent"] == query["payment_intent"]]
+            if "created[gte]" in query:
+                sessions = [session for session in sessions if session["created"] >= int(query["created[gte]"])]
+            if "created[lt]" in query:
+                sessions = [session for session in sessions if session["created"] < int(query["created[lt]"])]
+            if "starting_after" in query:
+                ids = [session["id"] for session in sessions]
+                if query["starting_after"] in ids:
+                    sessions = sessions[ids.index(query["starting_after"]) + 1:]
+            limit = int(query.get("limit", 10))
+            self.send_json(200, {
+                "object": "list",
+                "url": SESSIONS_PATH,
+                "has_more": len(sessions) > limit,
+                "data": sessions[:limit],
+            })
+        elif url.path.startswith(SESSIONS_PATH + "/"):
+            with self.server.lock:
+                session = self.server.sessions.get(url.path[len(SESSIONS_PATH) + 1:])
+                session = dict(session) if session else None
+            self.session_or_404(session)
+        elif url.path.startswith("/pay/"):
+            session = self.server.pay(url.path[len("/pay/"):])
+            if session is None:
+                self.not_found("checkout.session")
+                return
+            self.send_response(303)
+            self.send_header("Location", (session["success_url"] or "/").replace("{CHECKOUT_SESSION_ID}", session["id"]))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        else:
+            self.not_found()
@@ -1,3 +1,1685 @@
-from django.test import TestCase
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+import stripe
+from unittest import mock, skipIf
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+
+from . import availability, ical, idempotency, payments, reconciliation, response_cache, transitions, webhooks
+from .models import (
+    Booking, CheckoutSession, Payment, Profession, SlotHold, StripeEvent, Worker, WorkerDayOccupancy, WorkerRating,
+    WorkerService,
+)
+from .pagination import ReviewPagination
+
+User = get_user_model()
+
+
+class WorkerRatingAggregateTests(TestCase):
+    """Worker.rating_sum / rating_count follow ratings as they are added, changed and deleted."""
+
+    def setUp(self):
+        profession = Profession.objects.create(name="Plumbing")
+        self.worker = Worker.objects.create(name="Worker", phone="1234567890", profession=profession)
+        self.customers = [User.objects.create_user(f"customer{n}", password="x", role="user") for n in range(2)]
+
+    def rate(self, customer, rating):
+        client = APIClient()
+        client.force_authenticate(customer)
+        response = client.post(f"/workers/{self.worker.pk}/rate/", {"rating": rating}, format="json")
+        self.assertEqual(response.status_code, 201)
+
+    def aggregates(self):
+        self.worker.refresh_from_db()
+        return self.worker.rating_sum, self.worker.rating_count, self.worker.rating
+
+    def test_ratings_are_folded_in_and_out(self):
+        self.rate(self.customers[0], 5)
+        self.rate(self.customers[1], 2)
+        self.assertEqual(self.aggregates(), (7, 2, Decimal("3.50")))
+
+        self.rate(self.customers[1], 4)
+        self.assertEqual(self.aggregates(), (9, 2, Decimal("4.50")))
+
+        WorkerRating.objects.get(user=self.customers[0]).delete()
+        self.assertEqual(self.aggregates(), (4, 1, Decimal("4.00")))
+
+        WorkerRating.objects.filter(worker=self.worker).delete()
+        self.assertEqual(self.aggregates(), (0, 0, Decimal("0.00")))
+
+    def test_rebuild_fixes_drift_and_refreshes_cached_profiles(self):
+        cache.clear()
+        self.rate(self.customers[0], 4)
+        Worker.objects.filter(pk=self.worker.pk).update(rating_sum=1, rating_count=3, rating=Decimal("0.33"))
+        url = f"/workers/{self.worker.pk}/"
+        stale = APIClient().get(url).json()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("rebuild_worker_ratings", stdout=StringIO())
+        self.assertEqual(self.aggregates(), (4, 1, Decimal("4.00")))
+        self.assertNotEqual(APIClient().get(url).json(), stale)
+
+
+class BookingListQueryCountTests(TestCase):
+    """user_bookings / worker_bookings cost the same number of queries for any history size."""
+
+    def setUp(self):
+        profession = Profession.objects.create(name="Plumbing")
+        self.worker_user = User.objects.create_user("worker", password="x", role="worker")
+        self.worker = Worker.objects.create(
+            name="Worker", phone="1234567890", profession=profession, user=self.worker_user
+        )
+        self.service = WorkerService.objects.create(worker=self.worker, services="Repair", price=500)
+        self.user = User.objects.create_user("customer", password="x", role="user")
+
+    def add_bookings(self, count):
+        start = date.today() + timedelta(days=1 + Booking.objects.count())
+        Booking.objects.bulk_create(
+            Booking(
+                user=self.user,
+                worker=self.worker,
+                service=self.service,
+                date=start + timedelta(days=offset),
+                time="10:00",
+                status="completed",
+            )
+            for offset in range(count)
+        )
+
+    def get(self, account, url, **params):
+        client = APIClient()
+        client.force_authenticate(account)
+        return client.get(url, params)
+
+    def test_user_bookings_query_count_is_constant(self):
+        self.add_bookings(2)
+        with self.assertNumQueries(1):
+            response = self.get(self.user, "/user/bookings/")
+        self.assertEqual(len(response.json()["results"]), 2)
+
+        self.add_bookings(30)
+        with self.assertNumQueries(1):
+            response = self.get(self.user, "/user/bookings/", page_size=25)
+        self.assertEqual(len(response.json()["results"]), 25)
+        self.assertIsNotNone(response.json()["next"])
+
+    def test_worker_bookings_query_count_is_constant(self):
+        self.add_bookings(2)
+        with self.assertNumQueries(2):
+            self.get(self.worker_user, "/worker/bookings/")
+
+        self.add_bookings(30)
+        with self.assertNumQueries(2):
+            response = self.get(self.worker_user, "/worker/bookings/", page_size=100)
+        self.assertEqual(len(response.json()["results"]), 32)
+
+    def test_filters_and_pages_cover_every_booking_once(self):
+        self.add_bookings(12)
+        Booking.objects.filter(pk__in=Booking.objects.order_by("pk").values("pk")[:4]).update(status="canceled")
+
+        response = self.get(self.user, "/user/bookings/", status="canceled")
+        self.assertEqual(len(response.json()["results"]), 4)
+
+        seen, url = [], "/user/bookings/"
+        params = {"page_size": 5, "ordering": "date", "status": "completed"}
+        while url:
+            page = self.get(self.user, url, **params).json()
+            seen.extend(row["id"] for row in page["results"])
+            url, params = page["next"], {}
+        expected = Booking.objects.filter(status="completed").order_by("date", "pk")
+        self.assertEqual(seen, list(expected.values_list("pk", flat=True)))
+
+        self.assertEqual(self.get(self.user, "/user/bookings/", status="bogus").status_code, 400)
+        self.assertEqual(self.get(self.user, "/user/bookings/", **{"from": "not-a-date"}).status_code, 400)
+
+
+class IdempotencyKeyTests(TestCase):
+    """A retried write with the same Idempotency-Key gets the first response back."""
+
+    def setUp(self):
+        cache.clear()
+        profession = Profession.objects.create(name="Plumbing")
+        self.worker = Worker.objects.create(name="Worker", phone="1234567890", profession=profession)
+        self.service = WorkerService.objects.create(worker=self.worker, services="Repair", price=500)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("customer", password="x", role="user"))
+        self.url = f"/workers/{self.worker.pk}/book/"
+        self.payload = {"service_id": self.service.pk, "date": str(date.today() + timedelta(days=2)), "time": "10:00"}
+
+    def post(self, payload, key):
+        return self.client.post(self.url, payload, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_first_response(self):
+        first = self.post(self.payload, "key-1")
+        self.assertEqual(first.status_code, 201)
+        retry = self.post(self.payload, "key-1")
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Booking.objects.count(), 1)
+
+        # A new key is a new request, answered by the view's own duplicate check
+        again = self.post(self.payload, "key-2")
+        self.assertEqual(again.status_code, 200)
+        self.assertFalse(again.has_header("Idempotent-Replayed"))
+
+    def test_key_reused_for_another_request_is_rejected(self):
+        self.post(self.payload, "key-1")
+        other = dict(self.payload, time="11:00")
+        self.assertEqual(self.post(other, "key-1").status_code, 422)
+
+
+class IdempotencyConcurrencyTests(SimpleTestCase):
+    """A duplicate arriving while the first request runs waits for it instead of running too."""
+
+    def test_concurrent_duplicate_waits(self):
+        cache.clear()
+        calls = []
+
+        @api_view(["POST"])
+        @permission_classes([AllowAny])
+        @idempotency.idempotent
+        def slow_view(request):
+            calls.append(1)
+            time.sleep(0.3)
+            return Response({"call": len(calls)}, status=201)
+
+        factory = APIRequestFactory()
+        responses = []
+
+        def send():
+            request = factory.post("/slow/", {"a": 1}, format="json", HTTP_IDEMPOTENCY_KEY="key-1")
+            responses.append(slow_view(request))
+
+        threads = [threading.Thread(target=send) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual({response.status_code for response in responses}, {201})
+        self.assertEqual(len({response.content for response in responses}), 1)
+
+
+class StripeConfirmTests(TestCase):
+    """confirm_stripe_payment answers paid sessions locally and lets one request at a time call Stripe."""
+
+    def setUp(self):
+        cache.clear()
+        profession = Profession.objects.create(name="Plumbing")
+        self.worker = Worker.objects.create(name="Worker", phone="1234567890", profession=profession)
+        self.service = WorkerService.objects.create(worker=self.worker, services="Repair", price=500)
+        self.user = User.objects.create_user("customer", password="x", role="user")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def confirm(self, session_id):
+        return self.client.get("/payments/stripe/confirm/", {"session_id": session_id})
+
+    def test_paid_session_is_answered_without_stripe(self):
+        booking = Booking.objects.create(
+            user=self.user, worker=self.worker, service=self.service, date=date.today() + timedelta(days=1),
+            time="10:00", status="accepted", payment_status="paid", stripe_checkout_session_id="cs_paid",
+        )
+        with mock.patch.object(payments, "retrieve_checkout_session", side_effect=AssertionError("called Stripe")):
+            response = self.confirm("cs_paid")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["id"], booking.pk)
+
+    def paid_session(self, session_id, day):
+        return stripe.checkout.Session.construct_from({
+            "id": session_id,
+            "payment_status": "paid",
+            "payment_intent": f"pi_{session_id}",
+            "currency": "inr",
+            "metadata": {
+                "worker_id": str(self.worker.pk),
+                "service_id": str(self.service.pk),
+                "date": str(day),
+                "time": "10:00",
+                "amount": "500",
+            },
+        }, "sk_test_x")
+
+    @override_settings(STRIPE_SECRET_KEY="sk_test_x")
+    def test_live_hold_becomes_the_booking(self):
+        day = date.today() + timedelta(days=2)
+        hold = availability.hold_day(self.worker, day, self.user, timezone.now() + timedelta(minutes=30))
+        hold.stripe_session_id = "cs_live"
+        hold.save(update_fields=["stripe_session_id"])
+
+        with mock.patch.object(payments, "retrieve_checkout_session", return_value=self.paid_session("cs_live", day)):
+            response = self.confirm("cs_live")
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(SlotHold.objects.exists())
+        self.assertTrue(WorkerDayOccupancy.objects.filter(booking_id=response.json()["id"], date=day).exists())
+
+    @override_settings(STRIPE_SECRET_KEY="sk_test_x")
+    def test_expired_hold_does_not_keep_a_rebooked_day(self):
+        day = date.today() + timedelta(days=2)
+        other = User.objects.create_user("other", password="x", role="user")
+        rebooked = Booking.objects.create(
+            user=other, worker=self.worker, service=self.service, date=day, time="11:00", status="pending"
+        )
+        availability.claim_booking(rebooked)
+        # Expired, not yet swept by expire_slot_holds
+        SlotHold.objects.create(
+            worker=self.worker, date=day, user=self.user, stripe_session_id="cs_expired",
+            expires_at=timezone.now() - timedelta(minutes=1),
+        )
+
+        with mock.patch.object(payments, "retrieve_checkout_session", return_value=self.paid_session("cs_expired", day)):
+            response = self.confirm("cs_expired")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(list(Booking.objects.filter(worker=self.worker, date=day)), [rebooked])
+
+    @override_settings(STRIPE_SECRET_KEY="sk_test_x", STRIPE_CONFIRM_WAIT_SECONDS=0)
+    def test_confirmation_already_running_gets_409(self):
+        cache.add("single-flight:confirm:cs_busy", "another-request", 60)
+        with mock.patch.object(payments, "retrieve_checkout_session", side_effect=AssertionError("called Stripe")):
+            response = self.confirm("cs_busy")
+        self.assertEqual(response.status_code, 409)
+
+
+class StripeSessionCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_only_paid_sessions_are_cached(self):
+        sessions = [{"id": "cs_1", "payment_status": "unpaid"}, {"id": "cs_1", "payment_status": "paid"}]
+        with mock.patch.object(payments, "retrieve_checkout_session", side_effect=sessions) as retrieve:
+            self.assertEqual(payments.retrieve_checkout_session_cached("cs_1")["payment_status"], "unpaid")
+            self.assertEqual(payments.retrieve_checkout_session_cached("cs_1")["payment_status"], "paid")
+            self.assertEqual(payments.retrieve_checkout_session_cached("cs_1")["payment_status"], "paid")
+        self.assertEqual(retrieve.call_count, 2)
+
+    @override_settings(STRIPE_TIMEOUT_SECONDS=10, STRIPE_MAX_NETWORK_RETRIES=2)
+    def test_lock_outlives_the_slowest_stripe_call(self):
+        self.assertEqual(payments.worst_case_call_seconds(), 34)
+
+    def test_single_flight_coalesces_concurrent_callers(self):
+        calls, results = [], []
+
+        def confirm():
+            with payments.single_flight("confirm:cs_1"):
+                if not results:
+                    calls.append(1)
+                    time.sleep(0.2)
+                results.append("booking")
+
+        threads = [threading.Thread(target=confirm) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 4)
+
+    @override_settings(STRIPE_CONFIRM_WAIT_SECONDS=0)
+    def test_single_flight_gives_up_instead_of_running_unlocked(self):
+        with payments.single_flight("confirm:cs_1"):
+            with self.assertRaises(payments.StillRunning):
+                with payments.single_flight("confirm:cs_1"):
+                    self.fail("ran without the lock")
+
+
+class CatalogConditionalGetTests(TestCase):
+    """Catalog endpoints carry validators derived from their cache tags."""
+
+    def setUp(self):
+        cache.clear()
+        profession = Profession.objects.create(name="Plumbing")
+        self.worker_user = User.objects.create_user("worker", password="x", role="worker")
+        self.worker = Worker.objects.create(
+            name="Worker", phone="1234567890", profession=profession, user=self.worker_user
+        )
+        self.client = APIClient()
+
+    def test_catalog_endpoints_send_validators(self):
+        for url in ("/workers/", "/professions/", f"/workers/{self.worker.pk}/"):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertTrue(response.has_header("ETag"), url)
+            self.assertTrue(response.has_header("Last-Modified"), url)
+
+    def test_matching_etag_gets_304(self):
+        for url in ("/workers/", "/professions/", f"/workers/{self.worker.pk}/"):
+            etag = self.client.get(url)["ETag"]
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response.content, b"", url)
+
+    def test_if_modified_since_gets_304(self):
+        last_modified = self.client.get("/professions/")["Last-Modified"]
+        response = self.client.get("/professions/", HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_change_invalidates_the_etag(self):
+        url = f"/workers/{self.worker.pk}/"
+        etag = self.client.get(url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.worker.name = "Renamed"
+            self.worker.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_missing_worker_gets_404_not_304(self):
+        url = f"/workers/{self.worker.pk}/"
+        response = self.client.get(url)
+        etag, last_modified = response["ETag"], response["Last-Modified"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.worker.delete()
+        for headers in ({"HTTP_IF_NONE_MATCH": etag}, {"HTTP_IF_NONE_MATCH": "*"}, {"HTTP_IF_MODIFIED_SINCE": last_modified}):
+            response = self.client.get(url, **headers)
+            self.assertEqual(response.status_code, 404, headers)
+            self.assertIn("detail", response.json())
+        self.assertEqual(self.client.get("/workers/999999/", HTTP_IF_NONE_MATCH="*").status_code, 404)
+
+    def test_etag_depends_on_the_query(self):
+        self.assertNotEqual(
+            self.client.get("/workers/")["ETag"], self.client.get("/workers/", {"min_price": 200})["ETag"]
+        )
+
+    def test_worker_availability_is_not_conditional(self):
+        self.client.force_authenticate(self.worker_user)
+        response = self.client.get("/worker/availability/")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("ETag"))
+
+
+class BatchBookingValidationTests(TestCase):
+    """Recurrences are bounded before any dates are generated."""
+
+    def setUp(self):
+        profession = Profession.objects.create(name="Plumbing")
+        self.worker = Worker.objects.create(name="Worker", phone="1234567890", profession=profession)
+        self.service = WorkerService.objects.create(worker=self.worker, services="Repair", price=500)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("customer", password="x", role="user"))
+
+    def post(self, **recurrence):
+        recurrence.setdefault("start", str(date.today() + timedelta(days=1)))
+        recurrence.setdefault("frequency", "daily")
+        return self.client.post(
+            f"/workers/{self.worker.pk}/book/batch/",
+            {"service_id": self.service.pk, "time": "10:00", "recurrence": recurrence},
+            format="json",
+        )
+
+    def test_recurrence_is_booked(self):
+        response = self.post(frequency="weekly", count=3)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Booking.objects.filter(worker=self.worker).count(), 3)
+
+    def test_oversized_recurrence_is_rejected(self):
+        self.assertEqual(self.post(count=10**8).status_code, 400)
+        self.assertEqual(self.post(count=3, interval=10**7).status_code, 400)
+        self.assertEqual(self.post(frequency="monthly", count=3, interval=10**6).status_code, 400)
+        self.assertFalse(Booking.objects.exists())
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    """Simultaneous bookings of one worker-day: exactly one wins, the rest get 409."""
+
+    def setUp(self):
+        profession = Profession.objects.create(name="Plumbing")
+        self.worker = Worker.objects.create(name="Worker", phone="1234567890", profession=profession)
+        self.service = WorkerService.objects.create(worker=self.worker, services="Repair", price=500)
+        self.day = str(date.today() + timedelta(days=3))
+
+    def post(self, customer):
+        client = APIClient()
+        client.force_authenticate(customer)
+        return client.post(
+            f"/workers/{self.worker.pk}/book/",
+            {"service_id": self.service.pk, "date": self.day, "time": "10:00"},
+            format="json",
+        )
+
+    def test_losing_booking_is_rolled_back(self):
+        # Both requests get past the availability check, as when they race
+        customers = [User.objects.create_user(f"customer{n}", password="x", role="user") for n in range(2)]
+        with mock.patch.object(availability, "is_worker_booked", return_value=False):
+            codes = [self.post(customer).status_code for customer in customers]
+
+        self.assertEqual(codes, [201, 409])
+        self.assertEqual(Booking.objects.filter(worker=self.worker).count(), 1)
+        self.assertEqual(WorkerDayOccupancy.objects.filter(worker=self.worker).count(), 1)
+
+    @skipIf(connection.vendor == "sqlite", "SQLite's shared in-memory test database locks whole tables")
+    def test_concurrent_create_booking(self):
+        customers = [User.objects.create_user(f"customer{n}", password="x", role="user") for n in range(4)]
+        barrier = threading.Barrier(len(customers))
+        codes = []
+
+        def book(customer):
+            barrier.wait()
+            try:
+                codes.append(self.post(customer).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book, args=(customer,)) for customer in customers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(codes), [201, 409, 409, 409])
+        self.assertEqual(Booking.objects.filter(worker=self.worker).count(), 1)
+        self.assertEqual(WorkerDayOccupancy.objects.filter(worker=self.worker).count(), 1)
+
+
+class WorkerDayOccupancyTests(TestCase):
+    """Every active booking or live hold owns its worker-day; saves never fail on it."""
+
+    def setUp(self):
+        profession = Profession.objects.create(name="Plumbing")
+        self.worker = Worker.objects.create(name="Worker", phone="1234567890", profession=profession)
+        self.service = WorkerService.objects.create(worker=self.worker, services="Repair", price=500)
+        self.user = User.objects.create_user("customer", password="x", role="user")
+        self.day = date.today() + timedelta(days=3)
+
+    def book(self, day=None, status="pending"):
+        booking = Booking.objects.create(
+            user=self.user, worker=self.worker, service=self.service,
+            date=day or self.day, time="10:00", status=status,
+        )
+        if status in availability.ACTIVE_BOOKING_STATUSES:
+            availability.claim_booking(booking)
+        return booking
+
+    def test_claim_rejects_a_taken_day(self):
+        self.book()
+        with self.assertRaises(availability.DayAlreadyBooked):
+            self.book()
+
+    def test_save_outside_a_claim_never_raises(self):
+        first = self.book()
+        # A legacy double booking saved again (e.g. by a webhook) has no row to sync
+        legacy = Booking.objects.create(
+            user=self.user, worker=self.worker, service=self.service, date=self.day, time="11:00"
+        )
+        legacy.payment_status = "paid"
+        legacy.save()
+        self.assertFalse(WorkerDayOccupancy.objects.filter(booking=legacy).exists())
+
+        # Moving a booking onto a taken day releases its row instead of failing
+        other = self.book(day=self.day + timedelta(days=1))
+        other.date = self.day
+        other.save()
+        self.assertFalse(WorkerDayOccupancy.objects.filter(booking=other).exists())
+        self.assertTrue(WorkerDayOccupancy.objects.filter(booking=first, date=self.day).exists())
+
+    def test_inactive_booking_releases_its_day(self):
+        booking = self.book()
+        booking.status = "canceled"
+        booking.save()
+        self.assertFalse(availability.is_worker_booked(self.worker, self.day))
+
+    def attempt_every_path(self, day):
+        """Status codes from the four ways of booking the worker on `day`."""
+        customer = APIClient()
+        customer.force_authenticate(User.objects.create_user(f"other{day}", password="x", role="user"))
+        admin = APIClient()
+        admin.force_authenticate(User.objects.create_superuser(f"admin{day}", password="x", role="user"))
+        booking = {"service_id": self.service.pk, "date": str(day), "time": "10:00"}
+        with override_settings(STRIPE_SECRET_KEY="sk_test_x"), mock.patch.object(
+            payments, "create_checkout_session", side_effect=AssertionError("reached Stripe")
+        ):
+            return {
+                "single": customer.post(f"/workers/{self.worker.pk}/book/", booking, format="json").status_code,
+                "batch": customer.post(
+                    f"/workers/{self.worker.pk}/book/batch/", {**booking, "dates": [str(day)]}, format="json"
+                ).status_code,
+                "checkout": customer.post(
+                    f"/payments/stripe/checkout/new/{self.worker.pk}/", booking, format="json"
+                ).status_code,
+                "admin": admin.post("/api/superadmin/bookings/create/", {
+                    "user_id": self.user.pk, "worker_id": self.worker.pk,
+                    "service_id": self.service.pk, "scheduled_date": str(day),
+                }, format="json").status_code,
+            }
+
+    def test_every_booking_path_sees_a_booked_day(self):
+        self.book()
+        self.assertEqual(set(self.attempt_every_path(self.day).values()), {409})
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_every_booking_path_sees_a_held_day(self):
+        other = User.objects.create_user("holder", password="x", role="user")
+        availability.hold_day(self.worker, self.day, other, timezone.now() + timedelta(minutes=30))
+        self.assertEqual(set(self.attempt_every_path(self.day).values()), {409})
+        self.assertFalse(Booking.objects.exists())
+
+    def test_expired_hold_does_not_block(self):
+        other = User.objects.create_user("holder", password="x", role="user")
+        availability.hold_day(self.worker, self.day, other, timezone.now() - timedelta(minutes=1))
+        self.assertFalse(availability.is_worker_booked(self.worker, self.day))
+        self.assertEqual(availability.taken_days(self.worker, [self.day]), set())
+        self.book()
+        self.assertFalse(SlotHold.objects.exists())
+
+
+class WorkerNearbyTests(TestCase):
+    """Proximity search validates its inputs and reads across the antimeridian."""
+
+    def setUp(self):
+        self.profession = Profession.objects.create(name="Plumbing")
+        self.client = APIClient()
+
+    def add_worker(self, name, latitude, longitude):
+        return Worker.objects.create(
+            name=name, phone="1234567890", profession=self.profession, latitude=latitude, longitude=longitude
+        )
+
+    def names(self, **params):
+        response = self.client.get("/workers/nearby/", params)
+        self.assertEqual(response.status_code, 200)
+        return [row["name"] for row in response.json()["results"]]
+
+    def test_non_finite_input_is_rejected(self):
+        for params in ({"lat": 10, "lng": 10, "radius": "nan"}, {"lat": "nan", "lng": 10}, {"lat": 10, "lng": "inf"}):
+            self.assertEqual(self.client.get("/workers/nearby/", params).status_code, 400, params)
+
+    def test_nearest_first(self):
+        self.add_worker("Far", 12.99, 77.70)
+        self.add_worker("Near", 12.97, 77.60)
+        self.add_worker("Elsewhere", 19.07, 72.87)
+        self.assertEqual(self.names(lat=12.97, lng=77.59, radius=20), ["Near", "Far"])
+
+    def test_search_wraps_around_the_antimeridian(self):
+        self.add_worker("West", -17.70, -179.95)
+        self.add_worker("East", -17.70, 179.95)
+        self.assertEqual(sorted(self.names(lat=-17.70, lng=179.99, radius=20)), ["East", "West"])
+        self.assertEqual(sorted(self.names(lat=-17.70, lng=-179.99, radius=20)), ["East", "West"])
+
+    def test_profession_filter(self):
+        other = Profession.objects.create(name="Wiring")
+        self.add_worker("Plumber", 12.97, 77.60)
+        Worker.objects.create(name="Electrician", phone="1234567890", profession=other, latitude=12.97, longitude=77.60)
+        self.assertEqual(self.names(lat=12.97, lng=77.59, profession=other.slug), ["Electrician"])
+        self.assertEqual(self.names(lat=12.97, lng=77.59, profession=str(self.profession.pk)), ["Plumber"])
+        for value in ("²", "9" * 40):
+            response = self.client.get("/workers/nearby/", {"lat": 10, "lng": 10, "profession": value})
+            self.assertEqual(response.status_code, 400, value)
+
+
+class ReconciliationTests(TestCase):
+    """reconcile() over a plain list of sessions: what it fixes, what it only reports."""
+
+    def setUp(self):
+        profession = Profession.objects.create(name="Plumbing")
+        self.worker = Worker.objects.create(name="Worker", phone="1234567890", profession=profession)
+        self.service = WorkerService.objects.create(worker=self.worker, services="Repair", price=500)
+        self.user = User.objects.create_user("customer", password="x", role="user")
+
+        # Paid on Stripe, unknown locally apart from the booking in its metadata
+        self.unpaid = self.booking(1, payment_status="due")
+        # Paid and marked paid, but the checkout lacks the intent and the payment is pending
+        self.pending = self.booking(2, payment_status="paid")
+        CheckoutSession.objects.create(user=self.user, booking=self.pending, stripe_session_id="cs_2")
+        self.payment("cs_2", self.pending, "pending")
+        # Marked paid locally although Stripe never took the money
+        self.unconfirmed = self.booking(4, payment_status="paid", stripe_checkout_session_id="cs_4")
+        CheckoutSession.objects.create(user=self.user, booking=self.unconfirmed, stripe_session_id="cs_4")
+        self.payment("cs_4", self.unconfirmed, "paid")
+        # Consistent everywhere
+        self.settled = self.booking(5, payment_status="paid")
+        CheckoutSession.objects.create(
+            user=self.user, booking=self.settled, stripe_session_id="cs_5", stripe_payment_intent_id="pi_5"
+        )
+        self.payment("cs_5", self.settled, "paid")
+
+        self.sessions = [
+            self.session("cs_1", "paid", "pi_1", booking_id=self.unpaid.pk),
+            self.session("cs_2", "paid", "pi_2"),
+            self.session("cs_3", "paid", "pi_3"),
+            self.session("cs_4", "unpaid", None),
+            self.session("cs_5", "paid", "pi_5", booking_id=self.settled.pk),
+        ]
+
+    def booking(self, days, **fields):
+        return Booking.objects.create(
+            user=self.user, worker=self.worker, service=self.service,
+            date=date.today() + timedelta(days=days), time="10:00", amount=500, **fields
+        )
+
+    def payment(self, session_id, booking, payment_status):
+        return Payment.objects.create(
+            booking=booking, user=self.user, worker=self.worker, amount=500,
+            payment_status=payment_status, stripe_session_id=session_id,
+        )
+
+    def session(self, session_id, payment_status, intent_id, booking_id=None):
+        return {
+            "id": session_id,
+            "payment_status": payment_status,
+            "payment_intent": intent_id,
+            "amount_total": 50000,
+            "currency": "inr",
+            "created": 1760000000,
+            "metadata": {"booking_id": str(booking_id)} if booking_id else {},
+        }
+
+    expected = {
+        "checkout_missing": 1,
+        "booking_not_paid": 1,
+        "payment_missing": 1,
+        "intent_missing": 1,
+        "payment_not_paid": 1,
+        "paid_without_booking": 1,
+        "paid_locally_only": 1,
+    }
+
+    def test_dry_run_reports_without_writing(self):
+        report = reconciliation.reconcile(self.sessions, apply=False, chunk_size=2)
+        self.assertEqual(report.sessions, 5)
+        self.assertEqual(dict(report.counts), self.expected)
+
+        self.unpaid.refresh_from_db()
+        self.assertEqual(self.unpaid.payment_status, "due")
+        self.assertFalse(Payment.objects.filter(stripe_session_id="cs_1").exists())
+        self.assertEqual(Payment.objects.get(stripe_session_id="cs_2").payment_status, "pending")
+
+    def test_malformed_metadata_booking_id_is_unmatched(self):
+        session = self.session("cs_9", "paid", "pi_9")
+        session["metadata"] = {"booking_id": "²"}
+        report = reconciliation.reconcile([session], apply=False)
+        self.assertEqual(report.counts["paid_without_booking"], 1)
+
+    def test_fixes_drift_and_leaves_the_rest_for_review(self):
+        report = reconciliation.reconcile(self.sessions, chunk_size=2)
+        self.assertEqual(dict(report.counts), self.expected)
+
+        self.unpaid.refresh_from_db()
+        self.assertEqual((self.unpaid.payment_status, self.unpaid.payment_mode), ("paid", "now"))
+        payment = Payment.objects.get(stripe_session_id="cs_1")
+        self.assertEqual((payment.payment_status, payment.amount), ("paid", 500))
+        self.assertEqual(CheckoutSession.objects.get(stripe_session_id="cs_1").booking, self.unpaid)
+        self.assertEqual(CheckoutSession.objects.get(stripe_session_id="cs_2").stripe_payment_intent_id, "pi_2")
+        self.assertEqual(Payment.objects.get(stripe_session_id="cs_2").payment_status, "paid")
+        # Needs a person: left as it was
+        self.assertEqual(Payment.objects.get(stripe_session_id="cs_4").payment_status, "paid")
+
+        again = reconciliation.reconcile(self.sessions)
+        self.assertEqual(dict(again.counts), {"paid_without_booking": 1, "paid_locally_only": 1})
+        self.assertTrue(all(kind not in reconciliation.FIXED for kind in again.counts))
+
+    def test_report_lists_only_the_first_mismatches(self):
+        report = reconciliation.reconcile(self.sessions, apply=False, keep=2)
+        self.assertEqual(len(report.mismatches), 2)
+        self.assertEqual(report.unlisted, sum(self.expected.values()) - 2)
+
+
+class CatalogFilterTests(TestCase):
+    """/workers/ filters and the facet counts returned with them."""
+
+    def setUp(self):
+        cache.clear()
+        plumbing = Profession.objects.create(name="Plumbing")
+        wiring = Profession.objects.create(name="Wiring")
+        cheap = Worker.objects.create(name="Cheap", phone="1234567890", profession=plumbing)
+        pricey = Worker.objects.create(name="Pricey", phone="1234567890", profession=wiring)
+        WorkerService.objects.create(worker=cheap, services="Repair", price=150)
+        WorkerService.objects.create(worker=pricey, services="Install", price=900)
+        self.client = APIClient()
+
+    def names(self, **params):
+        response = self.client.get("/workers/", params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(row["name"] for row in response.json()["results"])
+
+    def test_price_filters(self):
+        self.assertEqual(self.names(min_price="500"), ["Pricey"])
+        self.assertEqual(self.names(max_price="500"), ["Cheap"])
+        self.assertEqual(self.names(min_price="100", max_price="1000"), ["Cheap", "Pricey"])
+
+    def test_non_finite_filters_are_rejected(self):
+        for value in ("NaN", "Infinity", "-inf", "sNaN", "abc"):
+            for name in ("min_price", "max_price", "min_rating"):
+                self.assertEqual(self.client.get("/workers/", {name: value}).status_code, 400, (name, value))
+
+    def test_profession_by_id_or_slug(self):
+        wiring = Profession.objects.get(name="Wiring")
+        self.assertEqual(self.names(profession=str(wiring.pk)), ["Pricey"])
+        self.assertEqual(self.names(profession=wiring.slug), ["Pricey"])
+
+    def test_malformed_profession_is_rejected(self):
+        # "²" passes str.isdigit() but not int()
+        for value in ("²", "١", "9" * 40, "wiring!"):
+            for path in ("/workers/", "/availability/"):
+                response = self.client.get(path, {"profession": value})
+                self.assertEqual(response.status_code, 400, (path, value))
+                self.assertIn("detail", response.json())
+
+
+class WorkerFieldsetTests(TestCase):
+    """?fields= and ?expand= shape both the /workers/ rows and the queries behind them."""
+
+    def setUp(self):
+        cache.clear()
+        profession = Profession.objects.create(name="Plumbing")
+        customer = User.objects.create_user("customer", password="x", role="user")
+        for name in ("Asha", "Ravi"):
+            worker = Worker.objects.create(name=name, phone="1234567890", profession=profession, bio="Long bio")
+            WorkerService.objects.create(worker=worker, services="Repair", price=150)
+            WorkerRating.objects.create(worker=worker, user=customer, rating=4, review="Good")
+        self.client = APIClient()
+
+    def fetch(self, **params):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/workers/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"][0], [query["sql"] for query in queries]
+
+    def test_default_card_leaves_out_relations(self):
+        row, queries = self.fetch()
+        self.assertEqual(
+            set(row),
+            {"id", "image", "name", "profession", "experience", "location", "ratings", "starting_price"},
+        )
+        # Worker page and facet counts; no services or reviews prefetch
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('"bio"', queries[0])
+
+    def test_fields_narrow_keys_and_columns(self):
+        row, queries = self.fetch(fields="id,name")
+        self.assertEqual(set(row), {"id", "name"})
+        self.assertEqual(len(queries), 2)
+        for column in ('"image"', '"location"', '"experience"', '"bio"', '"HomeApp_profession"'):
+            self.assertNotIn(column, queries[0])
+
+    def test_expand_adds_one_prefetch_per_relation(self):
+        row, queries = self.fetch(expand="services")
+        self.assertIn("services", row)
+        self.assertNotIn("reviews", row)
+        self.assertEqual(len(queries), 3)
+
+        row, queries = self.fetch(expand="services,reviews")
+        self.assertEqual(row["services"][0]["services"], "Repair")
+        self.assertEqual(row["reviews"][0]["review"], "Good")
+        self.assertEqual(len(queries), 4)
+
+        row, queries = self.fetch(fields="id", expand="reviews")
+        self.assertEqual(set(row), {"id", "reviews"})
+        self.assertEqual(len(queries), 3)
+
+    def test_unknown_field_or_expand_is_rejected(self):
+        for params in ({"fields": "id,bio"}, {"fields": "password"}, {"expand": "bookings"}, {"expand": "services,user"}):
+            response = self.client.get("/workers/", params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn("detail", response.json())
+
+
+class WorkerSearchTests(TestCase):
+    """Ranked full-text search and the index upkeep on catalog saves."""
+
+    def setUp(self):
+        self.plumbing = Profession.objects.create(name="Plumbing")
+        self.client = APIClient()
+
+    def add_worker(self, name, **fields):
+        return Worker.objects.create(name=name, phone="1234567890", profession=self.plumbing, **fields)
+
+    def search(self, q, **params):
+        response = self.client.get("/workers/search/", {"q": q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def names(self, q):
+        return [row["name"] for row in self.search(q)["results"]]
+
+    def test_name_match_outranks_bio_match(self):
+        self.add_worker("Asha", bio="Knows every ravi street")
+        self.add_worker("Ravi Kumar")
+        self.assertEqual(self.names("ravi"), ["Ravi Kumar", "Asha"])
+
+    def test_terms_match_as_prefixes_and_must_all_match(self):
+        self.add_worker("Ravi", location="Bangalore")
+        self.add_worker("Ravindra", location="Mumbai")
+        self.assertEqual(sorted(self.names("rav")), ["Ravi", "Ravindra"])
+        self.assertEqual(self.names("rav bang"), ["Ravi"])
+        self.assertEqual(self.names("!!"), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        worker = self.add_worker("Ravi")
+        worker.name = "Suresh"
+        worker.save()
+        self.assertEqual(self.names("ravi"), [])
+        self.assertEqual(self.names("suresh"), ["Suresh"])
+
+        WorkerService.objects.create(worker=worker, services="Geyser installation", price=500)
+        self.assertEqual(self.names("geyser"), ["Suresh"])
+
+        self.plumbing.name = "Pipework"
+        self.plumbing.save()
+        self.assertEqual(self.names("pipework"), ["Suresh"])
+
+        worker.delete()
+        self.assertEqual(self.names("suresh"), [])
+
+    def test_results_are_paged(self):
+        for n in range(3):
+            self.add_worker(f"Ravi {n}")
+        first = self.search("ravi", page_size=2)
+        self.assertEqual((first["count"], len(first["results"])), (3, 2))
+        self.assertIsNotNone(first["next"])
+        last = self.search("ravi", page_size=2, page=2)
+        self.assertEqual((len(last["results"]), last["next"]), (1, None))
+
+
+class ResponseCacheTests(TestCase):
+    """Cached catalog responses are dropped by exactly the tags their data depends on."""
+
+    def setUp(self):
+        cache.clear()
+        profession = Profession.objects.create(name="Plumbing")
+        self.worker = Worker.objects.create(name="Ravi", phone="1234567890", profession=profession)
+        self.other = Worker.objects.create(name="Asha", phone="1234567890", profession=profession)
+        self.client = APIClient()
+
+    def cached(self, name, tags):
+        computed = []
+
+        def compute():
+            computed.append(1)
+            return "value"
+
+        response_cache.get_or_set(name, tags, compute)
+        return bool(computed)
+
+    def test_bumping_a_tag_drops_only_its_entries(self):
+        profile = [response_cache.worker_tag(self.worker.pk)]
+        listing = [response_cache.WORKER_LIST_TAG]
+        self.assertTrue(self.cached("profile", profile))
+        self.assertTrue(self.cached("listing", listing))
+        self.assertFalse(self.cached("profile", profile))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response_cache.invalidate_worker(self.worker.pk, listing=False)
+        self.assertTrue(self.cached("profile", profile))
+        self.assertFalse(self.cached("listing", listing))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response_cache.invalidate_worker(self.other.pk)
+        self.assertFalse(self.cached("profile", profile))
+        self.assertTrue(self.cached("listing", listing))
+
+    def test_saves_refresh_cached_endpoints(self):
+        url = f"/workers/{self.worker.pk}/"
+        self.assertEqual(self.client.get(url).json()["name"], "Ravi")
+        self.assertIn("Ravi", [row["name"] for row in self.client.get("/workers/").json()["results"]])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.worker.name = "Ravi Kumar"
+            self.worker.save()
+        self.assertEqual(self.client.get(url).json()["name"], "Ravi Kumar")
+        self.assertIn("Ravi Kumar", [row["name"] for row in self.client.get("/workers/").json()["results"]])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            WorkerService.objects.create(worker=self.worker, services="Geyser repair", price=500)
+        services = self.client.get(url).json()["services"]
+        self.assertEqual([service["services"] for service in services], ["Geyser repair"])
+
+    def test_cached_page_is_served_without_queries(self):
+        self.client.get("/workers/")
+        with self.assertNumQueries(0):
+            self.client.get("/workers/")
+
+
+class BookingTransitionTests(TestCase):
+    """transitions.transition() enforces TRANSITIONS and loses concurrent races cleanly."""
+
+    def setUp(self):
+        profession = Profession.objects.create(name="Plumbing")
+        self.worker_user = User.objects.create_user("worker", password="x", role="worker")
+        self.worker = Worker.objects.create(
+            name="Worker", phone="1234567890", profession=profession, user=self.worker_user
+        )
+        self.service = WorkerService.objects.create(worker=self.worker, services="Repair", price=500)
+        self.user = User.objects.create_user("customer", password="x", role="user")
+        self.booking = Booking.objects.create(
+            user=self.user, worker=self.worker, service=self.service,
+            date=date.today() + timedelta(days=3), time="10:00", status="pending",
+        )
+        availability.claim_booking(self.booking)
+
+    def test_legal_transition_updates_the_instance_and_row(self):
+        transitions.transition(self.booking, "accepted")
+        self.assertEqual(self.booking.status, "accepted")
+        self.assertEqual(Booking.objects.get(pk=self.booking.pk).status, "accepted")
+
+    def test_illegal_transitions_are_rejected(self):
+        for status in ("in_progress", "completed", "bogus"):
+            with self.assertRaises(transitions.InvalidTransition):
+                transitions.transition(self.booking, status)
+        transitions.transition(self.booking, "declined")
+        with self.assertRaises(transitions.InvalidTransition):
+            transitions.transition(self.booking, "accepted")
+        self.assertEqual(Booking.objects.get(pk=self.booking.pk).status, "declined")
+
+    def test_allowed_from_narrows_the_sources(self):
+        with self.assertRaises(transitions.InvalidTransition):
+            transitions.transition(self.booking, "canceled", allowed_from=("accepted",))
+
+    def test_stale_instance_loses_to_a_concurrent_change(self):
+        stale = Booking.objects.get(pk=self.booking.pk)
+        transitions.transition(self.booking, "canceled")
+        with self.assertRaises(transitions.StaleTransition):
+            transitions.transition(stale, "accepted")
+        self.assertEqual(Booking.objects.get(pk=self.booking.pk).status, "canceled")
+
+    def test_leaving_an_active_status_frees_the_day(self):
+        self.assertTrue(availability.is_worker_booked(self.worker, self.booking.date))
+        transitions.transition(self.booking, "canceled")
+        self.assertFalse(availability.is_worker_booked(self.worker, self.booking.date))
+
+    def test_status_endpoint_reports_conflicts(self):
+        client = APIClient()
+        client.force_authenticate(self.worker_user)
+        url = f"/bookings/{self.booking.pk}/update-status/"
+        self.assertEqual(client.patch(url, {"status": "completed"}, format="json").status_code, 400)
+        self.assertEqual(client.patch(url, {"status": "declined"}, format="json").status_code, 200)
+        self.assertEqual(client.patch(url, {"status": "accepted"}, format="json").status_code, 400)
+
+
+class WorkerCursorTests(TestCase):
+    """Keyset cursors on /workers/: pages cover every worker once; forged cursors get 404."""
+
+    def setUp(self):
+        cache.clear()
+        profession = Profession.objects.create(name="Plumbing")
+        for n, price in enumerate((300, 150, 300, 900, 500)):
+            worker = Worker.objects.create(name=f"Worker {n}", phone="1234567890", profession=profession)
+            WorkerService.objects.create(worker=worker, services="Repair", price=price)
+        self.client = APIClient()
+
+    def cursor(self, *parts):
+        raw = json.dumps(list(parts)).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def test_pages_follow_the_ordering(self):
+        seen, url, params = [], "/workers/", {"ordering": "-price", "page_size": 2}
+        while url:
+            page = self.client.get(url, params).json()
+            seen.extend(row["id"] for row in page["results"])
+            url, params = page["next"], {}
+        expected = sorted(
+            Worker.objects.all(), key=lambda worker: (-worker.services.get().price, -worker.pk)
+        )
+        self.assertEqual(seen, [worker.pk for worker in expected])
+
+    def test_forged_cursor_values_get_404(self):
+        for ordering, value in (("price", "abc"), ("rating", {"a": 1}), ("-rating", "zz"), ("rating", None)):
+            response = self.client.get("/workers/", {"ordering": ordering, "cursor": self.cursor(ordering, value, 1)})
+            self.assertEqual(response.status_code, 404, (ordering, value))
+        self.assertEqual(self.client.get("/workers/", {"cursor": "not-base64!"}).status_code, 404)
+
+    def test_cursor_from_another_ordering_gets_404(self):
+        page = self.client.get("/workers/", {"ordering": "price", "page_size": 2}).json()
+        cursor = page["next"].split("cursor=")[1].split("&")[0]
+        self.assertEqual(self.client.get("/workers/", {"ordering": "-rating", "cursor": cursor}).status_code, 404)
+
+
+class WorkerReviewsTests(TestCase):
+    """/workers/<id>/reviews/ pages newest first on (created_at, id)."""
+
+    def setUp(self):
+        cache.clear()
+        profession = Profession.objects.create(name="Plumbing")
+        self.worker = Worker.objects.create(name="Worker", phone="1234567890", profession=profession)
+        other = Worker.objects.create(name="Other", phone="1234567890", profession=profession)
+        base = timezone.now() - timedelta(days=30)
+        # Two pairs share a timestamp, so the id tie-break decides their order
+        for n, offset in enumerate((0, 1, 1, 2, 3, 3, 4)):
+            user = User.objects.create_user(f"customer{n}", password="x", role="user")
+            rating = WorkerRating.objects.create(worker=self.worker, user=user, rating=4, review=f"Review {n}")
+            WorkerRating.objects.filter(pk=rating.pk).update(created_at=base + timedelta(days=offset))
+            WorkerRating.objects.create(worker=other, user=user, rating=2)
+        self.client = APIClient()
+
+    def expected(self):
+        return list(
+            WorkerRating.objects.filter(worker=self.worker).order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+
+    def collect(self, url, params=None):
+        seen = []
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            seen.extend(row["id"] for row in page["results"])
+            url, params = page["next"], None
+        return seen
+
+    def test_pages_are_newest_first_without_gaps_or_repeats(self):
+        seen = self.collect(f"/workers/{self.worker.pk}/reviews/", {"page_size": 2})
+        self.assertEqual(seen, self.expected())
+
+    def test_profile_preview_links_to_the_rest(self):
+        profile = self.client.get(f"/workers/{self.worker.pk}/").json()
+        first = [row["id"] for row in profile["ratings_list"]]
+        self.assertEqual(len(first), 7)
+        self.assertIsNone(profile["reviews_next"])
+
+        # A smaller page leaves a remainder for the reviews endpoint to serve
+        with mock.patch.object(ReviewPagination, "page_size", 3):
+            cache.clear()
+            profile = self.client.get(f"/workers/{self.worker.pk}/").json()
+        first = [row["id"] for row in profile["ratings_list"]]
+        self.assertEqual(first + self.collect(profile["reviews_next"]), self.expected())
+
+    def test_unknown_worker_gets_404(self):
+        self.assertEqual(self.client.get("/workers/999999/reviews/").status_code, 404)
+
+    def test_forged_cursor_gets_404(self):
+        url = f"/workers/{self.worker.pk}/reviews/"
+        for value in ("yesterday", 5, None):
+            raw = json.dumps(["-created_at", value, 1]).encode()
+            cursor = base64.urlsafe_b64encode(raw).decode().rstrip("=")
+            self.assertEqual(self.client.get(url, {"cursor": cursor}).status_code, 404, value)
+
+
+class AvailabilitySearchTests(TestCase):
+    """/availability/: free workers per day for one profession, minus booked and held days."""
+
+    def setUp(self):
+        self.profession = Profession.objects.create(name="Plumbing")
+        self.asha = Worker.objects.create(name="Asha", phone="1234567890", profession=self.profession, rating=5)
+        self.ravi = Worker.objects.create(name="Ravi", phone="1234567890", profession=self.profession, rating=4)
+        Worker.objects.create(name="Wired", phone="1234567890", profession=Profession.objects.create(name="Wiring"))
+        self.service = WorkerService.objects.create(worker=self.asha, services="Repair", price=500)
+        self.user = User.objects.create_user("customer", password="x", role="user")
+        self.start = date.today() + timedelta(days=1)
+        self.client = APIClient()
+
+    def day(self, offset):
+        return self.start + timedelta(days=offset)
+
+    def search(self, **params):
+        params.setdefault("profession", self.profession.slug)
+        return self.client.get("/availability/", params)
+
+    def free(self, days=4):
+        response = self.search(**{"from": self.start.isoformat(), "to": self.day(days - 1).isoformat()})
+        self.assertEqual(response.status_code, 200)
+        return {row["date"]: [worker["name"] for worker in row["workers"]] for row in response.json()["days"]}
+
+    def book(self, worker, day, status="pending"):
+        booking = Booking.objects.create(
+            user=self.user, worker=worker, service=self.service, date=day, time="10:00", status=status
+        )
+        availability.claim_booking(booking)
+        return booking
+
+    def test_booked_and_held_days_are_removed(self):
+        self.book(self.asha, self.day(0))
+        availability.hold_day(self.ravi, self.day(1), self.user, timezone.now() + timedelta(minutes=10))
+        # Neither an expired hold nor a cancelled booking keeps its day
+        availability.hold_day(self.asha, self.day(2), self.user, timezone.now() - timedelta(minutes=1))
+        canceled = self.book(self.ravi, self.day(3))
+        canceled.status = "canceled"
+        canceled.save()
+
+        self.assertEqual(self.free(), {
+            self.day(0).isoformat(): ["Ravi"],
+            self.day(1).isoformat(): ["Asha"],
+            self.day(2).isoformat(): ["Asha", "Ravi"],
+            self.day(3).isoformat(): ["Asha", "Ravi"],
+        })
+
+    def test_published_schedule_limits_the_days(self):
+        availability.update_available_days(self.ravi, add=[self.day(1)])
+        free = self.free(days=2)
+        self.assertEqual(free[self.day(0).isoformat()], ["Asha"])
+        self.assertEqual(free[self.day(1).isoformat()], ["Asha", "Ravi"])
+
+    def test_rows_carry_open_hours(self):
+        row = self.search(**{"from": self.start.isoformat(), "to": self.start.isoformat()}).json()["days"][0]
+        self.assertEqual(row["workers"][0]["open_hours"], list(availability.OPEN_HOURS))
+
+    def test_range_is_capped(self):
+        last = self.day(availability.MAX_SEARCH_DAYS - 1)
+        response = self.search(**{"from": self.start.isoformat(), "to": last.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["days"]), availability.MAX_SEARCH_DAYS)
+
+        response = self.search(**{"from": self.start.isoformat(), "to": (last + timedelta(days=1)).isoformat()})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("detail", response.json())
+
+    def test_bad_ranges_are_rejected(self):
+        for params in (
+            {"from": "2024-13-01"},
+            {"from": self.day(2).isoformat(), "to": self.start.isoformat()},
+        ):
+            self.assertEqual(self.search(**params).status_code, 400, params)
+
+    def test_past_days_are_skipped(self):
+        response = self.search(**{"from": (date.today() - timedelta(days=3)).isoformat(), "to": self.start.isoformat()})
+        self.assertEqual(response.json()["from"], date.today().isoformat())
+        self.assertEqual(len(response.json()["days"]), 2)
+
+    def test_profession_is_required(self):
+        response = self.client.get("/availability/")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("detail", response.json())
+
+    def test_profession_by_id_and_unknown_slug(self):
+        by_id = self.search(profession=str(self.profession.pk), **{"from": self.start.isoformat(), "to": self.start.isoformat()})
+        self.assertEqual([w["name"] for w in by_id.json()["days"][0]["workers"]], ["Asha", "Ravi"])
+        unknown = self.search(profession="carpentry", **{"from": self.start.isoformat(), "to": self.start.isoformat()})
+        self.assertEqual(unknown.status_code, 200)
+        self.assertEqual(unknown.json()["days"][0]["workers"], [])
+
+
+class WorkerAvailabilityTests(TestCase):
+    """A worker's own schedule edits and the ?available_on= catalog filter they feed."""
+
+    def setUp(self):
+        cache.clear()
+        profession = Profession.objects.create(name="Plumbing")
+        self.worker_user = User.objects.create_user("worker", password="x", role="worker")
+        self.worker = Worker.objects.create(
+            name="Scheduled", phone="1234567890", profession=profession, user=self.worker_user
+        )
+        Worker.objects.create(name="Anytime", phone="1234567890", profession=profession)
+        self.client = APIClient()
+        self.client.force_authenticate(self.worker_user)
+        self.day = date.today() + timedelta(days=3)
+
+    def patch(self, **data):
+        return self.client.patch("/worker/availability/", data, format="json")
+
+    def test_add_and_remove_days(self):
+        later = self.day + timedelta(days=1)
+        response = self.patch(add=[self.day.isoformat(), later.isoformat(), later.isoformat()])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["dates"], [self.day.isoformat(), later.isoformat()])
+
+        response = self.patch(remove=[self.day.isoformat()])
+        self.assertEqual(response.json()["dates"], [later.isoformat()])
+        self.assertEqual(self.client.get("/worker/availability/").json()["dates"], [later.isoformat()])
+
+    def test_past_days_are_not_listed(self):
+        availability.update_available_days(self.worker, add=[date.today() - timedelta(days=1)])
+        self.assertEqual(self.client.get("/worker/availability/").json()["dates"], [])
+
+    def test_invalid_edits_are_rejected(self):
+        too_many = [(self.day + timedelta(days=n)).isoformat() for n in range(availability.MAX_SCHEDULE_EDIT + 1)]
+        for data in (
+            {"add": self.day.isoformat()},
+            {"add": ["2026-02-30"]},
+            {"remove": ["tomorrow"]},
+            {"add": too_many},
+        ):
+            response = self.patch(**data)
+            self.assertEqual(response.status_code, 400, data)
+            self.assertIn("detail", response.json())
+        self.assertFalse(self.worker.available_days.exists())
+
+    def test_only_workers_manage_availability(self):
+        self.client.force_authenticate(User.objects.create_user("customer", password="x", role="user"))
+        self.assertEqual(self.patch(add=[self.day.isoformat()]).status_code, 403)
+
+    def test_available_on_filter(self):
+        self.patch(add=[self.day.isoformat()])
+
+        def names(day):
+            response = self.client.get("/workers/", {"available_on": day.isoformat()})
+            self.assertEqual(response.status_code, 200)
+            return sorted(row["name"] for row in response.json()["results"])
+
+        # Workers without a schedule take any day
+        self.assertEqual(names(self.day), ["Anytime", "Scheduled"])
+        self.assertEqual(names(self.day + timedelta(days=1)), ["Anytime"])
+        self.assertEqual(self.client.get("/workers/", {"available_on": "03/01/2026"}).status_code, 400)
+
+
+class AvailabilityMigrationTests(TransactionTestCase):
+    """0017 copies Worker.availability_dates JSON into WorkerAvailability rows."""
+
+    before = [("HomeApp", "0016_slot_holds")]
+    after = [("HomeApp", "0017_worker_availability_table")]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_forward_copy(self):
+        apps = self.migrate(self.before)
+        Profession = apps.get_model("HomeApp", "Profession")
+        Worker = apps.get_model("HomeApp", "Worker")
+        profession = Profession.objects.create(name="Plumbing", slug="plumbing")
+        listed = Worker.objects.create(
+            name="Listed", phone="1234567890", profession=profession,
+            # Duplicates, a datetime-style value and junk all appear in old rows
+            availability_dates=["2026-03-01", "2026-03-01", "2026-03-02T09:00:00", "soon"],
+        )
+        Worker.objects.create(name="Open", phone="1234567890", profession=profession, availability_dates=[])
+
+        apps = self.migrate(self.after)
+        WorkerAvailability = apps.get_model("HomeApp", "WorkerAvailability")
+        self.assertEqual(
+            sorted(WorkerAvailability.objects.values_list("worker_id", "date")),
+            [(listed.pk, date(2026, 3, 1)), (listed.pk, date(2026, 3, 2))],
+        )
+
+
+class WorkerCalendarFeedTests(TestCase):
+    """The tokenised .ics feed: who can read it, what it lists and how it revalidates."""
+
+    def setUp(self):
+        cache.clear()
+        profession = Profession.objects.create(name="Plumbing")
+        self.worker_user = User.objects.create_user("worker", password="x", role="worker")
+        self.worker = Worker.objects.create(
+            name="Worker", phone="1234567890", profession=profession, user=self.worker_user
+        )
+        self.service = WorkerService.objects.create(worker=self.worker, services="Repair", price=500)
+        self.user = User.objects.create_user("customer", password="x", role="user")
+        self.client = APIClient()
+        self.url = f"/calendar/{ical.worker_token(self.worker)}.ics"
+
+    def book(self, offset, status, **fields):
+        return Booking.objects.create(
+            user=self.user, worker=self.worker, service=self.service,
+            date=date.today() + timedelta(days=offset), time="10:00", status=status, **fields
+        )
+
+    def feed(self, **headers):
+        response = self.client.get(self.url, **headers)
+        body = b"".join(response.streaming_content).decode() if response.streaming else ""
+        return response, body
+
+    def test_worker_gets_their_feed_url(self):
+        self.client.force_authenticate(self.worker_user)
+        response = self.client.get("/worker/calendar/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["url"].endswith(self.url))
+
+    def test_bad_token_gets_404(self):
+        for token in ("nope", f"{self.worker.pk}:forged", ical.worker_token(self.worker) + "x"):
+            self.assertEqual(self.client.get(f"/calendar/{token}.ics").status_code, 404, token)
+
+    def test_feed_streams_live_and_completed_bookings(self):
+        pending = self.book(1, "pending", notes="Ring twice; gate, left")
+        accepted = self.book(2, "accepted")
+        completed = self.book(-3, "completed")
+        declined = self.book(4, "declined")
+        canceled = self.book(5, "canceled")
+
+        response, body = self.feed()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+        self.assertTrue(body.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertTrue(body.endswith("END:VCALENDAR\r\n"))
+        self.assertEqual(body.count("BEGIN:VEVENT"), 3)
+        for booking in (pending, accepted, completed):
+            self.assertIn(f"UID:booking-{booking.pk}@homeservice", body)
+        for booking in (declined, canceled):
+            self.assertNotIn(f"UID:booking-{booking.pk}@homeservice", body)
+        self.assertIn("STATUS:TENTATIVE", body)
+        self.assertIn("DESCRIPTION:Ring twice\\; gate\\, left", body)
+
+    def test_unchanged_feed_gets_304(self):
+        self.book(1, "pending")
+        response, _ = self.feed()
+        etag = response["ETag"]
+        self.assertEqual(self.feed(HTTP_IF_NONE_MATCH=etag)[0].status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book(2, "accepted")
+        response, body = self.feed(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body.count("BEGIN:VEVENT"), 2)
+
+    def test_deleted_worker_gets_404_not_304(self):
+        etag = self.feed()[0]["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.worker.delete()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+    def test_long_lines_are_folded(self):
+        line = "SUMMARY:" + "é" * 60
+        folded = ical._fold(line)
+        parts = folded.split("\r\n ")
+        self.assertTrue(all(len(part.encode()) <= 75 for part in parts))
+        self.assertEqual("".join(parts).rstrip("\r\n"), line)
+
+
+def stripe_event(event_id, type="checkout.session.expired", **data):
+    return {"id": event_id, "type": type, "data": {"object": {"id": f"cs_{event_id}", **data}}}
+
+
+@override_settings(STRIPE_EVENT_MAX_ATTEMPTS=3, STRIPE_EVENT_RETRY_SECONDS=30, STRIPE_EVENT_LOCK_SECONDS=300)
+class StripeEventInboxTests(TestCase):
+    """Recording, claiming, retrying and reclaiming events in the webhook inbox."""
+
+    def setUp(self):
+        profession = Profession.objects.create(name="Plumbing")
+        self.worker = Worker.objects.create(name="Worker", phone="1234567890", profession=profession)
+        self.user = User.objects.create_user("customer", password="x", role="user")
+
+    def hold(self, session_id):
+        return SlotHold.objects.create(
+            worker=self.worker, date=date.today() + timedelta(days=1), user=self.user,
+            stripe_session_id=session_id, expires_at=timezone.now() + timedelta(minutes=10),
+        )
+
+    @contextmanager
+    def failing(self):
+        handler = mock.Mock(side_effect=RuntimeError("boom"))
+        with mock.patch.dict(webhooks.HANDLERS, {"checkout.session.expired": handler}):
+            with self.assertLogs("HomeApp.webhooks", "ERROR"):
+                yield
+
+    def test_redelivered_event_is_stored_once(self):
+        self.assertTrue(webhooks.record(stripe_event("evt_1")))
+        self.assertFalse(webhooks.record(stripe_event("evt_1")))
+        self.assertFalse(webhooks.record(stripe_event("evt_2", type="customer.created")))
+        self.assertEqual(list(StripeEvent.objects.values_list("event_id", flat=True)), ["evt_1"])
+
+    def test_signed_webhook_is_stored_and_acknowledged(self):
+        payload = json.dumps(stripe_event("evt_signed"))
+        stamp = int(time.time())
+        signature = hmac.new(b"whsec_test", f"{stamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+        with override_settings(STRIPE_SECRET_KEY="sk_test_x", STRIPE_WEBHOOK_SECRET="whsec_test"):
+            for header in (f"t={stamp},v1={signature}", f"t={stamp},v1={signature}", f"t={stamp},v1=forged"):
+                response = self.client.post(
+                    "/payments/stripe/webhook/", payload, content_type="application/json",
+                    HTTP_STRIPE_SIGNATURE=header,
+                )
+                expected = 400 if header.endswith("forged") else 200
+                self.assertEqual(response.status_code, expected, header)
+        event = StripeEvent.objects.get()
+        self.assertEqual((event.event_id, event.status), ("evt_signed", "pending"))
+
+    def test_claim_takes_each_due_event_once(self):
+        webhooks.record(stripe_event("evt_1"))
+        webhooks.record(stripe_event("evt_2"))
+        StripeEvent.objects.filter(event_id="evt_2").update(next_attempt_at=timezone.now() + timedelta(minutes=5))
+
+        claimed = webhooks.claim(10)
+        self.assertEqual(claimed, [StripeEvent.objects.get(event_id="evt_1").pk])
+        self.assertEqual(webhooks.claim(10), [])
+        event = StripeEvent.objects.get(pk=claimed[0])
+        self.assertEqual((event.status, event.attempts), ("processing", 1))
+        self.assertIsNotNone(event.locked_at)
+
+    def test_processing_applies_the_handler(self):
+        self.hold("cs_evt_1")
+        webhooks.record(stripe_event("evt_1"))
+        [event_id] = webhooks.claim(10)
+        self.assertEqual(webhooks.process(event_id), "done")
+        self.assertFalse(SlotHold.objects.exists())
+        event = StripeEvent.objects.get()
+        self.assertEqual(event.status, "done")
+        self.assertIsNotNone(event.processed_at)
+
+    def test_failure_backs_off_exponentially(self):
+        webhooks.record(stripe_event("evt_1"))
+        with self.failing():
+            [event_id] = webhooks.claim(10)
+            before = timezone.now()
+            self.assertEqual(webhooks.process(event_id), "pending")
+            event = StripeEvent.objects.get()
+            self.assertIn("boom", event.last_error)
+            self.assertIsNone(event.locked_at)
+            self.assertGreaterEqual(event.next_attempt_at, before + timedelta(seconds=30))
+            self.assertEqual(webhooks.claim(10), [])
+
+            StripeEvent.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+            [event_id] = webhooks.claim(10)
+            before = timezone.now()
+            webhooks.process(event_id)
+            self.assertGreaterEqual(StripeEvent.objects.get().next_attempt_at, before + timedelta(seconds=60))
+        self.assertEqual(webhooks.retry_delay(30), webhooks.MAX_RETRY_DELAY)
+
+    def test_event_fails_after_max_attempts(self):
+        webhooks.record(stripe_event("evt_1"))
+        outcomes = []
+        with self.failing():
+            for _ in range(3):
+                StripeEvent.objects.update(next_attempt_at=None)
+                [event_id] = webhooks.claim(10)
+                outcomes.append(webhooks.process(event_id))
+        self.assertEqual(outcomes, ["pending", "pending", "failed"])
+        event = StripeEvent.objects.get()
+        self.assertEqual((event.status, event.attempts, event.next_attempt_at), ("failed", 3, None))
+        self.assertEqual(webhooks.claim(10), [])
+
+    def test_stuck_event_is_reclaimed_and_the_old_worker_backs_off(self):
+        hold = self.hold("cs_evt_1")
+        webhooks.record(stripe_event("evt_1"))
+        [event_id] = webhooks.claim(10)
+        self.assertFalse(webhooks.stuck().exists())
+
+        StripeEvent.objects.update(locked_at=timezone.now() - timedelta(seconds=301))
+        self.assertEqual(list(webhooks.stuck().values_list("pk", flat=True)), [event_id])
+        stale = StripeEvent.objects.get()
+        self.assertEqual(webhooks.claim(10), [event_id])
+        self.assertEqual(StripeEvent.objects.get().attempts, 2)
+
+        # The first worker finishing late must not apply the event a second time
+        with mock.patch.object(StripeEvent.objects, "get", return_value=stale):
+            self.assertEqual(webhooks.process(event_id), "processing")
+        self.assertTrue(SlotHold.objects.filter(pk=hold.pk).exists())
+        self.assertEqual(webhooks.process(event_id), "done")
+        self.assertFalse(SlotHold.objects.exists())
+
+    def test_retry_requeues_with_a_fresh_budget(self):
+        webhooks.record(stripe_event("evt_1"))
+        webhooks.record(stripe_event("evt_2"))
+        StripeEvent.objects.filter(event_id="evt_1").update(status="failed", attempts=3, last_error="boom")
+        StripeEvent.objects.filter(event_id="evt_2").update(status="done")
+        self.assertEqual(webhooks.retry(StripeEvent.objects.all()), 1)
+        event = StripeEvent.objects.get(event_id="evt_1")
+        self.assertEqual((event.status, event.attempts), ("pending", 0))
+        self.assertEqual(StripeEvent.objects.get(event_id="evt_2").status, "done")
+
+    def test_summary(self):
+        webhooks.record(stripe_event("evt_1"))
+        webhooks.record(stripe_event("evt_2"))
+        StripeEvent.objects.filter(event_id="evt_2").update(
+            status="processing", locked_at=timezone.now() - timedelta(hours=1)
+        )
+        summary = webhooks.summary()
+        self.assertEqual(summary["counts"], {"pending": 1, "processing": 1, "done": 0, "failed": 0})
+        self.assertEqual(summary["stuck"], 1)
+        self.assertIsNotNone(summary["oldest_pending_seconds"])
+
+
+class StripeEventAdminTests(TestCase):
+    """Superadmin view of the webhook inbox and its retry button."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser("admin", password="x", email="admin@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        webhooks.record(stripe_event("evt_failed"))
+        webhooks.record(stripe_event("evt_done"))
+        StripeEvent.objects.filter(event_id="evt_failed").update(status="failed", attempts=8, last_error="boom")
+        StripeEvent.objects.filter(event_id="evt_done").update(status="done")
+        self.failed = StripeEvent.objects.get(event_id="evt_failed")
+
+    def test_lists_failed_events(self):
+        response = self.client.get("/api/superadmin/payments/webhook-events/")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["counts"]["failed"], 1)
+        self.assertEqual([event["event_id"] for event in data["events"]], ["evt_failed"])
+
+    def test_retry_requeues_a_failed_event(self):
+        response = self.client.post(f"/api/superadmin/payments/webhook-events/{self.failed.pk}/retry/")
+        self.assertEqual(response.status_code, 200)
+        self.failed.refresh_from_db()
+        self.assertEqual((self.failed.status, self.failed.attempts), ("pending", 0))
+
+    def test_retry_of_a_done_or_unknown_event_is_404(self):
+        done = StripeEvent.objects.get(event_id="evt_done")
+        for pk in (done.pk, 999999):
+            response = self.client.post(f"/api/superadmin/payments/webhook-events/{pk}/retry/")
+            self.assertEqual(response.status_code, 404, pk)
+            self.assertIn("error", response.json())
+
+    def test_requires_a_superuser(self):
+        self.client.force_authenticate(User.objects.create_user("customer", password="x", role="user"))
+        self.assertEqual(self.client.get("/api/superadmin/payments/webhook-events/").status_code, 403)
+        self.assertEqual(
+            self.client.post(f"/api/superadmin/payments/webhook-events/{self.failed.pk}/retry/").status_code, 403
+        )
+
+
+class ProcessStripeEventsCommandTests(TransactionTestCase):
+    """manage.py process_stripe_events drains the inbox on its worker threads."""
+
+    def setUp(self):
+        profession = Profession.objects.create(name="Plumbing")
+        worker = Worker.objects.create(name="Worker", phone="1234567890", profession=profession)
+        user = User.objects.create_user("customer", password="x", role="user")
+        SlotHold.objects.create(
+            worker=worker, date=date.today() + timedelta(days=1), user=user,
+            stripe_session_id="cs_evt_1", expires_at=timezone.now() + timedelta(minutes=10),
+        )
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command("process_stripe_events", *args, stdout=out)
+        return out.getvalue()
+
+    def test_drains_due_events(self):
+        webhooks.record(stripe_event("evt_1"))
+        webhooks.record(stripe_event("evt_2"))
+        self.assertEqual(self.run_command("--workers", "1").strip(), "2 done")
+        self.assertEqual(set(StripeEvent.objects.values_list("status", flat=True)), {"done"})
+        self.assertFalse(SlotHold.objects.exists())
+        self.assertEqual(self.run_command(), "")
+
+    def test_status_and_retry(self):
+        webhooks.record(stripe_event("evt_1"))
+        StripeEvent.objects.update(status="failed", attempts=8, last_error="boom")
+        output = self.run_command("--status")
+        self.assertIn("1 failed", output)
+        self.assertIn("FAILED  evt_1", output)
+
+        self.assertIn("Requeued 1 event(s)", self.run_command("--retry"))
+        self.assertEqual(StripeEvent.objects.get().status, "pending")
+
+
+class PaymentIntentFailedTests(TestCase):
+    """payment_intent.payment_failed resolves its booking locally, never through Stripe."""
+
+    def setUp(self):
+        profession = Profession.objects.create(name="Plumbing")
+        worker = Worker.objects.create(name="Worker", phone="1234567890", profession=profession)
+        service = WorkerService.objects.create(worker=worker, services="Repair", price=500)
+        self.user = User.objects.create_user("customer", password="x", role="user")
+        self.booking = Booking.objects.create(
+            user=self.user, worker=worker, service=service, date=date.today() + timedelta(days=1),
+            time="10:00", status="pending", payment_mode="now", payment_status="pending",
+        )
+        self.checkout = CheckoutSession.objects.create(
+            stripe_session_id="cs_1", user=self.user, booking=self.booking
+        )
+        # A session whose intent is not known yet must not match intents without an id
+        CheckoutSession.objects.create(stripe_session_id="cs_other", user=self.user)
+
+    @contextmanager
+    def no_stripe(self):
+        called = AssertionError("called Stripe")
+        with mock.patch.object(payments, "client", side_effect=called):
+            with mock.patch.object(stripe.checkout.Session, "list", side_effect=called):
+                yield
+
+    def test_found_by_intent_id(self):
+        CheckoutSession.objects.filter(pk=self.checkout.pk).update(stripe_payment_intent_id="pi_1")
+        self.assertEqual(payments.checkout_for_intent({"id": "pi_1"}), self.checkout)
+
+    def test_found_by_checkout_id_metadata(self):
+        intent = {"id": "pi_new", "metadata": {"checkout_id": str(self.checkout.pk)}}
+        self.assertEqual(payments.checkout_for_intent(intent), self.checkout)
+
+    def test_no_match(self):
+        for intent in (
+            {"id": "pi_unknown", "metadata": {}},
+            {"id": "pi_unknown", "metadata": {"checkout_id": "999999"}},
+            {"metadata": {"checkout_id": "²"}},
+            {},
+        ):
+            self.assertIsNone(payments.checkout_for_intent(intent), intent)
+
+    def test_failed_payment_marks_the_booking_without_stripe(self):
+        intent = {"id": "pi_new", "metadata": {"checkout_id": str(self.checkout.pk)}}
+        with self.no_stripe():
+            webhooks.payment_intent_failed(intent)
+
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.payment_status, "failed")
+        payment = Payment.objects.get(booking=self.booking)
+        self.assertEqual(
+            (payment.payment_status, payment.stripe_session_id, payment.stripe_payment_intent_id),
+            ("failed", "cs_1", "pi_new"),
+        )
+        # Later events for the intent match on its id
+        self.checkout.refresh_from_db()
+        self.assertEqual(self.checkout.stripe_payment_intent_id, "pi_new")
+
+    def test_session_without_a_booking_only_learns_its_intent(self):
+        checkout = CheckoutSession.objects.get(stripe_session_id="cs_other")
+        webhooks.payment_intent_failed({"id": "pi_hold", "metadata": {"checkout_id": str(checkout.pk)}})
+        checkout.refresh_from_db()
+        self.assertEqual(checkout.stripe_payment_intent_id, "pi_hold")
+        self.assertFalse(Payment.objects.exists())
+
+    def test_unmatched_intent_changes_nothing(self):
+        with self.no_stripe():
+            webhooks.payment_intent_failed({"id": "pi_unknown", "metadata": {}})
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.payment_status, "pending")
+        self.assertFalse(Payment.objects.exists())
+
+    def test_applied_from_the_inbox(self):
+        event = {
+            "id": "evt_failed",
+            "type": "payment_intent.payment_failed",
+            "data": {"object": {"id": "pi_new", "metadata": {"checkout_id": str(self.checkout.pk)}}},
+        }
+        webhooks.record(event)
+        [event_id] = webhooks.claim(10)
+        self.assertEqual(webhooks.process(event_id), "done")
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.payment_status, "failed")
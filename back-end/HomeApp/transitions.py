@@ -0,0 +1,73 @@
+"""
+Booking status changes.
+
+TRANSITIONS is the single list of legal status moves. transition() applies
+one as `UPDATE ... WHERE id = ? AND status IN (<statuses allowed to move
+there>)`, writing only the changed columns, so two concurrent changes can
+no longer overwrite each other: the loser updates no row and gets
+StaleTransition. The caller's instance is updated in place instead of
+being fetched again.
+
+A queryset update skips the Booking post_save signal, so the day's
+occupancy and the worker's cached profile are kept in step here.
+"""
+from django.db import transaction
+
+from . import availability, response_cache
+from .models import Booking
+
+# status -> statuses it may move to
+TRANSITIONS = {
+    "pending": ("confirmed", "accepted", "declined", "canceled"),
+    "confirmed": ("accepted", "in_progress", "completed", "canceled"),
+    "accepted": ("in_progress", "completed", "canceled"),
+    "in_progress": ("completed", "canceled"),
+    "declined": (),
+    "completed": (),
+    "canceled": (),
+}
+
+
+class InvalidTransition(Exception):
+    """The booking cannot move from its current status to the requested one."""
+
+    def __init__(self, current, new):
+        self.current = current
+        self.new = new
+        super().__init__(f"Cannot change a {current} booking to {new}")
+
+
+class StaleTransition(InvalidTransition):
+    """The booking's status changed concurrently and the update matched no row."""
+
+
+def sources(new_status, allowed_from=None):
+    """Statuses that may move to `new_status`, optionally narrowed to `allowed_from`."""
+    statuses = [status for status, targets in TRANSITIONS.items() if new_status in targets]
+    if allowed_from is not None:
+        statuses = [status for status in statuses if status in allowed_from]
+    return statuses
+
+
+def transition(booking, new_status, allowed_from=None, **changes):
+    """
+    Move `booking` to `new_status`, also setting any other `changes`
+    (field=value). Raises InvalidTransition if its current status may not
+    move there and StaleTransition if it changed since it was loaded.
+    Returns the booking with the new values applied.
+    """
+    allowed = sources(new_status, allowed_from)
+    if booking.status not in allowed:
+        raise InvalidTransition(booking.status, new_status)
+
+    fields = {"status": new_status, **changes}
+    with transaction.atomic():
+        updated = Booking.objects.filter(pk=booking.pk, status__in=allowed).update(**fields)
+        if not updated:
+            raise StaleTransition(booking.status, new_status)
+        for name, value in fields.items():
+            setattr(booking, name, value)
+        availability.sync_booking(booking)
+
+    response_cache.invalidate_worker(booking.worker_id, listing=False)
+    return booking
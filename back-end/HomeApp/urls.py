@@ -21,15 +21,22 @@ urlpatterns = [
     path('worker/dashboard/', views.worker_dashboard, name='worker_dashboard'),
     path('worker/service/', views.add_service, name='add_service'),
     path('worker/service/<int:service_id>/', views.edit_service, name='edit_service'),
+    path('worker/availability/', views.worker_availability, name='worker_availability'),
+    path('worker/calendar/', views.worker_calendar, name='worker_calendar'),
 
     # Worker public view
     path('workers/', views.worker_list, name='worker_list'),
+    path('workers/search/', views.worker_search, name='worker_search'),
+    path('workers/nearby/', views.worker_nearby, name='worker_nearby'),
     path('workers/<int:pk>/', views.worker_details, name='worker_details'),
     path("workers/<int:worker_id>/rate/", views.rate_worker, name="rate-worker"),
+    path("workers/<int:worker_id>/reviews/", views.worker_reviews, name="worker_reviews"),
     path("professions/", views.profession_list, name="profession-list"),
+    path("availability/", views.availability_search, name="availability_search"),
 
     # Booking URLs
     path("workers/<int:worker_id>/book/", views.create_booking, name="create_booking"),
+    path("workers/<int:worker_id>/book/batch/", views.create_booking_batch, name="create_booking_batch"),
     path("payments/stripe/checkout/<int:booking_id>/", views.create_stripe_checkout_session, name="create_stripe_checkout_session"),
     path("payments/stripe/checkout/new/<int:worker_id>/", views.create_stripe_checkout_session_new, name="create_stripe_checkout_session_new"),
     path("payments/stripe/confirm/", views.confirm_stripe_payment, name="confirm_stripe_payment"),
@@ -39,4 +46,5 @@ urlpatterns = [
     path("bookings/<int:booking_id>/cancel/", views.cancel_booking, name="cancel_booking"),
     path("bookings/<int:booking_id>/complete/", views.user_complete_booking, name="user-complete-booking"),
     path("payments/stripe/webhook/", views.stripe_webhook, name="stripe_webhook"),
+    path("calendar/<str:token>.ics", views.worker_calendar_feed, name="worker_calendar_feed"),
 ]
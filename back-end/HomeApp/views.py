@@ -1,10 +1,15 @@
+import math
+
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_GET
 from rest_framework.decorators import api_view,permission_classes,parser_classes
 from rest_framework.permissions import IsAuthenticated,AllowAny
 from rest_framework.response import Response 
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.parsers import MultiPartParser, FormParser
-from django.db.models import Avg
+from rest_framework.utils.urls import replace_query_param
 from django.db import transaction
 from django.contrib.auth import authenticate, get_user_model
 from .serializers  import (
@@ -14,10 +19,14 @@ from .serializers  import (
     WorkerRegistrationSerializer,
     WorkerServiceSerializer,
     WorkerSerializer,
+    WorkerListSerializer,
+    WorkerRatingSerializer,
     BookingSerializer
     )
 from rest_framework import status
-from .models import Profession, UserProfile, Worker, WorkerService,WorkerRating ,Booking
+from .models import Profession, UserProfile, Worker, WorkerService,WorkerRating ,Booking, SlotHold
+from .pagination import BookingPagination, ReviewPagination, WorkerCursorPagination
+from . import availability, catalog, geo, ical, idempotency, payments, response_cache, search, transitions, webhooks
 from django.core.mail import send_mail
 
 
@@ -93,6 +102,21 @@ def user_profile(request):
         return Response(serializer.errors, status=400)
 
     
+def newest_reviews(request, worker):
+    """
+    First page of a worker's reviews, newest first, plus the cursor link
+    for /workers/<id>/reviews/ to fetch the rest.
+    """
+    paginator = ReviewPagination()
+    page = paginator.paginate_queryset(
+        WorkerRating.objects.filter(worker=worker).select_related("user"), request, first_page=True
+    )
+    next_link = paginator.get_next_link(
+        base_url=request.build_absolute_uri(reverse("worker_reviews", args=[worker.pk]))
+    )
+    return page, next_link
+
+
 # Worker Setup --- >>
 
 @api_view(['POST'])
@@ -121,10 +145,6 @@ def worker_dashboard(request):
         # Get all bookings for this worker
         completed_jobs = Booking.objects.filter(worker=worker, status="completed").count()
 
-        ratings_qs = WorkerRating.objects.filter(worker=worker)
-        avg_rating = ratings_qs.aggregate(Avg('rating'))['rating__avg']
-        total_ratings = ratings_qs.count()
-
         bookings = Booking.objects.filter(worker=worker).select_related("user", "service")
         bookings_data = [
             {
@@ -138,7 +158,7 @@ def worker_dashboard(request):
             for b in bookings
         ]
 
-        reviews = WorkerRating.objects.filter(worker=worker).select_related("user").order_by("-created_at")
+        reviews, reviews_next = newest_reviews(request, worker)
         reviews_list = [
             {
                 "id": r.id,  # pyright: ignore
@@ -156,10 +176,11 @@ def worker_dashboard(request):
             "completed_jobs": completed_jobs,
             "bookings": bookings_data,
             "ratings": {
-                "average_rating": round(avg_rating, 1) if avg_rating else 0,
-                "total_ratings": total_ratings,
+                "average_rating": worker.average_rating,
+                "total_ratings": worker.rating_count,
             },
             "reviews": reviews_list,
+            "reviews_next": reviews_next,
         })
 
     elif request.method == "PUT":
@@ -212,43 +233,241 @@ def edit_service(request, service_id):
         service.delete()
         return Response(status=204)
 
-# ✅ List all workers with ratings included
+@api_view(['GET', 'PATCH'])
+@permission_classes([IsAuthenticated])
+def worker_availability(request):
+    """
+    GET: the logged-in worker's available days from today on.
+    PATCH: {"add": [dates], "remove": [dates]} edits them in bulk.
+    A worker with no days listed can be booked on any day.
+    """
+    if request.user.role.lower() != "worker":
+        return Response({"detail": "Only workers can manage availability"}, status=403)
+
+    worker = get_object_or_404(Worker, user=request.user)
+
+    if request.method == 'PATCH':
+        parsed = {}
+        for key in ("add", "remove"):
+            values = request.data.get(key) or []
+            if not isinstance(values, list):
+                return Response({"detail": f"{key} must be a list of YYYY-MM-DD dates"}, status=400)
+            if len(values) > availability.MAX_SCHEDULE_EDIT:
+                return Response(
+                    {"detail": f"At most {availability.MAX_SCHEDULE_EDIT} dates can be changed at once"}, status=400
+                )
+            try:
+                parsed[key] = {datetime.strptime(str(value), "%Y-%m-%d").date() for value in values}
+            except ValueError:
+                return Response({"detail": f"{key} must be a list of YYYY-MM-DD dates"}, status=400)
+
+        availability.update_available_days(worker, add=parsed["add"], remove=parsed["remove"])
+        response_cache.invalidate_worker(worker.pk)
+
+    days = worker.available_days.filter(date__gte=datetime.now().date()).order_by("date")
+    return Response({"dates": [day.isoformat() for day in days.values_list("date", flat=True)]})
+
+
+# ✅ List workers with ratings included, one keyset page at a time
+@response_cache.conditional(lambda: [response_cache.WORKER_LIST_TAG])
 @api_view(['GET'])
 def worker_list(request):
-    workers = Worker.objects.select_related('user', 'profession').all()
-    serializer = WorkerSerializer(workers, many=True, context={'request': request})
-    return Response(serializer.data)
+    """
+    Filters: profession (slug or id), location, min_price / max_price (any
+    service in range), min_rating. Facet counts for the filtered catalog
+    are returned alongside the page.
+
+    Rows use the compact WorkerListSerializer; ?fields=a,b narrows it and
+    ?expand=services,reviews adds the nested relations.
+    """
+    fields, expand = catalog.parse_fieldset(request.query_params)
+
+    def build_page():
+        selected = WorkerListSerializer.selected_fields(fields, expand)
+        workers = catalog.filter_workers(catalog.catalog_queryset(selected), request.query_params)
+        paginator = WorkerCursorPagination()
+        page = paginator.paginate_queryset(workers, request)
+        serializer = WorkerListSerializer(
+            page, many=True, fields=fields, expand=expand, context={'request': request}
+        )
+        data = paginator.get_paginated_response(serializer.data).data
+        data["facets"] = catalog.facet_counts(workers, request.query_params)
+        return data
+
+    data = response_cache.get_or_set(
+        f"worker_list:{request.build_absolute_uri()}",
+        [response_cache.WORKER_LIST_TAG],
+        build_page,
+    )
+    return Response(data)
 
 @api_view(['GET'])
-def worker_details(request, pk):
-    worker = get_object_or_404(Worker, pk=pk)
-    serializer = WorkerSerializer(worker, context={'request': request})
+def worker_search(request):
+    """
+    Ranked full-text search over worker name, profession, services, location and bio
+    """
+    query = request.query_params.get("q", "").strip()
+    try:
+        page = max(int(request.query_params.get("page", 1)), 1)
+        page_size = min(max(int(request.query_params.get("page_size", 20)), 1), 100)
+    except ValueError:
+        return Response({"detail": "page and page_size must be integers"}, status=400)
 
-    # ✅ Completed jobs count
-    completed_jobs = Booking.objects.filter(worker=worker, status="completed").count()
+    worker_ids, total = search.search_worker_ids(query, limit=page_size, offset=(page - 1) * page_size)
 
-    # Fetch reviews directly from WorkerRating
-    reviews = WorkerRating.objects.filter(worker=worker).select_related("user").order_by("-created_at")
-    reviews_list = [
-        {
-            "id": r.id,  # pyright: ignore
-            "user": r.user.username,
-            "rating": r.rating,
-            "review": r.review,
-            "created_at": r.created_at.strftime("%Y-%m-%d %H:%M")  # optional
-        }
-        for r in reviews
-    ]
+    workers = catalog.catalog_queryset().in_bulk(worker_ids)
+    ranked = [workers[worker_id] for worker_id in worker_ids if worker_id in workers]
+    serializer = WorkerSerializer(ranked, many=True, context={'request': request})
+
+    next_url = None
+    if page * page_size < total:
+        next_url = replace_query_param(request.build_absolute_uri(), "page", page + 1)
 
     return Response({
-        **serializer.data,
-        "completedJobs": completed_jobs,   # 👈 added field
-        "ratings_list": reviews_list       # 👈 reviews attached here
+        "count": total,
+        "next": next_url,
+        "results": serializer.data,
     })
 
 
+@api_view(['GET'])
+def worker_nearby(request):
+    """
+    Workers within ?radius= km of ?lat=&lng=, nearest first, optionally
+    limited to one ?profession= (slug or id)
+    """
+    try:
+        latitude = float(request.query_params["lat"])
+        longitude = float(request.query_params["lng"])
+        radius = float(request.query_params.get("radius", 10))
+        limit = int(request.query_params.get("limit", 20))
+    except KeyError:
+        return Response({"detail": "lat and lng are required"}, status=400)
+    except ValueError:
+        return Response({"detail": "lat, lng, radius and limit must be numbers"}, status=400)
+
+    if not all(math.isfinite(value) for value in (latitude, longitude, radius)):
+        return Response({"detail": "lat, lng and radius must be finite numbers"}, status=400)
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return Response({"detail": "lat/lng out of range"}, status=400)
+    if radius <= 0 or radius > geo.MAX_RADIUS_KM:
+        return Response({"detail": f"radius must be between 0 and {geo.MAX_RADIUS_KM} km"}, status=400)
+    limit = min(max(limit, 1), 100)
+
+    hits = geo.nearby(latitude, longitude, radius, request.query_params.get("profession"), limit)
+
+    selected = WorkerListSerializer.selected_fields()
+    workers = catalog.catalog_queryset(selected).in_bulk([worker_id for worker_id, _ in hits])
+    results = []
+    for worker_id, distance in hits:
+        if worker_id not in workers:
+            continue
+        row = WorkerListSerializer(workers[worker_id], context={'request': request}).data
+        row["distance_km"] = round(distance, 2)
+        results.append(row)
+
+    return Response({"results": results})
+
+
+@api_view(['GET'])
+def availability_search(request):
+    """
+    Workers of one ?profession= (slug or id) that are free on each day from
+    ?from= to ?to= (YYYY-MM-DD, inclusive), optionally in one ?location=,
+    with the hours they can still be booked for.
+    """
+    params = request.query_params
+    profession = params.get("profession")
+    if not profession:
+        return Response({"detail": "profession is required"}, status=400)
+
+    today = datetime.now().date()
+    try:
+        start = datetime.strptime(params["from"], "%Y-%m-%d").date() if params.get("from") else today
+        end = datetime.strptime(params["to"], "%Y-%m-%d").date() if params.get("to") else start + timedelta(days=6)
+    except ValueError:
+        return Response({"detail": "Invalid date format. Use YYYY-MM-DD."}, status=400)
+
+    if end < start:
+        return Response({"detail": "to must not be before from"}, status=400)
+    if (end - start).days >= availability.MAX_SEARCH_DAYS:
+        return Response(
+            {"detail": f"Search at most {availability.MAX_SEARCH_DAYS} days at a time"}, status=400
+        )
+    # Past days cannot be booked
+    start = max(start, today)
+
+    workers = catalog.filter_workers(
+        Worker.objects.filter(is_active=True), {"profession": profession, "location": params.get("location")}
+    ).only("id", "name", "location", "rating").order_by("-rating", "pk")
+
+    days = []
+    if start <= end:
+        for day, free in availability.free_workers_by_day(workers, start, end):
+            days.append({
+                "date": day.isoformat(),
+                "workers": [
+                    {
+                        "id": worker.pk,
+                        "name": worker.name,
+                        "location": worker.location,
+                        "open_hours": list(availability.OPEN_HOURS),
+                    }
+                    for worker in free
+                ],
+            })
+
+    return Response({"from": start.isoformat(), "to": end.isoformat(), "days": days})
+
+
+def worker_detail_tags(pk):
+    # No validators for a missing worker, so the view answers 404 rather than 304
+    if not Worker.objects.filter(pk=pk).exists():
+        return None
+    return [response_cache.worker_tag(pk), response_cache.PROFESSIONS_TAG]
+
+
+@response_cache.conditional(worker_detail_tags)
+@api_view(['GET'])
+def worker_details(request, pk):
+    def build_profile():
+        worker = get_object_or_404(catalog.catalog_queryset(), pk=pk)
+        serializer = WorkerSerializer(worker, context={'request': request})
+
+        # ✅ Completed jobs count
+        completed_jobs = Booking.objects.filter(worker=worker, status="completed").count()
+
+        # Newest page of reviews; older ones come from /workers/<id>/reviews/
+        reviews, reviews_next = newest_reviews(request, worker)
+        reviews_list = [
+            {
+                "id": r.id,  # pyright: ignore
+                "user": r.user.username,
+                "rating": r.rating,
+                "review": r.review,
+                "created_at": r.created_at.strftime("%Y-%m-%d %H:%M")  # optional
+            }
+            for r in reviews
+        ]
+
+        return {
+            **serializer.data,
+            "completedJobs": completed_jobs,   # 👈 added field
+            "ratings_list": reviews_list,      # 👈 reviews attached here
+            "reviews_next": reviews_next,
+        }
+
+    data = response_cache.get_or_set(
+        f"worker_details:{request.get_host()}:{pk}",
+        [response_cache.worker_tag(pk), response_cache.PROFESSIONS_TAG],
+        build_profile,
+    )
+    return Response(data)
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@idempotency.idempotent
 def rate_worker(request, worker_id):
     # ✅ Ensure only "users" can rate
     if request.user.role.lower() != "user":
@@ -271,31 +490,92 @@ def rate_worker(request, worker_id):
     if rating_value < 1 or rating_value > 5:
         return Response({"error": "Rating must be between 1 and 5"}, status=400)
 
-    # Create or update rating with review
-    WorkerRating.objects.update_or_create(
-        worker=worker,
-        user=request.user,
-        defaults={"rating": rating_value, "review": review_text}
-    )
-
-    # Calculate updated stats
-    avg = WorkerRating.objects.filter(worker=worker).aggregate(Avg('rating'))['rating__avg']
-    total = WorkerRating.objects.filter(worker=worker).count()
+    # Create or update rating with review, keeping the worker's aggregates in step
+    with transaction.atomic():
+        previous = (
+            WorkerRating.objects.select_for_update()
+            .filter(worker=worker, user=request.user)
+            .values_list("rating", flat=True)
+            .first()
+        )
+        WorkerRating.objects.update_or_create(
+            worker=worker,
+            user=request.user,
+            defaults={"rating": rating_value, "review": review_text}
+        )
+        worker.apply_rating(rating_value, previous)
 
-    # Fetch all reviews
-    reviews = WorkerRating.objects.filter(worker=worker).select_related("user").values(
-        "id", "rating", "review", "user__username"
-    )
+    # Newest page of reviews only
+    reviews, reviews_next = newest_reviews(request, worker)
 
     return Response({
         "message": "Rating submitted successfully",
-        "average_rating": round(avg, 1) if avg else 0,
-        "total_ratings": total,
-        "reviews": list(reviews)
+        "average_rating": worker.average_rating,
+        "total_ratings": worker.rating_count,
+        "reviews": [
+            {
+                "id": r.id,  # pyright: ignore
+                "rating": r.rating,
+                "review": r.review,
+                "user__username": r.user.username,
+            }
+            for r in reviews
+        ],
+        "reviews_next": reviews_next,
     }, status=status.HTTP_201_CREATED)
 
+
+@api_view(["GET"])
+def worker_reviews(request, worker_id):
+    """
+    A worker's reviews, newest first, keyset-paginated on (created_at, id)
+    """
+    worker = get_object_or_404(Worker.objects.only("pk"), pk=worker_id)
+    paginator = ReviewPagination()
+    page = paginator.paginate_queryset(
+        WorkerRating.objects.filter(worker=worker).select_related("user"), request
+    )
+    serializer = WorkerRatingSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
     
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def worker_calendar(request):
+    """The logged-in worker's private iCalendar feed URL, for calendar apps to subscribe to"""
+    if request.user.role.lower() != "worker":
+        return Response({"detail": "Only workers have a booking calendar"}, status=403)
+
+    worker = get_object_or_404(Worker, user=request.user)
+    url = request.build_absolute_uri(reverse("worker_calendar_feed", args=[ical.worker_token(worker)]))
+    return Response({"url": url})
+
+
+def calendar_feed_tags(token):
+    worker_id = ical.worker_id_for_token(token)
+    if worker_id is None:
+        raise Http404("Unknown calendar")
+    # No validators for a deleted worker, so the view answers 404 rather than 304
+    if not Worker.objects.filter(pk=worker_id).exists():
+        return None
+    # Booking changes bump the worker's tag, so it versions the feed too
+    return [response_cache.worker_tag(worker_id)]
+
+
+@response_cache.conditional(calendar_feed_tags)
+@require_GET
+def worker_calendar_feed(request, token):
+    """Streamed .ics of the live and completed bookings of the worker the token was issued to"""
+    worker = get_object_or_404(Worker.objects.only("id", "name"), pk=ical.worker_id_for_token(token))
+    response = StreamingHttpResponse(
+        ical.worker_feed(worker.pk, worker.name), content_type="text/calendar; charset=utf-8"
+    )
+    response["Content-Disposition"] = 'inline; filename="bookings.ics"'
+    return response
+
+
+@response_cache.conditional(lambda: [response_cache.PROFESSIONS_TAG])
 @api_view(["GET"])
 def profession_list(request):
     """
@@ -310,17 +590,20 @@ def profession_list(request):
 # Booking section
 
 
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from django.conf import settings
 from django.http import HttpResponse # For webhook
+from django.utils import timezone
 from decimal import Decimal
+import json
 import stripe
 from django.views.decorators.csrf import csrf_exempt
 
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@idempotency.idempotent
 def create_stripe_checkout_session(request, booking_id):
     """Create a Stripe Checkout Session for an existing Pending Booking"""
     if request.user.role.lower() != "user":
@@ -334,13 +617,14 @@ def create_stripe_checkout_session(request, booking_id):
     if not settings.STRIPE_SECRET_KEY:
         return Response({"detail": "Stripe is not configured. Add STRIPE_SECRET_KEY."}, status=500)
 
-    stripe.api_key = settings.STRIPE_SECRET_KEY
     amount_paise = int(booking.amount * 100)
 
     # Note: We don't create Payment record yet, we'll do that in the webhook
     # or upon confirmation.
     
-    session = stripe.checkout.Session.create(
+    session = payments.start_checkout(
+        request.user,
+        booking=booking,
         mode="payment",
         line_items=[
             {
@@ -370,6 +654,7 @@ def create_stripe_checkout_session(request, booking_id):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@idempotency.idempotent
 def create_stripe_checkout_session_new(request, worker_id):
     """Create a Stripe Checkout Session without creating booking first"""
     if request.user.role.lower() != "user":
@@ -398,8 +683,6 @@ def create_stripe_checkout_session_new(request, worker_id):
 
     amount_paise = int(base_amount * 100)
 
-    stripe.api_key = settings.STRIPE_SECRET_KEY
-
     try:
         # Convert date string to Python date object for validation
         date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
@@ -423,45 +706,58 @@ def create_stripe_checkout_session_new(request, worker_id):
         except ValueError:
             return Response({"detail": "Invalid time format. Use HH:MM."}, status=400)
         
-        # Check for existing booking conflict
-        conflict = Booking.objects.filter(
-            worker=worker,
-            date=date_obj,
-            status__in=["pending", "accepted"]
-        ).exists()
-
-        if conflict:
+        # Hold the day while the user pays, so it can't be taken before confirm
+        session_expires_at = timezone.now() + timedelta(seconds=settings.SLOT_HOLD_SECONDS)
+        try:
+            hold = availability.hold_day(
+                worker,
+                date_obj,
+                request.user,
+                session_expires_at + timedelta(seconds=settings.SLOT_HOLD_GRACE_SECONDS),
+            )
+        except availability.DayAlreadyBooked:
             return Response(
                 {"detail": f"{worker.name} is already booked on {date_obj}. Please choose another day."},
-                status=400
+                status=409
             )
 
-        session = stripe.checkout.Session.create(
-            mode="payment",
-            line_items=[
-                {
-                    "price_data": {
-                        "currency": "inr",
-                        "product_data": {
-                            "name": f"Booking - {service.services}",
+        try:
+            session = payments.start_checkout(
+                request.user,
+                hold=hold,
+                mode="payment",
+                line_items=[
+                    {
+                        "price_data": {
+                            "currency": "inr",
+                            "product_data": {
+                                "name": f"Booking - {service.services}",
+                            },
+                            "unit_amount": amount_paise,
                         },
-                        "unit_amount": amount_paise,
-                    },
-                    "quantity": 1,
-                }
-            ],
-            success_url=f"{settings.FRONTEND_BASE_URL}/payment/success?session_id={{CHECKOUT_SESSION_ID}}",
-            cancel_url=f"{settings.FRONTEND_BASE_URL}/payment/cancel",
-            metadata={
-                "worker_id": str(worker.id),
-                "service_id": str(service.id),
-                "user_id": str(request.user.id),
-                "date": date_str,
-                "time": time,
-                "payment_mode": "now",
-                "amount": str(base_amount),
-            },
-        )
+                        "quantity": 1,
+                    }
+                ],
+                success_url=f"{settings.FRONTEND_BASE_URL}/payment/success?session_id={{CHECKOUT_SESSION_ID}}",
+                cancel_url=f"{settings.FRONTEND_BASE_URL}/payment/cancel",
+                metadata={
+                    "worker_id": str(worker.id),
+                    "service_id": str(service.id),
+                    "user_id": str(request.user.id),
+                    "date": date_str,
+                    "time": time,
+                    "payment_mode": "now",
+                    "amount": str(base_amount),
+                    "hold_id": str(hold.id),
+                },
+                expires_at=int(session_expires_at.timestamp()),
+            )
+        except Exception:
+            availability.release_hold(hold)
+            raise
+
+        hold.stripe_session_id = session.id
+        hold.save(update_fields=["stripe_session_id"])
 
         return Response({
             "checkout_url": session.url, 
@@ -475,6 +771,7 @@ def create_stripe_checkout_session_new(request, worker_id):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@idempotency.idempotent
 def create_booking(request, worker_id):
     """
     User creates a booking for a specific worker & one service
@@ -527,23 +824,17 @@ def create_booking(request, worker_id):
         worker=worker,
         date=date_obj,
         time=time,
-        status__in=["pending", "accepted", "confirmed"]
+        status__in=availability.ACTIVE_BOOKING_STATUSES
     ).first()
 
     if existing_booking:
         return Response(BookingSerializer(existing_booking, context={"request": request}).data, status=200)
 
     # Check for worker availability on the same date
-    conflict = Booking.objects.filter(
-        worker=worker,
-        date=date_obj,
-        status__in=["pending", "accepted", "confirmed"]
-    ).exists()
-
-    if conflict:
+    if availability.is_worker_booked(worker, date_obj):
         return Response(
             {"detail": f"{worker.name} is already booked on {date_obj}. Please choose another day."},
-            status=400
+            status=409
         )
 
     # Prepare serializer data
@@ -567,14 +858,22 @@ def create_booking(request, worker_id):
         
         pay_later_fee = Decimal("20.00")
 
-        with transaction.atomic():
-            booking = serializer.save(
-                user=request.user,
-                worker=worker,
-                status="pending",
-                amount=base_amount,
-                pay_later_fee=pay_later_fee,
-                payment_status="due",
+        try:
+            with transaction.atomic():
+                booking = serializer.save(
+                    user=request.user,
+                    worker=worker,
+                    status="pending",
+                    amount=base_amount,
+                    pay_later_fee=pay_later_fee,
+                    payment_status="due",
+                )
+                availability.claim_booking(booking)
+        except availability.DayAlreadyBooked:
+            # Lost the race for the day to a concurrent booking
+            return Response(
+                {"detail": f"{worker.name} is already booked on {date_obj}. Please choose another day."},
+                status=409
             )
 
         response_payload = BookingSerializer(booking, context={"request": request}).data
@@ -584,6 +883,154 @@ def create_booking(request, worker_id):
         return Response(serializer.errors, status=400)
 
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@idempotency.idempotent
+def create_booking_batch(request, worker_id):
+    """
+    Book one worker and service on several days at once, pay later.
+
+    Takes either "dates" (a list of YYYY-MM-DD) or "recurrence"
+    ({"start", "frequency": daily|weekly|monthly, "interval", "count"}).
+    Every free day is booked in one transaction; the response lists the
+    outcome for each requested date.
+    """
+    if request.user.role.lower() != "user":
+        return Response({"detail": "Only users can book services"}, status=403)
+
+    worker = get_object_or_404(Worker, pk=worker_id)
+    service_id = request.data.get("service_id")
+    time = request.data.get("time")
+    dates = request.data.get("dates")
+    recurrence = request.data.get("recurrence")
+
+    if not service_id or not time:
+        return Response({"detail": "Service and time must be provided"}, status=400)
+    if bool(dates) == bool(recurrence):
+        return Response({"detail": "Provide either dates or recurrence"}, status=400)
+
+    service = get_object_or_404(WorkerService, pk=service_id, worker=worker)
+    base_amount = Decimal(service.price or 0)
+    MINIMUM_AMOUNT_INR = Decimal("100.00")
+    if base_amount < MINIMUM_AMOUNT_INR:
+        return Response({
+            "detail": f"Minimum booking amount is ₹{MINIMUM_AMOUNT_INR}. Current amount is ₹{base_amount}."
+        }, status=400)
+
+    try:
+        time_obj = datetime.strptime(time, "%H:%M").time()
+    except (TypeError, ValueError):
+        return Response({"detail": "Invalid time format. Use HH:MM."}, status=400)
+    if not availability.WORKDAY_START_HOUR <= time_obj.hour < availability.WORKDAY_END_HOUR:
+        return Response({
+            "detail": "Workers are only available from 9 AM to 6 PM. Please select a time within working hours."
+        }, status=400)
+
+    if recurrence:
+        try:
+            start = datetime.strptime(str(recurrence.get("start")), "%Y-%m-%d").date()
+            count = int(recurrence.get("count", 0))
+            interval = int(recurrence.get("interval", 1))
+        except (AttributeError, TypeError, ValueError) as e:
+            return Response({"detail": f"Invalid recurrence: {e}"}, status=400)
+        # Checked before generating, so a huge count is never expanded
+        if count > availability.MAX_BATCH_DATES:
+            return Response(
+                {"detail": f"At most {availability.MAX_BATCH_DATES} dates can be booked at once"}, status=400
+            )
+        try:
+            requested = availability.recurring_dates(start, recurrence.get("frequency"), count, interval)
+        except (OverflowError, ValueError) as e:
+            return Response({"detail": f"Invalid recurrence: {e}"}, status=400)
+        requested = [day.isoformat() for day in requested]
+    elif isinstance(dates, list):
+        requested = [str(day) for day in dates]
+    else:
+        return Response({"detail": "dates must be a list of YYYY-MM-DD strings"}, status=400)
+
+    # Repeated dates are reported once
+    requested = list(dict.fromkeys(requested))
+    if len(requested) > availability.MAX_BATCH_DATES:
+        return Response(
+            {"detail": f"At most {availability.MAX_BATCH_DATES} dates can be booked at once"}, status=400
+        )
+
+    today = datetime.now().date()
+    results = {}
+    valid_days = {}
+    for date_str in requested:
+        try:
+            day = datetime.strptime(date_str, "%Y-%m-%d").date()
+        except ValueError:
+            results[date_str] = {"status": "invalid", "detail": "Invalid date format. Use YYYY-MM-DD."}
+            continue
+        if day < today:
+            results[date_str] = {"status": "invalid", "detail": "Cannot book for past dates."}
+            continue
+        valid_days[date_str] = day
+
+    created = []
+    # A concurrent booking can take a day between the check and the insert;
+    # the whole batch is then rolled back, re-checked and retried once
+    for attempt in range(2):
+        taken = availability.taken_days(worker, list(valid_days.values()))
+        free = [day for day in valid_days.values() if day not in taken]
+        try:
+            with transaction.atomic():
+                created = availability.create_bookings([
+                    Booking(
+                        user=request.user,
+                        worker=worker,
+                        service=service,
+                        date=day,
+                        time=time_obj,
+                        status="pending",
+                        payment_mode="later",
+                        amount=base_amount,
+                        pay_later_fee=Decimal("20.00"),
+                        payment_status="due",
+                    )
+                    for day in free
+                ])
+            break
+        except availability.DayAlreadyBooked:
+            if attempt:
+                return Response(
+                    {"detail": "Some of these days were just booked by someone else. Please try again."},
+                    status=409
+                )
+
+    if created:
+        response_cache.invalidate_worker(worker.pk, listing=False)
+
+    by_day = {booking.date: booking for booking in created}
+    for date_str, day in valid_days.items():
+        if day in by_day:
+            results[date_str] = {
+                "status": "created",
+                "booking": BookingSerializer(by_day[day], context={"request": request}).data,
+            }
+        else:
+            results[date_str] = {
+                "status": "conflict",
+                "detail": f"{worker.name} is already booked on {day}.",
+            }
+
+    if created:
+        status_code = 201
+    elif any(result["status"] == "conflict" for result in results.values()):
+        status_code = 409
+    else:
+        status_code = 400
+    return Response(
+        {
+            "created": len(created),
+            "results": [{"date": date_str, **results[date_str]} for date_str in requested],
+        },
+        status=status_code,
+    )
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def confirm_stripe_payment(request):
@@ -592,13 +1039,41 @@ def confirm_stripe_payment(request):
     if not session_id:
         return Response({"detail": "session_id is required"}, status=400)
 
+    # Once paid, a session's booking is final: refreshes and retries of the
+    # success page are answered from the database without calling Stripe
+    booking = paid_booking_for_session(request.user, session_id)
+    if booking is not None:
+        return Response(BookingSerializer(booking, context={"request": request}).data, status=200)
+
     if not settings.STRIPE_SECRET_KEY:
         return Response({"detail": "Stripe is not configured. Add STRIPE_SECRET_KEY."}, status=500)
 
-    stripe.api_key = settings.STRIPE_SECRET_KEY
+    # Concurrent confirmations of one session queue up behind the first,
+    # which retrieves the session once and creates the booking
+    try:
+        with payments.single_flight(f"confirm:{session_id}"):
+            booking = paid_booking_for_session(request.user, session_id)
+            if booking is not None:
+                return Response(BookingSerializer(booking, context={"request": request}).data, status=200)
+            return confirm_from_stripe(request, session_id)
+    except payments.StillRunning:
+        return Response(
+            {"detail": "This payment is still being confirmed. Please try again in a moment."}, status=409
+        )
+
+
+def paid_booking_for_session(user, session_id):
+    return (
+        Booking.objects.filter(stripe_checkout_session_id=session_id, user=user, payment_status="paid")
+        .select_related("worker__user", "service", "user")
+        .first()
+    )
 
+
+def confirm_from_stripe(request, session_id):
+    """Apply a Checkout Session's outcome, as seen by Stripe, to its booking"""
     try:
-        session = stripe.checkout.Session.retrieve(session_id)
+        session = payments.retrieve_checkout_session_cached(session_id)
     except Exception as e:
         import logging
         logging.getLogger(__name__).error(f"Stripe session retrieve failed: {str(e)}")
@@ -618,6 +1093,7 @@ def confirm_stripe_payment(request):
     booking = get_object_or_404(Booking, id=booking_id, user=request.user)
 
     if session.payment_status == "paid":
+        payments.record_payment(session.id, session.payment_intent)
         # The webhook might have beaten us to this, but we'll check and update just in case.
         if booking.payment_status != "paid":
             booking.payment_status = "paid"
@@ -691,17 +1167,15 @@ def create_booking_from_payment_session(request, session, metadata):
                 status=200
             )
 
-        # Double-check no conflict exists
-        conflict = Booking.objects.filter(
-            worker=worker,
-            date=date_obj,
-            status__in=["pending", "accepted", "confirmed"]
-        ).exists()
-
-        if conflict:
+        # The day was held for this session at checkout; without a live hold
+        # (it expired, or the session predates holds) check it is still free
+        hold = SlotHold.objects.filter(
+            stripe_session_id=session.id, user=request.user, expires_at__gt=timezone.now()
+        ).first()
+        if hold is None and availability.is_worker_booked(worker, date_obj):
             return Response(
                 {"detail": f"{worker.name} is already booked on {date_obj}. Please contact support."},
-                status=400
+                status=409
             )
 
         # Create booking
@@ -714,28 +1188,40 @@ def create_booking_from_payment_session(request, session, metadata):
 
         serializer = BookingSerializer(data=booking_data)
         if serializer.is_valid():
-            booking = serializer.save(
-                user=request.user,
-                worker=worker,
-                status="accepted",  # Auto-accept since payment is completed
-                amount=base_amount,
-                pay_later_fee=Decimal("0.00"),  # No fee for pay now
-                payment_status="paid",
-                stripe_checkout_session_id=session.id,
-            )
+            try:
+                with transaction.atomic():
+                    if hold is not None:
+                        # Hand the held day over to the booking saved below
+                        availability.release_hold(hold)
+                    booking = serializer.save(
+                        user=request.user,
+                        worker=worker,
+                        status="accepted",  # Auto-accept since payment is completed
+                        amount=base_amount,
+                        pay_later_fee=Decimal("0.00"),  # No fee for pay now
+                        payment_status="paid",
+                        stripe_checkout_session_id=session.id,
+                    )
+                    availability.claim_booking(booking)
 
-            # Create payment record
-            Payment.objects.create(
-                booking=booking,
-                user=request.user,
-                worker=worker,
-                amount=base_amount,
-                currency=session.currency or "inr",
-                payment_status="paid",
-                stripe_session_id=session.id,
-                stripe_payment_intent_id=session.payment_intent,
-                paid_at=timezone.now()
-            )
+                    # Create payment record
+                    Payment.objects.create(
+                        booking=booking,
+                        user=request.user,
+                        worker=worker,
+                        amount=base_amount,
+                        currency=session.currency or "inr",
+                        payment_status="paid",
+                        stripe_session_id=session.id,
+                        stripe_payment_intent_id=session.payment_intent,
+                        paid_at=timezone.now()
+                    )
+                    payments.record_payment(session.id, session.payment_intent, booking=booking)
+            except availability.DayAlreadyBooked:
+                return Response(
+                    {"detail": f"{worker.name} is already booked on {date_obj}. Please contact support."},
+                    status=409
+                )
 
             return Response(
                 BookingSerializer(booking, context={"request": request}).data, 
@@ -758,75 +1244,15 @@ def stripe_webhook(request):
     if not webhook_secret:
         return HttpResponse(status=400)
 
-    stripe.api_key = settings.STRIPE_SECRET_KEY
-
     try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, webhook_secret
-        )
+        payments.construct_event(payload, sig_header, webhook_secret)
     except ValueError as e:
         return HttpResponse(status=400)
     except stripe.error.SignatureVerificationError as e:  # pyright: ignore
         return HttpResponse(status=400)
 
-    from django.utils import timezone
-    from .models import Payment
-
-    if event["type"] == "checkout.session.completed":
-        session = event["data"]["object"]
-        
-        booking_id = session.get("metadata", {}).get("booking_id")
-        if booking_id:
-            try:
-                booking = Booking.objects.get(id=booking_id)
-                booking.payment_status = "paid"
-                # If pay later was selected but then paid, update payment mode to now
-                booking.payment_mode = "now" 
-                booking.save(update_fields=["payment_status", "payment_mode"])
-                
-                Payment.objects.update_or_create(
-                    booking=booking,
-                    stripe_session_id=session.get("id"),
-                    defaults={
-                        "user": booking.user,
-                        "worker": booking.worker,
-                        "amount": booking.amount,
-                        "currency": session.get("currency", "inr"),
-                        "payment_status": "paid",
-                        "stripe_payment_intent_id": session.get("payment_intent"),
-                        "paid_at": timezone.now()
-                    }
-                )
-            except Booking.DoesNotExist:
-                pass
-                
-    elif event["type"] == "payment_intent.payment_failed":
-        intent = event["data"]["object"]
-        # Find session associated with this intent to get metadata
-        try:
-            sessions = stripe.checkout.Session.list(payment_intent=intent.get("id"), limit=1)
-            if sessions.data:
-                session = sessions.data[0]
-                booking_id = session.get("metadata", {}).get("booking_id")
-                if booking_id:
-                    booking = Booking.objects.get(id=booking_id)
-                    booking.payment_status = "failed"
-                    booking.save(update_fields=["payment_status"])
-                    
-                    Payment.objects.update_or_create(
-                        booking=booking,
-                        stripe_session_id=session.get("id"),
-                        defaults={
-                            "user": booking.user,
-                            "worker": booking.worker,
-                            "amount": booking.amount,
-                            "payment_status": "failed",
-                            "stripe_payment_intent_id": intent.get("id"),
-                        }
-                    )
-        except Exception:
-            pass
-
+    # Store the event and acknowledge it; process_stripe_events applies it
+    webhooks.record(json.loads(payload))
     return HttpResponse(status=200)
 
 
@@ -840,9 +1266,7 @@ def user_bookings(request):
     if request.user.role.lower() != "user":
         return Response({"detail": "Only users can view their bookings"}, status=403)
 
-    bookings = Booking.objects.filter(user=request.user).order_by("-created_at")
-    serializer = BookingSerializer(bookings, many=True, context={"request": request})  # <-- pass context
-    return Response(serializer.data)
+    return booking_page(request, Booking.objects.filter(user=request.user))
 
 
 
@@ -855,12 +1279,41 @@ def worker_bookings(request):
     if request.user.role.lower() != "worker":
         return Response({"detail": "Only workers can view bookings"}, status=403)
 
-    worker = get_object_or_404(Worker, user=request.user)
-    bookings = Booking.objects.filter(worker=worker).order_by("-created_at")
-    return Response(BookingSerializer(bookings, many=True).data)
+    worker = get_object_or_404(Worker.objects.only("id"), user=request.user)
+    return booking_page(request, Booking.objects.filter(worker=worker))
+
+
+def booking_page(request, bookings):
+    """
+    One keyset page of `bookings`, filtered by ?status= (comma-separated)
+    and ?from= / ?to= on the booking date. Everything BookingSerializer
+    renders is joined in, so a page costs one query however long it is.
+    """
+    params = request.query_params
+    statuses = [value.strip() for value in params.get("status", "").split(",") if value.strip()]
+    if statuses:
+        known = {choice for choice, _ in Booking.STATUS_CHOICES}
+        unknown = sorted(set(statuses) - known)
+        if unknown:
+            return Response({"detail": f"Unknown status: {', '.join(unknown)}"}, status=400)
+        bookings = bookings.filter(status__in=statuses)
+
+    try:
+        if params.get("from"):
+            bookings = bookings.filter(date__gte=datetime.strptime(params["from"], "%Y-%m-%d").date())
+        if params.get("to"):
+            bookings = bookings.filter(date__lte=datetime.strptime(params["to"], "%Y-%m-%d").date())
+    except ValueError:
+        return Response({"detail": "Invalid date format. Use YYYY-MM-DD."}, status=400)
+
+    paginator = BookingPagination()
+    page = paginator.paginate_queryset(bookings.select_related("worker__user", "service", "user"), request)
+    serializer = BookingSerializer(page, many=True, context={"request": request})
+    return paginator.get_paginated_response(serializer.data)
 
 @api_view(["PATCH"])  # <- Accept PATCH requests
 @permission_classes([IsAuthenticated])
+@idempotency.idempotent
 def update_booking_status(request, booking_id):
     """
     Worker accepts/declines a booking
@@ -868,14 +1321,20 @@ def update_booking_status(request, booking_id):
     if request.user.role.lower() != "worker":
         return Response({"detail": "Only workers can update booking status"}, status=403)
 
-    booking = get_object_or_404(Booking, pk=booking_id, worker__user=request.user)
+    booking = get_object_or_404(
+        Booking.objects.select_related("user", "worker__user", "service"), pk=booking_id, worker__user=request.user
+    )
     new_status = request.data.get("status")
 
     if new_status not in ["accepted", "declined", "completed", "canceled"]:
         return Response({"detail": "Invalid status"}, status=400)
 
-    booking.status = new_status
-    booking.save()
+    try:
+        transitions.transition(booking, new_status)
+    except transitions.StaleTransition:
+        return Response({"detail": "This booking was just updated. Please refresh and try again."}, status=409)
+    except transitions.InvalidTransition as e:
+        return Response({"detail": str(e)}, status=400)
 
     # Send email to user about booking update
     send_mail(
@@ -890,6 +1349,7 @@ def update_booking_status(request, booking_id):
 
 @api_view(["PATCH"])
 @permission_classes([IsAuthenticated])
+@idempotency.idempotent
 def cancel_booking(request, booking_id):
     """
     User cancels their own booking
@@ -897,14 +1357,17 @@ def cancel_booking(request, booking_id):
     if request.user.role.lower() != "user":
         return Response({"detail": "Only users can cancel bookings"}, status=403)
 
-    booking = get_object_or_404(Booking, pk=booking_id, user=request.user)
+    booking = get_object_or_404(
+        Booking.objects.select_related("user", "worker__user", "service"), pk=booking_id, user=request.user
+    )
 
-    if booking.status in ["canceled", "completed", "declined"]:
+    try:
+        transitions.transition(booking, "canceled")
+    except transitions.StaleTransition:
+        return Response({"detail": "This booking was just updated. Please refresh and try again."}, status=409)
+    except transitions.InvalidTransition:
         return Response({"detail": "Cannot cancel this booking"}, status=400)
 
-    booking.status = "canceled"
-    booking.save()
-
     # Optionally, notify worker via email
     send_mail(
         "Booking Canceled",
@@ -918,6 +1381,7 @@ def cancel_booking(request, booking_id):
 
 @api_view(["PATCH"])
 @permission_classes([IsAuthenticated])
+@idempotency.idempotent
 def user_complete_booking(request, booking_id):
     """
     User marks their booking as completed
@@ -925,12 +1389,15 @@ def user_complete_booking(request, booking_id):
     if request.user.role.lower() != "user":
         return Response({"detail": "Only users can complete bookings"}, status=403)
 
-    booking = get_object_or_404(Booking, pk=booking_id, user=request.user)
+    booking = get_object_or_404(
+        Booking.objects.select_related("user", "worker__user", "service"), pk=booking_id, user=request.user
+    )
 
-    if booking.status != "accepted":
+    try:
+        transitions.transition(booking, "completed", allowed_from=["accepted"])
+    except transitions.StaleTransition:
+        return Response({"detail": "This booking was just updated. Please refresh and try again."}, status=409)
+    except transitions.InvalidTransition:
         return Response({"detail": "Booking must be accepted first"}, status=400)
 
-    booking.status = "completed"
-    booking.save()
-
     return Response(BookingSerializer(booking, context={"request": request}).data, status=200)
@@ -0,0 +1,227 @@
+"""
+Stripe webhook inbox.
+
+The webhook verifies an event, stores it as a StripeEvent and returns 200
+straight away; nothing else happens inside Stripe's request. A pool of
+workers (`manage.py process_stripe_events`) claims due events and applies
+them through HANDLERS, each inside its own transaction.
+
+A failing event is retried with exponential backoff and marked "failed"
+after STRIPE_EVENT_MAX_ATTEMPTS. An event whose worker died mid-way stays
+"processing"; once its lock is older than STRIPE_EVENT_LOCK_SECONDS it is
+reported as stuck and claimed again.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from . import payments
+from .models import Booking, Payment, SlotHold, StripeEvent
+
+logger = logging.getLogger(__name__)
+
+# Longest wait between two attempts at the same event
+MAX_RETRY_DELAY = timedelta(hours=1)
+
+
+class LockLost(Exception):
+    """Another worker reclaimed the event while this one was applying it."""
+
+
+def checkout_session_completed(session):
+    payments.record_payment(session.get("id"), session.get("payment_intent"))
+    booking_id = session.get("metadata", {}).get("booking_id")
+    if not booking_id:
+        return
+    try:
+        booking = Booking.objects.get(id=booking_id)
+    except Booking.DoesNotExist:
+        return
+    booking.payment_status = "paid"
+    # If pay later was selected but then paid, update payment mode to now
+    booking.payment_mode = "now"
+    booking.save(update_fields=["payment_status", "payment_mode"])
+
+    Payment.objects.update_or_create(
+        booking=booking,
+        stripe_session_id=session.get("id"),
+        defaults={
+            "user": booking.user,
+            "worker": booking.worker,
+            "amount": booking.amount,
+            "currency": session.get("currency", "inr"),
+            "payment_status": "paid",
+            "stripe_payment_intent_id": session.get("payment_intent"),
+            "paid_at": timezone.now(),
+        },
+    )
+
+
+def checkout_session_expired(session):
+    # The customer never paid; free the day held for this session
+    SlotHold.objects.filter(stripe_session_id=session.get("id")).delete()
+
+
+def payment_intent_failed(intent):
+    checkout = payments.checkout_for_intent(intent)
+    if checkout is None:
+        return
+    if checkout.stripe_payment_intent_id is None:
+        checkout.stripe_payment_intent_id = intent.get("id")
+        checkout.save(update_fields=["stripe_payment_intent_id"])
+    # Sessions paying for a booking made on confirm have nothing to mark yet
+    booking = checkout.booking
+    if booking is None:
+        return
+    booking.payment_status = "failed"
+    booking.save(update_fields=["payment_status"])
+
+    Payment.objects.update_or_create(
+        booking=booking,
+        stripe_session_id=checkout.stripe_session_id,
+        defaults={
+            "user": booking.user,
+            "worker": booking.worker,
+            "amount": booking.amount,
+            "payment_status": "failed",
+            "stripe_payment_intent_id": intent.get("id"),
+        },
+    )
+
+
+# event type -> handler taking the event's data.object
+HANDLERS = {
+    "checkout.session.completed": checkout_session_completed,
+    "checkout.session.expired": checkout_session_expired,
+    "payment_intent.payment_failed": payment_intent_failed,
+}
+
+
+def record(event):
+    """
+    Store a verified event (the parsed webhook body) in the inbox. Returns
+    False if it was already there or is of a type we don't handle.
+    """
+    if event.get("type") not in HANDLERS:
+        return False
+    try:
+        with transaction.atomic():
+            StripeEvent.objects.create(event_id=event["id"], type=event["type"], payload=event)
+    except IntegrityError:
+        return False
+    return True
+
+
+def _lock_expiry(now):
+    return now - timedelta(seconds=settings.STRIPE_EVENT_LOCK_SECONDS)
+
+
+def due(now=None):
+    """Events a worker may claim: pending and due, or abandoned mid-processing."""
+    now = now or timezone.now()
+    return StripeEvent.objects.filter(
+        Q(status="pending", next_attempt_at__isnull=True)
+        | Q(status="pending", next_attempt_at__lte=now)
+        | Q(status="processing", locked_at__lt=_lock_expiry(now))
+    )
+
+
+def stuck(now=None):
+    """Events still "processing" long after their worker claimed them."""
+    now = now or timezone.now()
+    return StripeEvent.objects.filter(status="processing", locked_at__lt=_lock_expiry(now))
+
+
+def claim(limit):
+    """
+    Mark up to `limit` due events as processing and return their ids. Each
+    claim is a conditional UPDATE, so concurrent workers never get the same
+    event.
+    """
+    now = timezone.now()
+    candidates = list(due(now).order_by("received_at", "id").values_list("id", flat=True)[:limit])
+    claimed = []
+    for event_id in candidates:
+        updated = due(now).filter(pk=event_id).update(
+            status="processing", locked_at=now, attempts=F("attempts") + 1
+        )
+        if updated:
+            claimed.append(event_id)
+    return claimed
+
+
+def retry_delay(attempts):
+    delay = timedelta(seconds=settings.STRIPE_EVENT_RETRY_SECONDS * 2 ** max(attempts - 1, 0))
+    return min(delay, MAX_RETRY_DELAY)
+
+
+def process(event_id):
+    """Apply one claimed event. Returns its new status."""
+    event = StripeEvent.objects.get(pk=event_id)
+    # Only finish the event if no other worker has reclaimed it meanwhile
+    ours = StripeEvent.objects.filter(pk=event.pk, status="processing", locked_at=event.locked_at)
+    try:
+        with transaction.atomic():
+            HANDLERS[event.type](event.payload["data"]["object"])
+            if not ours.update(status="done", processed_at=timezone.now(), last_error=""):
+                # Roll the handler back; whoever holds the event now applies it
+                raise LockLost(event.event_id)
+        return "done"
+    except LockLost:
+        return "processing"
+    except Exception as exc:
+        logger.exception("Stripe event %s (%s) failed on attempt %s", event.event_id, event.type, event.attempts)
+        if event.attempts >= settings.STRIPE_EVENT_MAX_ATTEMPTS:
+            new_status, next_attempt_at = "failed", None
+        else:
+            new_status, next_attempt_at = "pending", timezone.now() + retry_delay(event.attempts)
+        ours.update(status=new_status, next_attempt_at=next_attempt_at, locked_at=None, last_error=repr(exc))
+        return new_status
+
+
+def _process_in_thread(event_id):
+    try:
+        return process(event_id)
+    except Exception:
+        # Not even the failure could be recorded (e.g. the database went
+        # away); the event stays claimed and is retried once its lock expires
+        logger.exception("Could not record the outcome of Stripe event row %s", event_id)
+        return "processing"
+    finally:
+        connection.close()
+
+
+def process_due(workers=4, batch_size=50):
+    """Claim one batch of due events and apply them on `workers` threads. Returns {status: count}."""
+    event_ids = claim(batch_size)
+    results = {}
+    if not event_ids:
+        return results
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for outcome in pool.map(_process_in_thread, event_ids):
+            results[outcome] = results.get(outcome, 0) + 1
+    return results
+
+
+def retry(queryset):
+    """Put failed (or stuck) events back in the queue with a fresh attempt budget."""
+    return queryset.exclude(status="done").update(
+        status="pending", attempts=0, next_attempt_at=None, locked_at=None
+    )
+
+
+def summary(now=None):
+    """Inbox health: counts per status, stuck events and the oldest waiting event."""
+    now = now or timezone.now()
+    counts = dict(StripeEvent.objects.values_list("status").annotate(total=Count("id")).order_by())
+    oldest = StripeEvent.objects.filter(status="pending").aggregate(oldest=Min("received_at"))["oldest"]
+    return {
+        "counts": {choice: counts.get(choice, 0) for choice, _ in StripeEvent.STATUS_CHOICES},
+        "stuck": stuck(now).count(),
+        "oldest_pending_seconds": int((now - oldest).total_seconds()) if oldest else None,
+    }
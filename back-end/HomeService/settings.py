@@ -14,6 +14,7 @@ import os
 from pathlib import Path
 from datetime import timedelta
 from django.core.exceptions import ImproperlyConfigured
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -88,6 +89,9 @@ CORS_ALLOWED_ORIGINS = [
 # Allow credentials for cookies
 CORS_ALLOW_CREDENTIALS = True
 
+# Clients may send Idempotency-Key on retried writes (HomeApp.idempotency)
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
+
 # For production, read from environment variable
 frontend_url = os.getenv("FRONTEND_BASE_URL")
 if frontend_url:
@@ -144,6 +148,24 @@ else:
     }
 
 
+# Cache
+# Catalog responses are invalidated by bumping tag versions in the cache, so
+# production deployments with several processes need a shared backend.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -209,8 +231,49 @@ SIMPLE_JWT = {
 AUTH_USER_MODEL = 'HomeApp.CustomerUser'
 
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY", "")
+
+# HomeApp.payments client: Stripe API base URL (empty for api.stripe.com; set it
+# to a `manage.py stripe_stub` address to work offline), seconds before a call
+# times out, network retries per call and pooled keep-alive connections
+STRIPE_API_BASE = os.getenv("STRIPE_API_BASE", "")
+STRIPE_TIMEOUT_SECONDS = float(os.getenv("STRIPE_TIMEOUT_SECONDS", "10"))
+STRIPE_MAX_NETWORK_RETRIES = int(os.getenv("STRIPE_MAX_NETWORK_RETRIES", "2"))
+STRIPE_HTTP_POOL_SIZE = int(os.getenv("STRIPE_HTTP_POOL_SIZE", "10"))
+
+# confirm_stripe_payment: seconds a retrieved paid Checkout Session is reused,
+# and how long a confirmation waits for a concurrent one of the same session
+# before answering 409
+STRIPE_SESSION_CACHE_SECONDS = int(os.getenv("STRIPE_SESSION_CACHE_SECONDS", "10"))
+STRIPE_CONFIRM_WAIT_SECONDS = int(os.getenv("STRIPE_CONFIRM_WAIT_SECONDS", "15"))
 FRONTEND_BASE_URL = os.getenv("FRONTEND_BASE_URL", "http://localhost:3000")
 
+# Upper bound on how long tag-invalidated catalog responses stay cached
+RESPONSE_CACHE_SECONDS = int(os.getenv("RESPONSE_CACHE_SECONDS", "600"))
+
+# Seconds to keep /workers/ facet counts for a given filter combination
+CATALOG_FACET_CACHE_SECONDS = int(os.getenv("CATALOG_FACET_CACHE_SECONDS", "300"))
+
+# How long a worker-day is held while the customer pays on Stripe Checkout.
+# Stripe keeps a Checkout Session open for at least 30 minutes.
+SLOT_HOLD_SECONDS = max(int(os.getenv("SLOT_HOLD_SECONDS", "1800")), 1800)
+
+# Extra time a hold outlives its Checkout Session, so a late confirm still finds it
+SLOT_HOLD_GRACE_SECONDS = int(os.getenv("SLOT_HOLD_GRACE_SECONDS", "300"))
+
+# Stripe webhook inbox (HomeApp.webhooks): attempts before an event is marked
+# failed, first retry delay (doubling each attempt), and how long a claimed
+# event may stay "processing" before it counts as stuck and is reclaimed
+STRIPE_EVENT_MAX_ATTEMPTS = int(os.getenv("STRIPE_EVENT_MAX_ATTEMPTS", "8"))
+STRIPE_EVENT_RETRY_SECONDS = int(os.getenv("STRIPE_EVENT_RETRY_SECONDS", "30"))
+STRIPE_EVENT_LOCK_SECONDS = int(os.getenv("STRIPE_EVENT_LOCK_SECONDS", "300"))
+
+# Idempotency-Key replays (HomeApp.idempotency): how long a finished
+# response is kept, how long a request may hold its key while running, and
+# how long a concurrent duplicate waits for it before giving up with 409
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+IDEMPOTENCY_WAIT_SECONDS = int(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+
 # Standard Logging Configuration
 LOGGING = {
     'version': 1,
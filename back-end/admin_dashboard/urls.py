@@ -41,4 +41,6 @@ urlpatterns = [
     # Payment Management
     path('payments/', views.admin_payments, name='admin_payments'),
     path('payments/<int:payment_id>/', views.admin_payment_detail, name='admin_payment_detail'),
+    path('payments/webhook-events/', views.admin_stripe_events, name='admin_stripe_events'),
+    path('payments/webhook-events/<int:event_id>/retry/', views.admin_retry_stripe_event, name='admin_retry_stripe_event'),
 ]
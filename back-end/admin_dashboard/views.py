@@ -1,7 +1,8 @@
 from django.http import JsonResponse
 from functools import wraps
 from django.contrib.auth import get_user_model
-from django.db.models import Sum, Q, Avg
+from django.db import transaction
+from django.db.models import Sum, Q
 from django.utils import timezone
 from datetime import datetime
 from decimal import Decimal
@@ -12,7 +13,8 @@ from rest_framework import status
 from rest_framework.response import Response
 from django.core.paginator import Paginator
 
-from HomeApp.models import Worker, WorkerService, Booking, WorkerRating, Payment
+from HomeApp import availability, transitions, webhooks
+from HomeApp.models import Worker, WorkerService, Booking, WorkerRating, Payment, StripeEvent
 from .models import AdminActionLog
 
 User = get_user_model()
@@ -591,10 +593,6 @@ def admin_worker_detail(request, worker_id):
             }
         )
 
-    # Ratings
-    ratings = WorkerRating.objects.filter(worker=worker)
-    avg_rating = float(ratings.aggregate(Avg("rating"))["rating__avg"] or 0.0)
-
     return Response(
         {
             "id": worker.id,  # pyright: ignore
@@ -606,8 +604,8 @@ def admin_worker_detail(request, worker_id):
             "location": worker.location,
             "bio": worker.bio,
             "experience": worker.experience,
-            "rating": round(avg_rating, 1),
-            "total_ratings": ratings.count(),
+            "rating": float(worker.average_rating),
+            "total_ratings": worker.rating_count,
             "is_available": worker.is_active,
             "date_joined": worker.user.date_joined,  # pyright: ignore
             "total_bookings": booking_count,
@@ -698,7 +696,7 @@ def admin_delete_worker(request, worker_id):
 
     # Cancel all active bookings
     Booking.objects.filter(
-        worker=worker, status__in=["pending", "confirmed", "accepted"]
+        worker=worker, status__in=availability.ACTIVE_BOOKING_STATUSES
     ).update(status="canceled")
 
     # Delete services
@@ -908,30 +906,26 @@ def admin_create_booking(request):
         date_obj = datetime.strptime(scheduled_date, "%Y-%m-%d").date()
 
         # Check for conflicts
-        conflict = Booking.objects.filter(
-            worker=worker,
-            date=date_obj,
-            status__in=["pending", "confirmed", "accepted"],
-        ).exists()
-
-        if conflict:
+        if availability.is_worker_booked(worker, date_obj):
             return Response(
                 {
                     "error": f"{worker.name} is already booked on {scheduled_date}"  # noqa: E501
                 },
-                status=status.HTTP_400_BAD_REQUEST,
+                status=status.HTTP_409_CONFLICT,
             )
 
-        booking = Booking.objects.create(
-            user=user,
-            worker=worker,
-            service=service,
-            date=date_obj,
-            time=scheduled_time or "09:00",
-            status="confirmed",
-            amount=service.price,
-            payment_status="unpaid",
-        )
+        with transaction.atomic():
+            booking = Booking.objects.create(
+                user=user,
+                worker=worker,
+                service=service,
+                date=date_obj,
+                time=scheduled_time or "09:00",
+                status="confirmed",
+                amount=service.price,
+                payment_status="unpaid",
+            )
+            availability.claim_booking(booking)
 
         log_admin_action(
             request,
@@ -963,6 +957,11 @@ def admin_create_booking(request):
             {"error": "Invalid date format. Use YYYY-MM-DD"},
             status=status.HTTP_400_BAD_REQUEST,
         )
+    except availability.DayAlreadyBooked:
+        return Response(
+            {"error": f"{worker.name} is already booked on {scheduled_date}"},
+            status=status.HTTP_409_CONFLICT,
+        )
 
 
 @api_view(["PATCH"])
@@ -981,12 +980,19 @@ def admin_cancel_booking(request, booking_id):
 
     reason = request.data.get("reason", "Cancelled by admin")
 
-    booking.status = "canceled"
+    changes = {"notes": f"{booking.notes or ''}\n\nCancellation reason: {reason}"}
     if booking.payment_status == "paid":
-        booking.payment_status = "refunded"
+        changes["payment_status"] = "refunded"
 
-    booking.notes = f"{booking.notes or ''}\n\nCancellation reason: {reason}"
-    booking.save()
+    try:
+        transitions.transition(booking, "canceled", **changes)
+    except transitions.StaleTransition:
+        return Response(
+            {"error": "Booking was updated concurrently. Please retry."},
+            status=status.HTTP_409_CONFLICT,
+        )
+    except transitions.InvalidTransition as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     log_admin_action(
         request,
@@ -1037,8 +1043,15 @@ def admin_update_booking_status(request, booking_id):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    booking.status = new_status
-    booking.save()
+    try:
+        transitions.transition(booking, new_status)
+    except transitions.StaleTransition:
+        return Response(
+            {"error": "Booking was updated concurrently. Please retry."},
+            status=status.HTTP_409_CONFLICT,
+        )
+    except transitions.InvalidTransition as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     log_admin_action(
         request,
@@ -1319,3 +1332,45 @@ def admin_payment_detail(request, payment_id):
             {"error": f"Failed to fetch payment details: {str(e)}"}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@superuser_required
+def admin_stripe_events(request):
+    """
+    Health of the Stripe webhook inbox, with the stuck and failed events
+    """
+    summary = webhooks.summary()
+    problems = (webhooks.stuck() | StripeEvent.objects.filter(status='failed')).order_by('received_at')[:50]
+    summary['events'] = [
+        {
+            'id': event.id,
+            'event_id': event.event_id,
+            'type': event.type,
+            'status': event.status,
+            'attempts': event.attempts,
+            'last_error': event.last_error,
+            'received_at': event.received_at.isoformat(),
+            'locked_at': event.locked_at.isoformat() if event.locked_at else None,
+        }
+        for event in problems
+    ]
+    return Response(summary)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@superuser_required
+def admin_retry_stripe_event(request, event_id):
+    """
+    Requeue a failed or stuck Stripe event
+    """
+    if not webhooks.retry(StripeEvent.objects.filter(id=event_id)):
+        return Response(
+            {"error": "Event not found or already processed"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    log_admin_action(request, "retry_stripe_event", "stripe_event", event_id, "Requeued Stripe event")
+    return Response({"message": "Event requeued"})
@@ -2,6 +2,56 @@
 import React, { useEffect, useState } from "react";
 import { Link } from "react-router-dom";
 
+const normalizeWorker = (w, idx) => {
+  const id = w.id ?? w.pk ?? w.username ?? (w.name ? `worker-${w.name.toLowerCase().replace(/\s+/g, "-")}` : `worker-${idx}`);
+  let image = w.image || w.image_url || w.profile_image || "";
+  if (image && typeof image === "string" && !image.startsWith("http")) image = `http://127.0.0.1:8000${image.startsWith("/") ? "" : "/"}${image}`;
+  if (!image) image = "https://via.placeholder.com/400";
+
+  const servicesArr = Array.isArray(w.services) ? w.services : [];
+  const skills = servicesArr.map((s) => s.services || "Unknown");
+
+  const professionName = typeof w.profession === "string"
+    ? w.profession
+    : w.profession?.name ?? "";
+
+  // create category slug safely
+  const category = professionName
+    ? professionName.toLowerCase().replace(/\s+/g, "-")
+    : "general";
+
+  const experience = typeof w.experience === "string" ? w.experience : String(w.experience ?? "");
+  const rating = w.ratings?.average_rating ?? null;
+  const reviews = w.ratings?.total_ratings ?? 0;
+  const location = w.location ?? "";
+  const availability = w.availability ?? (Math.random() > 0.5 ? "Available Today" : "Available Tomorrow");
+
+  return {
+    id,
+    image,
+    name: w.name ?? w.username ?? "Unknown",
+    profession: professionName,
+    category,
+    experience,
+    rating,
+    reviews,
+    location,
+    availability,
+    skills,
+    services: servicesArr,
+    verified: !!w.verified,
+  };
+};
+
+// One keyset page of /workers/ and the URL of the next one
+async function fetchWorkerPage(url) {
+  const res = await fetch(url);
+  if (!res.ok) throw new Error(`${res.status} ${res.statusText}`);
+  const data = await res.json();
+  const rows = Array.isArray(data) ? data : Array.isArray(data?.results) ? data.results : [];
+  return { rows: rows.map(normalizeWorker), next: data?.next ?? null };
+}
+
 export default function WorkersSection() {
   const [searchTerm, setSearchTerm] = useState("");
   const [workers, setWorkers] = useState([]);
@@ -9,56 +59,19 @@ export default function WorkersSection() {
   const [selectedCategory, setSelectedCategory] = useState("all");
   const [sortBy, setSortBy] = useState("rating");
 
-  // Fetch workers
+  // Fetch workers a keyset page at a time; "Load more" follows `next`
+  const [nextUrl, setNextUrl] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+
   useEffect(() => {
     let cancelled = false;
     async function fetchWorkers() {
       try {
-        const res = await fetch("http://127.0.0.1:8000/workers/");
-        if (!res.ok) throw new Error(`${res.status} ${res.statusText}`);
-        const data = await res.json();
-        const normalized = (Array.isArray(data) ? data : []).map((w, idx) => {
-          const id = w.id ?? w.pk ?? w.username ?? (w.name ? `worker-${w.name.toLowerCase().replace(/\s+/g, "-")}` : `worker-${idx}`);
-          let image = w.image || w.image_url || w.profile_image || "";
-          if (image && typeof image === "string" && !image.startsWith("http")) image = `http://127.0.0.1:8000${image.startsWith("/") ? "" : "/"}${image}`;
-          if (!image) image = "https://via.placeholder.com/400";
-
-          const servicesArr = Array.isArray(w.services) ? w.services : [];
-          const skills = servicesArr.map((s) => s.services || "Unknown");
-
-          const professionName = typeof w.profession === "string"
-            ? w.profession
-            : w.profession?.name ?? "";
-
-          // create category slug safely
-          const category = professionName
-            ? professionName.toLowerCase().replace(/\s+/g, "-")
-            : "general";
-
-          const experience = typeof w.experience === "string" ? w.experience : String(w.experience ?? "");
-          const rating = w.ratings?.average_rating ?? null;
-          const reviews = w.ratings?.total_ratings ?? 0;
-          const location = w.location ?? "";
-          const availability = w.availability ?? (Math.random() > 0.5 ? "Available Today" : "Available Tomorrow");
-
-          return {
-            id,
-            image,
-            name: w.name ?? w.username ?? "Unknown",
-            profession: professionName,
-            category,
-            experience,
-            rating,
-            reviews,
-            location,
-            availability,
-            skills,
-            services: servicesArr,
-            bio: w.bio ?? "",
-            verified: !!w.verified,
-          };
-        });
-        if (!cancelled) setWorkers(normalized);
+        const page = await fetchWorkerPage("http://127.0.0.1:8000/workers/?ordering=-rating&page_size=100&expand=services");
+        if (!cancelled) {
+          setWorkers(page.rows);
+          setNextUrl(page.next);
+        }
       } catch (err) {
         console.error("Error fetching workers:", err);
         if (!cancelled) setWorkers([]);
@@ -68,6 +81,23 @@ export default function WorkersSection() {
     return () => { cancelled = true; };
   }, []);
 
+  async function loadMoreWorkers() {
+    if (!nextUrl || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchWorkerPage(nextUrl);
+      setWorkers((loaded) => {
+        const seen = new Set(loaded.map((w) => w.id));
+        return [...loaded, ...page.rows.filter((w) => !seen.has(w.id))];
+      });
+      setNextUrl(page.next);
+    } catch (err) {
+      console.error("Error fetching more workers:", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  }
+
   // Fetch professions dynamically
   useEffect(() => {
     async function fetchProfessions() {
@@ -184,7 +214,18 @@ export default function WorkersSection() {
             {sortedWorkers.map((worker) => (
               <WorkerCard key={worker.id} {...worker} />
             ))}
-            {sortedWorkers.length === 0 && (
+            {nextUrl && (
+              <div className="text-center pt-4">
+                <button
+                  onClick={loadMoreWorkers}
+                  disabled={loadingMore}
+                  className="px-6 py-3 bg-white text-primary font-semibold rounded-lg border border-gray-200 hover:bg-gray-50 transition-colors disabled:opacity-50"
+                >
+                  {loadingMore ? "Loading..." : "Load more workers"}
+                </button>
+              </div>
+            )}
+            {sortedWorkers.length === 0 && !nextUrl && (
               <div className="text-center py-12">
                 <svg className="w-16 h-16 text-gray-400 mx-auto mb-4" fill="none" stroke="currentColor" viewBox="0 0 24 24"><path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M21 21l-6-6m2-5a7 7 0 11-14 0 7 7 0 0114 0z" /></svg>
                 <h3 className="text-xl font-medium text-gray-900 mb-2">No workers found</h3>
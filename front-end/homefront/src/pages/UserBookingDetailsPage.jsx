@@ -21,7 +21,7 @@ const UserBookingsPage = () => {
   const loadBookings = useCallback(async () => {
     try {
       setLoading(true);
-      const response = await fetchWithAuth(`${API_BASE_URL}/user/bookings/`, {
+      const response = await fetchWithAuth(`${API_BASE_URL}/user/bookings/?page_size=100`, {
         headers: {
           "Content-Type": "application/json",
         },
@@ -29,7 +29,7 @@ const UserBookingsPage = () => {
       if (!response) return;
       if (!response.ok) throw new Error("Failed to load bookings");
       const data = await response.json();
-      setBookings(data);
+      setBookings(data.results);
     } catch (err) {
       console.error(err);
       setError("Failed to fetch bookings");
@@ -683,11 +683,11 @@ const BookingsSection = () => {
   const fetchBookings = useCallback(async () => {
     try {
       setLoading(true);
-      const res = await fetchWithAuth(`${API_BASE_URL}/worker/bookings/`);
+      const res = await fetchWithAuth(`${API_BASE_URL}/worker/bookings/?page_size=100`);
       if (!res) return;
       if (!res.ok) throw new Error("Failed to fetch bookings");
       const data = await res.json();
-      setBookings(data);
+      setBookings(data.results);
     } catch (err) {
       console.error(err);
       setError("Error loading bookings");